@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+✏️ ACTUALIZACIÓN EN LOTES - SpeakLexi 2.0
+Muchos UPDATE ... WHERE id = X de una misma columna en una sola sentencia:
+UPDATE t SET col = CASE id WHEN .. THEN .. END WHERE id IN (..).
+Lo usa sincronizar.py para aplicar los renombres del plan, y validar_nombre.py
+y test_2.py para escribir sus scripts .sql de renombrado.
+"""
+
+from typing import Any, Dict, Iterator, List, Tuple
+
+from pymysql.converters import escape_item
+
+TAMANO_LOTE = 500
+
+def sentencias_case(tabla: str, columna: str, cambios: Dict[Any, Any],
+                    tamano: int = TAMANO_LOTE, clave: str = 'id') -> Iterator[Tuple[str, List[Any]]]:
+    """
+    (sql, params) de los UPDATE con CASE para aplicar `cambios` ({clave: nuevo valor}),
+    como mucho `tamano` filas por sentencia. Los nombres vienen del código, nunca del usuario.
+    """
+    items = sorted(cambios.items())
+    tamano = max(1, tamano)
+    for inicio in range(0, len(items), tamano):
+        lote = items[inicio:inicio + tamano]
+        sql = (f"UPDATE {tabla} SET {columna} = CASE {clave} "
+               + ' '.join(['WHEN %s THEN %s'] * len(lote))
+               + f" END WHERE {clave} IN ({', '.join(['%s'] * len(lote))})")
+        params = [v for par in lote for v in par] + [k for k, _ in lote]
+        yield sql, params
+
+def sentencias_literales(tabla: str, columna: str, cambios: Dict[Any, Any],
+                         tamano: int = TAMANO_LOTE, clave: str = 'id') -> Iterator[str]:
+    """
+    Las mismas sentencias con los valores ya escapados (comillas, barras, saltos de
+    línea), listas para un archivo .sql que se ejecuta a mano
+    """
+    for sql, params in sentencias_case(tabla, columna, cambios, tamano, clave):
+        yield sql % tuple(escape_item(p, 'utf8mb4') for p in params) + ';'
+
+def actualizar_en_lotes(cursor, tabla: str, columna: str, cambios: Dict[Any, Any],
+                        tamano: int = TAMANO_LOTE, clave: str = 'id') -> int:
+    """Aplica `cambios` sin confirmar (el commit es de quien llama). Devuelve filas afectadas"""
+    total = 0
+    for sql, params in sentencias_case(tabla, columna, cambios, tamano, clave):
+        cursor.execute(sql, params)
+        total += cursor.rowcount
+    return total
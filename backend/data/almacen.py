@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🗄️ ALMACÉN DE DATOS - SpeakLexi 2.0
+Punto único de conexión de los scripts de datos. Por defecto es MySQL
+(pymysql.connect con la config de cada script); si SPEAKLEXI_SQLITE apunta a un
+archivo, todos usan un SQLite local con el mismo esquema lecciones/ejercicios,
+sin servidor. `python almacen.py copiar` lleva las tablas de un lado al otro.
+
+    SPEAKLEXI_SQLITE=local.db python generar-lecciones.py --overwrite
+    python almacen.py copiar --desde sqlite:local.db --hacia mysql --tablas ejercicios --espejo
+"""
+
+import os
+import re
+import sys
+import sqlite3
+import argparse
+import getpass
+import pymysql
+import pymysql.cursors
+import pymysql.converters
+from typing import Any, Dict, List, Optional, Sequence
+
+ENV_SQLITE = 'SPEAKLEXI_SQLITE'
+
+_compartida = None  # conexión que reutilizan todos los scripts dentro de speaklexi-data
+
+# Mismo esquema en los dos motores (solo las columnas que usan los scripts de datos)
+ESQUEMAS = {
+    'mysql': [
+        """CREATE TABLE IF NOT EXISTS usuarios (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            nombre VARCHAR(100), email VARCHAR(150), password VARCHAR(255),
+            rol VARCHAR(20), estado VARCHAR(20), creado_en DATETIME
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4""",
+        """CREATE TABLE IF NOT EXISTS lecciones (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            titulo VARCHAR(255) NOT NULL, descripcion TEXT, contenido LONGTEXT,
+            nivel VARCHAR(5), idioma VARCHAR(20), duracion_minutos INT DEFAULT 30,
+            orden INT DEFAULT 0, estado VARCHAR(20) DEFAULT 'activa', creado_por INT,
+            creado_en DATETIME DEFAULT CURRENT_TIMESTAMP,
+            KEY idx_lecciones_idioma_nivel (idioma, nivel)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4""",
+        """CREATE TABLE IF NOT EXISTS ejercicios (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            leccion_id INT NOT NULL, titulo VARCHAR(255), descripcion TEXT, tipo VARCHAR(40),
+            contenido LONGTEXT, respuesta_correcta LONGTEXT, puntos_maximos INT DEFAULT 0,
+            orden INT DEFAULT 0, estado VARCHAR(20) DEFAULT 'activo', creado_por INT,
+            creado_en DATETIME DEFAULT CURRENT_TIMESTAMP,
+            KEY idx_ejercicios_leccion (leccion_id),
+            CONSTRAINT fk_ejercicios_leccion FOREIGN KEY (leccion_id) REFERENCES lecciones (id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"""
+    ],
+    'sqlite': [
+        """CREATE TABLE IF NOT EXISTS usuarios (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre TEXT, email TEXT, password TEXT, rol TEXT, estado TEXT, creado_en TEXT
+        )""",
+        """CREATE TABLE IF NOT EXISTS lecciones (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            titulo TEXT NOT NULL, descripcion TEXT, contenido TEXT,
+            nivel TEXT, idioma TEXT, duracion_minutos INTEGER DEFAULT 30,
+            orden INTEGER DEFAULT 0, estado TEXT DEFAULT 'activa', creado_por INTEGER,
+            creado_en TEXT DEFAULT CURRENT_TIMESTAMP
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_lecciones_idioma_nivel ON lecciones (idioma, nivel)",
+        """CREATE TABLE IF NOT EXISTS ejercicios (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            leccion_id INTEGER NOT NULL REFERENCES lecciones (id),
+            titulo TEXT, descripcion TEXT, tipo TEXT, contenido TEXT, respuesta_correcta TEXT,
+            puntos_maximos INTEGER DEFAULT 0, orden INTEGER DEFAULT 0, estado TEXT DEFAULT 'activo',
+            creado_por INTEGER, creado_en TEXT DEFAULT CURRENT_TIMESTAMP
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_ejercicios_leccion ON ejercicios (leccion_id)"
+    ]
+}
+
+# ============================================
+# SQLITE CON LA INTERFAZ DE PYMYSQL
+# ============================================
+
+# Sentencias de MySQL sin equivalente (ni necesidad) en SQLite, salvo foreign_key_checks
+NO_OPS = re.compile(r"^\s*SET\s", re.IGNORECASE)
+FK_CHECKS = re.compile(r"\bforeign_key_checks\s*=\s*([01])", re.IGNORECASE)
+DELETE_LIMIT = re.compile(r"^\s*DELETE\s+FROM\s+(\w+)\s+WHERE\s+(.*)\s+LIMIT\s+\?\s*$", re.IGNORECASE | re.DOTALL)
+LITERALES = re.compile(r"('(?:[^'\\]|\\.|'')*')", re.DOTALL)
+
+def traducir(sql: str) -> str:
+    """Adapta el SQL de los scripts (dialecto MySQL, parámetros %s) a SQLite"""
+    partes = LITERALES.split(sql)
+    for i in range(0, len(partes), 2):  # los índices impares son literales entre comillas
+        p = partes[i].replace('%s', '?').replace('%%', '%')
+        p = re.sub(r"\bNOW\(\)", "CURRENT_TIMESTAMP", p, flags=re.IGNORECASE)
+        p = re.sub(r"\bINSERT\s+IGNORE\b", "INSERT OR IGNORE", p, flags=re.IGNORECASE)
+        p = re.sub(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\s+id\s*=\s*id\b", "ON CONFLICT DO NOTHING", p,
+                   flags=re.IGNORECASE)
+        partes[i] = p
+    sql = ''.join(partes)
+    # Upsert general: ON DUPLICATE KEY UPDATE c = VALUES(c) -> ON CONFLICT DO UPDATE SET c = excluded.c
+    m = re.search(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", sql, flags=re.IGNORECASE)
+    if m:
+        resto = re.sub(r"\bVALUES\s*\(\s*(\w+)\s*\)", r"excluded.\1", sql[m.end():], flags=re.IGNORECASE)
+        sql = sql[:m.start()] + "ON CONFLICT DO UPDATE SET" + resto
+    # SQLite no acepta DELETE ... LIMIT salvo compilado a propósito
+    m = DELETE_LIMIT.match(sql)
+    if m:
+        tabla, condicion = m.groups()
+        sql = f"DELETE FROM {tabla} WHERE rowid IN (SELECT rowid FROM {tabla} WHERE {condicion} LIMIT ?)"
+    return sql
+
+def _fila_dict(cursor, fila):
+    return {d[0]: v for d, v in zip(cursor.description, fila)}
+
+class CursorSQLite:
+    """Cursor de sqlite3 que acepta el SQL y los parámetros de pymysql"""
+
+    def __init__(self, conexion: 'ConexionSQLite', dict_rows: bool = True):
+        self.connection = conexion
+        self._cursor = conexion._conn.cursor()
+        if dict_rows:
+            self._cursor.row_factory = _fila_dict
+        self.rowcount = -1
+        self.lastrowid = None
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def execute(self, query: str, args: Optional[Sequence] = None) -> int:
+        if NO_OPS.match(query):
+            # SET SESSION foreign_key_checks = 0/1 -> PRAGMA foreign_keys; SQLite lo
+            # ignora dentro de una transacción, así que va antes de la primera escritura
+            m = FK_CHECKS.search(query)
+            if m:
+                self._cursor.execute(f"PRAGMA foreign_keys = {'ON' if m.group(1) == '1' else 'OFF'}")
+            self.rowcount = 0
+            return 0
+        self._cursor.execute(traducir(query), tuple(args) if args is not None else ())
+        self.rowcount = self._cursor.rowcount
+        self.lastrowid = self._cursor.lastrowid
+        return self.rowcount
+
+    def executemany(self, query: str, args: Sequence[Sequence]) -> int:
+        args = [tuple(a) for a in args]
+        if not args:
+            return 0
+        self._cursor.executemany(traducir(query), args)
+        self.rowcount = self._cursor.rowcount
+        return self.rowcount
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchmany(self, size: int = 1):
+        return self._cursor.fetchmany(size)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def close(self) -> None:
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class ConexionSQLite:
+    """Conexión SQLite que se usa igual que una de pymysql"""
+
+    def __init__(self, ruta: str, dict_rows: bool = True):
+        self.ruta = ruta
+        self.dict_rows = dict_rows
+        self._conn = sqlite3.connect(ruta)
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        for sentencia in ESQUEMAS['sqlite']:
+            self._conn.execute(sentencia)
+        self._conn.commit()
+
+    @property
+    def open(self) -> bool:
+        return self._conn is not None
+
+    def cursor(self, cursorclass=None) -> CursorSQLite:
+        # SSDictCursor/DictCursor devuelven dicts; SSCursor/Cursor, tuplas
+        dict_rows = self.dict_rows if cursorclass is None else 'Dict' in cursorclass.__name__
+        return CursorSQLite(self, dict_rows)
+
+    def commit(self) -> None:
+        self._conn.commit()
+
+    def rollback(self) -> None:
+        self._conn.rollback()
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def escape(self, valor: Any) -> str:
+        """Literal con el escapado de MySQL (los backups se cargan en MySQL)"""
+        return pymysql.converters.escape_item(valor, 'utf8mb4')
+
+# ============================================
+# API PÚBLICA
+# ============================================
+
+class ConexionCompartida:
+    """
+    Envoltura de la conexión compartida: los scripts la usan como siempre, pero
+    close() no la cierra; la cierra quien la abrió (speaklexi-data).
+    """
+
+    def __init__(self, conn):
+        self._real = conn
+
+    def close(self) -> None:
+        pass
+
+    def __getattr__(self, nombre):
+        return getattr(self._real, nombre)
+
+def compartir(conn) -> None:
+    """A partir de aquí conectar() devuelve esta conexión; None deja de compartir"""
+    global _compartida
+    _compartida = ConexionCompartida(conn) if conn is not None else None
+
+def usa_sqlite() -> bool:
+    return bool(os.getenv(ENV_SQLITE))
+
+def conectar_sqlite(ruta: str, dict_rows: bool = True) -> ConexionSQLite:
+    return ConexionSQLite(ruta, dict_rows)
+
+def conectar(**config):
+    """
+    pymysql.connect(**config), o el SQLite de SPEAKLEXI_SQLITE si está definida
+    (en ese caso la config de MySQL se ignora, salvo el tipo de cursor).
+    Si hay una conexión compartida (compartir()) se devuelve esa.
+    """
+    if _compartida is not None:
+        return _compartida
+    ruta = os.getenv(ENV_SQLITE)
+    if ruta:
+        cursorclass = config.get('cursorclass') or pymysql.cursors.Cursor
+        return conectar_sqlite(ruta, 'Dict' in cursorclass.__name__)
+    return pymysql.connect(**config)
+
+def dialecto(obj: Any) -> str:
+    """'sqlite' o 'mysql' para una conexión o un cursor"""
+    if isinstance(obj, ConexionCompartida):
+        obj = obj._real
+    return 'sqlite' if isinstance(obj, (ConexionSQLite, CursorSQLite)) else 'mysql'
+
+def crear_esquema(conn) -> None:
+    with conn.cursor() as cursor:
+        for sentencia in ESQUEMAS[dialecto(conn)]:
+            cursor.execute(sentencia)
+    conn.commit()
+
+def columnas_tabla(cursor, tabla: str) -> List[str]:
+    cursor.execute(f"SELECT * FROM {tabla} LIMIT 0")
+    columnas = [d[0] for d in cursor.description]
+    cursor.fetchall()
+    return columnas
+
+# Tablas de contenido: las que se copian si no se piden otras. usuarios solo a pedido
+TABLAS_CONTENIDO = ['lecciones', 'ejercicios']
+
+def copiar_tablas(origen, destino, tablas: Sequence[str], espejo: bool = False,
+                  lote: int = 1000) -> Dict[str, int]:
+    """
+    Copia filas de `origen` a `destino` conservando los ids (las filas que ya
+    existen se reemplazan). Con `espejo` la tabla destino queda igual a la de
+    origen: se vacía antes (en orden inverso, por las claves foráneas) y el
+    borrado y la carga van en una sola transacción, así un error a mitad de
+    camino no deja tablas vacías o a medio cargar. Sin `espejo` se confirma por lote.
+    Solo se copian las columnas que existen en los dos lados.
+    """
+    copiadas = {}
+    cur_origen = origen.cursor(pymysql.cursors.SSCursor)
+    cur_destino = destino.cursor()
+    es_mysql = dialecto(destino) == 'mysql'
+    try:
+        cur_destino.execute("SET SESSION foreign_key_checks = 0")
+        if espejo:
+            for tabla in reversed(tablas):
+                cur_destino.execute(f"DELETE FROM {tabla}")
+
+        for tabla in tablas:
+            en_destino = set(columnas_tabla(cur_destino, tabla))
+            comunes = [c for c in columnas_tabla(cur_origen, tabla) if c in en_destino]
+            lista = ', '.join(comunes)
+            marcas = ', '.join(['%s'] * len(comunes))
+            if es_mysql:
+                actualizar = ', '.join(f"{c} = VALUES({c})" for c in comunes if c != 'id')
+                q = f"INSERT INTO {tabla} ({lista}) VALUES ({marcas}) ON DUPLICATE KEY UPDATE {actualizar}"
+            else:
+                q = f"INSERT OR REPLACE INTO {tabla} ({lista}) VALUES ({marcas})"
+
+            cur_origen.execute(f"SELECT {lista} FROM {tabla} ORDER BY id")
+            total = 0
+            while True:
+                filas = cur_origen.fetchmany(lote)
+                if not filas:
+                    break
+                cur_destino.executemany(q, filas)
+                if not espejo:
+                    destino.commit()
+                total += len(filas)
+                print(f"   ✓ {tabla}: {total} filas")
+            copiadas[tabla] = total
+        destino.commit()
+    except Exception:
+        destino.rollback()
+        raise
+    finally:
+        cur_destino.execute("SET SESSION foreign_key_checks = 1")
+        cur_origen.close()
+        cur_destino.close()
+    return copiadas
+
+def abrir(destino: str):
+    """'mysql' (config por DB_HOST/DB_USER/DB_PASS/DB_NAME) o 'sqlite:ruta'"""
+    if destino.startswith('sqlite:'):
+        return conectar_sqlite(destino[len('sqlite:'):])
+    return pymysql.connect(
+        host=os.getenv("DB_HOST", "localhost"),
+        user=os.getenv("DB_USER", "root"),
+        password=os.getenv("DB_PASS") or getpass.getpass("DB password: "),
+        database=os.getenv("DB_NAME", "SpeakLexi2"),
+        charset="utf8mb4",
+        cursorclass=pymysql.cursors.DictCursor
+    )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Almacén de datos de SpeakLexi (MySQL / SQLite)")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    crear = sub.add_parser("crear", help="Crear el esquema en un SQLite o MySQL")
+    crear.add_argument("destino", help="mysql o sqlite:ruta.db")
+    copiar = sub.add_parser("copiar", help="Copiar tablas entre almacenes")
+    copiar.add_argument("--desde", required=True, help="mysql o sqlite:ruta.db")
+    copiar.add_argument("--hacia", required=True, help="mysql o sqlite:ruta.db")
+    copiar.add_argument("--tablas", nargs='+', default=TABLAS_CONTENIDO,
+                        help=f"En orden de dependencias (default: {' '.join(TABLAS_CONTENIDO)}; "
+                             "usuarios solo si se pide)")
+    copiar.add_argument("--espejo", action="store_true", help="Vaciar las tablas destino antes de copiar")
+    copiar.add_argument("--lote", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    if args.comando == "crear":
+        conn = abrir(args.destino)
+        try:
+            crear_esquema(conn)
+            print(f"✅ Esquema listo en {args.destino}")
+        finally:
+            conn.close()
+        return 0
+
+    if args.espejo and not args.hacia.startswith('sqlite:'):
+        # Espejo sobre MySQL borra las tablas destino: se pide el nombre de la base
+        base = os.getenv("DB_NAME", "SpeakLexi2")
+        print(f"⚠️  --espejo vaciará {', '.join(args.tablas)} en la base MySQL '{base}' antes de copiar")
+        if input(f"   Escribe '{base}' para confirmar: ").strip() != base:
+            print("❌ Cancelado")
+            return 1
+
+    origen = abrir(args.desde)
+    destino = abrir(args.hacia)
+    try:
+        print(f"🚚 Copiando {', '.join(args.tablas)}: {args.desde} → {args.hacia}"
+              f"{' (espejo)' if args.espejo else ''}")
+        copiadas = copiar_tablas(origen, destino, args.tablas, args.espejo, max(1, args.lote))
+        for tabla, total in copiadas.items():
+            print(f"✅ {tabla}: {total} filas")
+    finally:
+        origen.close()
+        destino.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+💾 BACKUP DE TABLAS - SpeakLexi 2.0
+Respalda una tabla (por defecto ejercicios) leyendo con un cursor del servidor:
+nunca tiene la tabla entera en memoria. Escribe INSERT multi-fila escapados por
+el propio driver o JSON Lines, opcionalmente comprimidos con gzip o zstd.
+"""
+
+import os
+import io
+import sys
+import gzip
+import json
+import argparse
+import getpass
+import pymysql
+import pymysql.cursors
+import almacen
+from datetime import datetime, date
+from decimal import Decimal
+from typing import Any, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+FORMATOS = ('sql', 'jsonl')
+COMPRESIONES = ('none', 'gzip', 'zstd')
+EXTENSIONES = {'none': '', 'gzip': '.gz', 'zstd': '.zst'}
+FILAS_POR_INSERT = 500
+
+def abrir_salida(path: str, compresion: str = 'none'):
+    """Archivo de texto UTF-8, comprimido según `compresion`"""
+    if compresion == 'gzip':
+        return gzip.open(path, 'wt', encoding='utf-8', compresslevel=6)
+    if compresion == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("Compresión zstd no disponible: pip install zstandard")
+        binario = zstandard.ZstdCompressor(level=10).stream_writer(open(path, 'wb'))
+        return io.TextIOWrapper(binario, encoding='utf-8')
+    return open(path, 'w', encoding='utf-8')
+
+def abrir_entrada(path: str):
+    """Abre un backup para leer, detectando la compresión por la extensión"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError("Compresión zstd no disponible: pip install zstandard")
+        binario = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'))
+        return io.TextIOWrapper(binario, encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+def _valor_json(valor: Any) -> Any:
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat(sep=' ') if isinstance(valor, datetime) else valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    if isinstance(valor, bytes):
+        return valor.decode('utf-8', errors='replace')
+    return valor
+
+def nombre_backup(tabla: str = 'ejercicios', formato: str = 'sql', compresion: str = 'none',
+                  directorio: str = '.') -> str:
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return os.path.join(directorio, f'backup_{tabla}_{timestamp}.{formato}{EXTENSIONES[compresion]}')
+
+def generar_backup(conn, tabla: str = 'ejercicios', formato: str = 'sql', compresion: str = 'none',
+                   path: str = None, filas_por_insert: int = FILAS_POR_INSERT) -> Tuple[str, int]:
+    """
+    Escribe el backup de `tabla` y devuelve (archivo, filas).
+    Las columnas salen del propio SELECT *, así que el backup incluye columnas
+    agregadas después (p. ej. firma). Los valores se escapan con conn.escape.
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no soportado: {formato}")
+    if compresion not in COMPRESIONES:
+        raise ValueError(f"Compresión no soportada: {compresion}")
+    path = path or nombre_backup(tabla, formato, compresion)
+    filas_por_insert = max(1, filas_por_insert)
+
+    total = 0
+    tmp = f"{path}.tmp"
+    cursor = conn.cursor(pymysql.cursors.SSCursor)
+    try:
+        cursor.execute(f"SELECT * FROM {tabla} ORDER BY id")
+        columnas = [d[0] for d in cursor.description]
+
+        with abrir_salida(tmp, compresion) as f:
+            if formato == 'sql':
+                encabezado = f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES\n"
+                f.write(f"-- Backup de {tabla}\n")
+                f.write(f"-- Fecha: {datetime.now()}\n")
+                f.write(f"-- Columnas: {', '.join(columnas)}\n\n")
+                pendientes = []
+                for fila in cursor:
+                    pendientes.append('(' + ', '.join(conn.escape(v) for v in fila) + ')')
+                    total += 1
+                    if len(pendientes) >= filas_por_insert:
+                        f.write(encabezado + ',\n'.join(pendientes) + ';\n')
+                        pendientes = []
+                if pendientes:
+                    f.write(encabezado + ',\n'.join(pendientes) + ';\n')
+                f.write(f"\n-- Total {tabla}: {total}\n")
+            else:
+                for fila in cursor:
+                    registro = {c: _valor_json(v) for c, v in zip(columnas, fila)}
+                    f.write(json.dumps(registro, ensure_ascii=False) + '\n')
+                    total += 1
+        os.replace(tmp, path)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    finally:
+        cursor.close()
+
+    return path, total
+
+def conectar_bd():
+    try:
+        conn = almacen.conectar(
+            host=os.getenv("DB_HOST", "localhost"),
+            user=os.getenv("DB_USER", "root"),
+            password=os.getenv("DB_PASS") or (None if almacen.usa_sqlite() else getpass.getpass("DB password: ")),
+            database=os.getenv("DB_NAME", "SpeakLexi2"),
+            charset="utf8mb4"
+        )
+        print("✅ Conexión exitosa a la base de datos")
+        return conn
+    except Exception as e:
+        print(f"❌ Error al conectar: {e}")
+        sys.exit(1)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backup de una tabla de SpeakLexi")
+    parser.add_argument("--tabla", type=str, default="ejercicios")
+    parser.add_argument("--formato", choices=FORMATOS, default="sql")
+    parser.add_argument("--compresion", choices=COMPRESIONES, default="none")
+    parser.add_argument("--salida", type=str, help="Archivo de destino (default: backup_<tabla>_<fecha>)")
+    parser.add_argument("--filas-por-insert", type=int, default=FILAS_POR_INSERT)
+    args = parser.parse_args(argv)
+
+    conn = conectar_bd()
+    try:
+        print(f"\n💾 Generando backup de {args.tabla} ({args.formato}, {args.compresion})...")
+        path, total = generar_backup(conn, args.tabla, args.formato, args.compresion,
+                                     args.salida, args.filas_por_insert)
+        print(f"✅ Backup guardado: {path} ({total} filas)")
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🏦 BANCO DE PRÁCTICA - SpeakLexi 2.0
+Genera muchas variantes por lección (no el set fijo de 9) para práctica
+adaptativa. Cada variante se descarta al generarse si su firma ya salió en
+la lección, y el banco se escribe en streaming a JSON Lines con las columnas
+de ejercicios, así restaurar_backup.py lo carga tal cual con INSERT multi-fila.
+"""
+
+import os
+import json
+from typing import Any, Dict, Iterator, List, Tuple
+
+import backup
+import firmas
+
+# Misma proporción que generar_set: 2 MC, 2 TF, 2 fill, 2 matching, 1 writing
+GENERADORES = (
+    ('gen_multiple_choice', 2),
+    ('gen_true_false', 2),
+    ('gen_fill_blanks', 2),
+    ('gen_matching', 2),
+    ('gen_writing', 1),
+)
+
+# Intentos seguidos sin una variante nueva antes de dar la lección por agotada
+INTENTOS_SIN_NUEVAS = 200
+
+# Columnas de las tuplas de fila_ejercicio() en generar-lecciones.py, en ese orden
+COLUMNAS_FILA = ('leccion_id', 'titulo', 'descripcion', 'tipo', 'contenido', 'respuesta_correcta',
+                 'puntos_maximos', 'orden', 'creado_por', 'firma')
+
+def variantes(gen, n: int, inicio: int = 1) -> Iterator[Dict[str, Any]]:
+    """
+    Hasta n ejercicios de `gen` con firmas distintas, numerados desde `inicio`.
+    Si la lección no da para n (poco vocabulario o pocos ejemplos en el KB) se
+    detiene tras INTENTOS_SIN_NUEVAS intentos seguidos sin nada nuevo.
+    """
+    ciclo = [getattr(gen, nombre) for nombre, veces in GENERADORES for _ in range(veces)]
+    vistas = set()
+    orden = inicio
+    fallidos = 0
+    i = 0
+    while orden - inicio < n and fallidos < INTENTOS_SIN_NUEVAS:
+        generar = ciclo[i % len(ciclo)]
+        i += 1
+        try:
+            ejercicio = generar(orden)
+        except Exception:
+            fallidos += 1
+            continue
+        firma = firmas.firma_ejercicio(ejercicio.get('tipo'), ejercicio.get('contenido', {}))
+        if firma in vistas:
+            fallidos += 1
+            continue
+        vistas.add(firma)
+        fallidos = 0
+        ejercicio['firma'] = firma
+        orden += 1
+        yield ejercicio
+
+def compresion_por_extension(path: str) -> str:
+    if path.endswith('.gz'):
+        return 'gzip'
+    if path.endswith('.zst'):
+        return 'zstd'
+    return 'none'
+
+class EscritorBanco:
+    """
+    Escribe filas de ejercicios como JSON Lines (gzip/zstd según la extensión).
+    contenido y respuesta_correcta quedan como texto JSON, igual que en un backup.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.tmp = f"{path}.tmp"
+        self.archivo = backup.abrir_salida(self.tmp, compresion_por_extension(path))
+        self.total = 0
+        self.lecciones = 0
+
+    def agregar_filas(self, filas: List[Tuple]) -> None:
+        if not filas:
+            return
+        self.archivo.write(''.join(
+            json.dumps(dict(zip(COLUMNAS_FILA, fila)), ensure_ascii=False) + '\n' for fila in filas
+        ))
+        self.total += len(filas)
+        self.lecciones += 1
+
+    def cerrar(self) -> None:
+        self.archivo.close()
+        os.replace(self.tmp, self.path)
+
+    def descartar(self) -> None:
+        self.archivo.close()
+        if os.path.exists(self.tmp):
+            os.remove(self.tmp)
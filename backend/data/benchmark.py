@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+⏱️ BENCHMARK DEL PIPELINE DE CONTENIDO - SpeakLexi 2.0
+Crea una base desechable en un MySQL/MariaDB local, la siembra con un catálogo
+sintético (10k, 100k o 1M ejercicios en los cuatro idiomas) y corre cada script
+de punta a punta en un proceso aparte. Reporta tiempo total y por etapa,
+ejercicios/s, viajes al servidor y pico de RSS.
+
+⚠️ La base de benchmark se BORRA y se vuelve a crear antes de cada script.
+Configuración: BENCH_DB_HOST, BENCH_DB_PORT, BENCH_DB_USER, BENCH_DB_PASS, BENCH_DB_NAME.
+Sin servidor: BENCH_SQLITE=ruta.db corre todo contra un SQLite (ver almacen.py).
+Si una función listada en ETAPAS ya no existe en su script, la etapa falla.
+tests/test_benchmark.py corre la escala 10k sobre SQLite como prueba de humo.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import subprocess
+import importlib.util
+import pymysql
+import pymysql.cursors
+import kb_cache
+import almacen
+import firmas
+from typing import Any, Dict, List
+
+try:
+    SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+except NameError:
+    SCRIPT_DIR = os.getcwd()
+
+RAIZ = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
+KB_DIR = os.path.join(SCRIPT_DIR, 'kb')
+
+BENCH_DB = {
+    'host': os.getenv("BENCH_DB_HOST", "127.0.0.1"),
+    'port': int(os.getenv("BENCH_DB_PORT", "3306")),
+    'user': os.getenv("BENCH_DB_USER", "root"),
+    'password': os.getenv("BENCH_DB_PASS", ""),
+    'database': os.getenv("BENCH_DB_NAME", "speaklexi_bench"),
+    'charset': 'utf8mb4'
+}
+BENCH_SQLITE = os.getenv("BENCH_SQLITE")
+BASES_PROTEGIDAS = {'speaklexi2', 'mysql', 'information_schema', 'performance_schema', 'sys'}
+
+ESCALAS = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+EJERCICIOS_POR_LECCION = 10
+FRACCION_DUPLICADOS = 0.05
+IDIOMAS = ['Inglés', 'Francés', 'Alemán', 'Italiano']
+NIVELES = ['A1', 'A2', 'B1', 'B2', 'C1', 'C2']
+TIPOS = ['seleccion_multiple', 'seleccion_multiple', 'verdadero_falso', 'verdadero_falso',
+         'completar_espacios', 'completar_espacios', 'emparejamiento', 'emparejamiento', 'escritura']
+FILAS_POR_INSERT = 2000
+
+# Scripts medidos: argv, funciones del módulo a cronometrar como etapas y atributos a pisar
+ETAPAS = {
+    'crear-lecciones': {
+        'script': os.path.join(RAIZ, 'docs', 'utils', 'crear-lecciones.py'),
+        'argv': [],
+        'funciones': ['obtener_creador_id', 'clasificar_lecciones', 'upsert_lecciones']
+    },
+    'generar-lecciones': {
+        'script': os.path.join(SCRIPT_DIR, 'generar-lecciones.py'),
+        'argv': ['--overwrite', '--manifest', '{tmp}/huellas.json'],
+        'funciones': ['cargar_knowledge_base', 'contar_ejercicios_por_leccion', 'generar_lote',
+                      'borrar_ejercicios_lecciones', 'EscritorEjercicios.flush']
+    },
+    'sincronizar': {
+        'script': os.path.join(SCRIPT_DIR, 'sincronizar.py'),
+        'argv': [],
+        'funciones': ['cargar_kb', 'planificar_sincronizacion', 'aplicar_plan', 'borrar_huerfanas'],
+        'atributos': {'KB_PATH': KB_DIR}
+    },
+    'limpiar-duplicados': {
+        'script': os.path.join(SCRIPT_DIR, 'limpiar-duplicados.py'),
+        'argv': [],
+        'funciones': ['obtener_ejercicios', 'detectar_duplicados', 'generar_backup',
+                      'eliminar_duplicados', 'reordenar_ejercicios']
+    },
+    'limpiar-duplicados-streaming': {
+        'script': os.path.join(SCRIPT_DIR, 'limpiar-duplicados.py'),
+        'argv': ['--streaming'],
+        'funciones': ['detectar_duplicados_streaming', 'generar_backup',
+                      'eliminar_duplicados', 'reordenar_ejercicios']
+    },
+    'limpiar-duplicados-firma': {
+        'script': os.path.join(SCRIPT_DIR, 'limpiar-duplicados.py'),
+        'argv': ['--por-firma'],
+        'funciones': ['detectar_duplicados_por_firma', 'generar_backup',
+                      'eliminar_duplicados', 'reordenar_ejercicios']
+    },
+    'reordenar': {
+        'script': os.path.join(SCRIPT_DIR, 'reordenar.py'),
+        'argv': [],
+        'funciones': ['reordenar_lecciones']
+    }
+}
+
+# ============================================
+# BASE DESECHABLE Y CATÁLOGO SINTÉTICO
+# ============================================
+
+def conectar_bench():
+    if BENCH_SQLITE:
+        return almacen.conectar_sqlite(BENCH_SQLITE, dict_rows=False)
+    return pymysql.connect(**BENCH_DB)
+
+def recrear_base() -> None:
+    if BENCH_SQLITE:
+        for sufijo in ('', '-wal', '-shm'):
+            if os.path.exists(BENCH_SQLITE + sufijo):
+                os.remove(BENCH_SQLITE + sufijo)
+        conn = almacen.conectar_sqlite(BENCH_SQLITE)  # crea el esquema
+        try:
+            firmas.migrar(conn.cursor())
+            conn.commit()
+        finally:
+            conn.close()
+        return
+    nombre = BENCH_DB['database']
+    if nombre.lower() in BASES_PROTEGIDAS:
+        raise SystemExit(f"❌ '{nombre}' no es una base desechable; usa BENCH_DB_NAME")
+    config = {k: v for k, v in BENCH_DB.items() if k != 'database'}
+    conn = pymysql.connect(**config)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP DATABASE IF EXISTS `{nombre}`")
+            cursor.execute(f"CREATE DATABASE `{nombre}` CHARACTER SET utf8mb4")
+            cursor.execute(f"USE `{nombre}`")
+            for sentencia in almacen.ESQUEMAS['mysql']:
+                cursor.execute(sentencia)
+        conn.commit()
+        with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+            firmas.migrar(cursor)
+        conn.commit()
+    finally:
+        conn.close()
+
+def _contenido(tipo: str, rng: random.Random, base: str) -> Dict[str, Any]:
+    if tipo == 'seleccion_multiple':
+        return {"preguntas": [{"pregunta": f"¿Qué significa {base}?", "opciones": [f"{base} {i}" for i in range(4)]}]}
+    if tipo == 'verdadero_falso':
+        return {"afirmaciones": [f"{base} afirmación {i}" for i in range(3)]}
+    if tipo == 'completar_espacios':
+        return {"texto": f"___ {base} {rng.randint(0, 10**6)}"}
+    if tipo == 'emparejamiento':
+        return {"pares": [{"izquierda": f"{base}{i}", "derecha": f"def {base}{i}"} for i in range(3)]}
+    return {"instrucciones": f"Escribe sobre {base}.", "palabras_minimas": 50}
+
+def sembrar(n_ejercicios: int, semilla: int = 42) -> Dict[str, int]:
+    """
+    Catálogo sintético: las lecciones del KB (80% con título exacto, 10% con título
+    alterado, 10% ausentes) más lecciones sin KB hasta llegar a n/10 lecciones.
+    Cada lección lleva ~10 ejercicios, ~5% duplicados y el orden desordenado.
+    """
+    rng = random.Random(semilla)
+    kb = kb_cache.cargar_kb(KB_DIR)
+    lecciones = []
+    for idioma, nivel, titulo in kb.por_titulo:
+        suerte = rng.random()
+        if suerte < 0.1:
+            continue
+        if suerte < 0.2:
+            titulo = titulo[:-1] if len(titulo) > 4 else f"{titulo} (v2)"
+        lecciones.append((titulo, idioma, nivel))
+    i = 0
+    while len(lecciones) < max(1, n_ejercicios // EJERCICIOS_POR_LECCION):
+        lecciones.append((f"Lección sintética {i}", IDIOMAS[i % 4], NIVELES[(i // 4) % 6]))
+        i += 1
+
+    conn = conectar_bench()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("INSERT INTO usuarios (nombre, email, password, rol, estado, creado_en) "
+                           "VALUES ('Bench', 'bench@local', 'x', 'profesor', 'activo', NOW())")
+            creador = cursor.lastrowid
+            filas = [(t, f"Aprende sobre {t}", '{}', nivel, idioma, 30, rng.randint(0, 50), 'activa', creador)
+                     for t, idioma, nivel in lecciones]
+            for j in range(0, len(filas), FILAS_POR_INSERT):
+                cursor.executemany(
+                    "INSERT INTO lecciones (titulo, descripcion, contenido, nivel, idioma, duracion_minutos, "
+                    "orden, estado, creado_por) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+                    filas[j:j + FILAS_POR_INSERT])
+            conn.commit()
+            cursor.execute("SELECT id, titulo FROM lecciones ORDER BY id")
+            ids = [(r[0], r[1]) for r in cursor.fetchall()]
+
+            pendientes = []
+            total = 0
+            for k in range(n_ejercicios):
+                leccion_id, titulo = ids[min(k * len(ids) // n_ejercicios, len(ids) - 1)]
+                tipo = TIPOS[k % len(TIPOS)]
+                if pendientes and rng.random() < FRACCION_DUPLICADOS and pendientes[-1][0] == leccion_id:
+                    previo = pendientes[-1]
+                    fila = (leccion_id, previo[1], previo[2], previo[3], previo[4], previo[5], 5,
+                            rng.randint(0, 50), creador)
+                else:
+                    contenido = _contenido(tipo, rng, f"{titulo} {k}")
+                    fila = (leccion_id, f"{titulo} — {tipo} {k}", "Ejercicio sintético", tipo,
+                            json.dumps(contenido, ensure_ascii=False), '{"respuestas": [0]}', 5,
+                            rng.randint(0, 50), creador)
+                pendientes.append(fila)
+                if len(pendientes) >= FILAS_POR_INSERT:
+                    _insertar_ejercicios(cursor, pendientes)
+                    conn.commit()
+                    total += len(pendientes)
+                    pendientes = []
+            if pendientes:
+                _insertar_ejercicios(cursor, pendientes)
+                total += len(pendientes)
+            conn.commit()
+    finally:
+        conn.close()
+    return {'lecciones': len(lecciones), 'ejercicios': total}
+
+def _insertar_ejercicios(cursor, filas: List[tuple]) -> None:
+    cursor.executemany(
+        "INSERT INTO ejercicios (leccion_id, titulo, descripcion, tipo, contenido, respuesta_correcta, "
+        "puntos_maximos, orden, estado, creado_por, creado_en) "
+        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 'activo', %s, NOW())", filas)
+
+# ============================================
+# PROCESO HIJO: CORRE UN SCRIPT INSTRUMENTADO
+# ============================================
+
+def _pico_rss_mb() -> float:
+    try:
+        import resource
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return pico / (1024 * 1024) if sys.platform == 'darwin' else pico / 1024
+    except ImportError:
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+        except (ImportError, AttributeError):
+            return 0.0
+
+def _resolver(modulo, etiqueta: str):
+    """'Clase.metodo' -> (Clase, 'metodo'); 'funcion' -> (modulo, 'funcion')"""
+    dueno = modulo
+    partes = etiqueta.split('.')
+    for parte in partes[:-1]:
+        dueno = getattr(dueno, parte)
+    return dueno, partes[-1]
+
+def funciones_faltantes(modulo, etiquetas: List[str]) -> List[str]:
+    """Etiquetas de ETAPAS[...]['funciones'] que ya no existen en el script"""
+    faltantes = []
+    for etiqueta in etiquetas:
+        try:
+            dueno, nombre_fn = _resolver(modulo, etiqueta)
+        except AttributeError:
+            faltantes.append(etiqueta)
+            continue
+        if not callable(getattr(dueno, nombre_fn, None)):
+            faltantes.append(etiqueta)
+    return faltantes
+
+def cargar_modulo(nombre: str):
+    """Importa el script de una etapa como módulo (los nombres con guion no se importan con import)"""
+    script = ETAPAS[nombre]['script']
+    if os.path.dirname(script) not in sys.path:
+        sys.path.insert(0, os.path.dirname(script))
+    spec = importlib.util.spec_from_file_location(nombre.replace('-', '_'), script)
+    modulo = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = modulo
+    spec.loader.exec_module(modulo)
+    return modulo
+
+def correr_etapa_hija(nombre: str, resultado_path: str, tmp: str) -> None:
+    etapa = ETAPAS[nombre]
+    viajes = [0]
+
+    # Todas las conexiones van a la base desechable; cada comando al servidor es un viaje
+    conectar_real = pymysql.connect
+    def conectar_bench(*args, **kwargs):
+        kwargs.update({k: v for k, v in BENCH_DB.items() if k != 'charset'})
+        return conectar_real(**kwargs)
+    pymysql.connect = conectar_bench
+
+    comando_real = pymysql.connections.Connection._execute_command
+    def comando_contado(self, command, sql):
+        viajes[0] += 1
+        return comando_real(self, command, sql)
+    pymysql.connections.Connection._execute_command = comando_contado
+
+    # Con SQLite no hay red: se cuentan las sentencias enviadas al motor
+    if BENCH_SQLITE:
+        os.environ[almacen.ENV_SQLITE] = BENCH_SQLITE
+        for metodo in ('execute', 'executemany'):
+            real = getattr(almacen.CursorSQLite, metodo)
+            def contado(self, *args, _real=real, **kwargs):
+                viajes[0] += 1
+                return _real(self, *args, **kwargs)
+            setattr(almacen.CursorSQLite, metodo, contado)
+
+    import builtins
+    builtins.input = lambda *a, **k: 's'
+    os.environ['DB_HOST'] = BENCH_DB['host']
+    os.environ['DB_USER'] = BENCH_DB['user']
+    os.environ['DB_PASS'] = BENCH_DB['password']
+    os.environ['DB_NAME'] = BENCH_DB['database']
+
+    modulo = cargar_modulo(nombre)
+    for atributo, valor in etapa.get('atributos', {}).items():
+        setattr(modulo, atributo, type(getattr(modulo, atributo))(valor))
+
+    medidas: Dict[str, Dict[str, float]] = {}
+    def cronometrar(etiqueta, fn):
+        def envoltura(*args, **kwargs):
+            inicio, viajes_inicio = time.perf_counter(), viajes[0]
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                m = medidas.setdefault(etiqueta, {'llamadas': 0, 'segundos': 0.0, 'viajes': 0})
+                m['llamadas'] += 1
+                m['segundos'] += time.perf_counter() - inicio
+                m['viajes'] += viajes[0] - viajes_inicio
+        return envoltura
+
+    faltantes = funciones_faltantes(modulo, etapa['funciones'])
+    if faltantes:
+        # Un nombre renombrado en el script no se mide: la etapa falla en vez de saltarlo
+        with open(resultado_path, 'w', encoding='utf-8') as f:
+            json.dump({'segundos': 0.0, 'viajes': 0, 'rss_mb': _pico_rss_mb(), 'etapas': {},
+                       'error': f"funciones no encontradas: {', '.join(faltantes)}"}, f)
+        return
+
+    for etiqueta in etapa['funciones']:
+        dueno, nombre_fn = _resolver(modulo, etiqueta)
+        setattr(dueno, nombre_fn, cronometrar(etiqueta, getattr(dueno, nombre_fn)))
+
+    sys.argv = [etapa['script']] + [a.replace('{tmp}', tmp) for a in etapa['argv']]
+    inicio = time.perf_counter()
+    error = None
+    try:
+        codigo = modulo.main()
+        if codigo not in (None, 0):
+            error = f"exit {codigo}"
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            error = f"exit {e.code}"
+    except Exception as e:
+        error = str(e)
+    segundos = time.perf_counter() - inicio
+
+    with open(resultado_path, 'w', encoding='utf-8') as f:
+        json.dump({'segundos': segundos, 'viajes': viajes[0], 'rss_mb': _pico_rss_mb(),
+                   'etapas': medidas, 'error': error}, f)
+
+# ============================================
+# PROCESO PADRE
+# ============================================
+
+def medir(nombre: str, escala: str, semilla: int, logs: str) -> Dict[str, Any]:
+    recrear_base()
+    inicio = time.perf_counter()
+    sembrado = sembrar(ESCALAS[escala], semilla)
+    segundos_siembra = time.perf_counter() - inicio
+
+    with tempfile.TemporaryDirectory() as tmp:
+        resultado_path = os.path.join(tmp, 'resultado.json')
+        log_path = os.path.join(logs, f"{escala}_{nombre}.log")
+        with open(log_path, 'w', encoding='utf-8') as log:
+            subprocess.run([sys.executable, os.path.abspath(__file__), '--etapa-hija', nombre,
+                            '--resultado', resultado_path, '--tmp', tmp],
+                           stdout=log, stderr=subprocess.STDOUT, cwd=tmp, check=False)
+        if not os.path.exists(resultado_path):
+            return {'etapa': nombre, 'escala': escala, 'error': f"sin resultado, ver {log_path}"}
+        with open(resultado_path, 'r', encoding='utf-8') as f:
+            resultado = json.load(f)
+
+    resultado.update({
+        'etapa': nombre,
+        'escala': escala,
+        'ejercicios': sembrado['ejercicios'],
+        'lecciones': sembrado['lecciones'],
+        'siembra_segundos': segundos_siembra,
+        'ejercicios_por_segundo': sembrado['ejercicios'] / resultado['segundos'] if resultado['segundos'] else 0
+    })
+    return resultado
+
+def mostrar(resultados: List[Dict[str, Any]]) -> None:
+    print(f"\n{'='*96}")
+    print(f"{'ETAPA':<30}{'ESCALA':>8}{'SEG':>10}{'EJ/S':>12}{'VIAJES':>10}{'RSS MB':>10}  ERROR")
+    print(f"{'='*96}")
+    for r in resultados:
+        if 'segundos' not in r:
+            print(f"{r['etapa']:<30}{r['escala']:>8}{'':>42}  {r['error']}")
+            continue
+        print(f"{r['etapa']:<30}{r['escala']:>8}{r['segundos']:>10.2f}{r['ejercicios_por_segundo']:>12.0f}"
+              f"{r['viajes']:>10}{r['rss_mb']:>10.1f}  {r['error'] or ''}")
+        for etiqueta, m in r['etapas'].items():
+            print(f"   └ {etiqueta:<35}{m['llamadas']:>6}x{m['segundos']:>10.2f}s{m['viajes']:>10} viajes")
+    print(f"{'='*96}\n")
+
+def comparar(resultados: List[Dict[str, Any]], base_path: str, tolerancia: float) -> int:
+    """Cuenta regresiones de tiempo, viajes o RSS frente a un JSON anterior"""
+    with open(base_path, 'r', encoding='utf-8') as f:
+        base = {(r['etapa'], r['escala']): r for r in json.load(f) if 'segundos' in r}
+    regresiones = 0
+    for r in resultados:
+        previo = base.get((r['etapa'], r['escala']))
+        if not previo or 'segundos' not in r:
+            continue
+        for campo in ('segundos', 'viajes', 'rss_mb'):
+            if previo[campo] and r[campo] > previo[campo] * (1 + tolerancia):
+                regresiones += 1
+                print(f"⚠️  {r['etapa']} {r['escala']}: {campo} {previo[campo]:.2f} → {r[campo]:.2f}")
+    print(f"{'✅ Sin regresiones' if not regresiones else f'❌ {regresiones} regresiones'} "
+          f"(tolerancia {tolerancia:.0%})")
+    return regresiones
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline de contenido")
+    parser.add_argument("--escalas", nargs='+', choices=list(ESCALAS), default=['10k'])
+    parser.add_argument("--etapas", nargs='+', choices=list(ETAPAS), default=list(ETAPAS))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", type=str, help="Guardar los resultados en este archivo")
+    parser.add_argument("--comparar", type=str, help="JSON de una corrida anterior")
+    parser.add_argument("--tolerancia", type=float, default=0.2)
+    parser.add_argument("--logs", type=str, default=os.path.join(tempfile.gettempdir(), 'speaklexi_bench'))
+    parser.add_argument("--etapa-hija", type=str, help=argparse.SUPPRESS)
+    parser.add_argument("--resultado", type=str, help=argparse.SUPPRESS)
+    parser.add_argument("--tmp", type=str, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.etapa_hija:
+        correr_etapa_hija(args.etapa_hija, args.resultado, args.tmp)
+        return 0
+
+    os.makedirs(args.logs, exist_ok=True)
+    destino = f"sqlite:{BENCH_SQLITE}" if BENCH_SQLITE else f"{BENCH_DB['host']}:{BENCH_DB['port']}/{BENCH_DB['database']}"
+    print(f"⏱️  Benchmark contra {destino}")
+    print(f"📝 Salida de cada script en {args.logs}\n")
+
+    resultados = []
+    for escala in args.escalas:
+        for nombre in args.etapas:
+            print(f"▶️  {nombre} ({escala})...")
+            r = medir(nombre, escala, args.seed, args.logs)
+            resultados.append(r)
+            if 'segundos' in r:
+                print(f"   ✓ {r['segundos']:.2f}s, {r['viajes']} viajes, {r['rss_mb']:.1f} MB")
+            else:
+                print(f"   ❌ {r['error']}")
+
+    mostrar(resultados)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=1)
+        print(f"💾 Resultados guardados en {args.json}")
+    if args.comparar:
+        return 1 if comparar(resultados, args.comparar, args.tolerancia) else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🗑️ BORRADO EN LOTES - SpeakLexi 2.0
+DELETE con listas IN acotadas y un commit por lote, para limpiar la BD en vivo
+sin un paquete gigante ni un bloqueo largo sobre la tabla.
+"""
+
+import time
+from typing import Iterable, Optional
+
+TAMANO_LOTE = 500
+
+def borrar_en_lotes(conn, cursor, tabla: str, columna: str, valores: Iterable,
+                    tamano: int = TAMANO_LOTE, pausa: float = 0.0,
+                    etiqueta: Optional[str] = None) -> int:
+    """
+    Borra las filas de `tabla` cuya `columna` está en `valores`.
+    Cada DELETE lleva como mucho `tamano` valores en el IN y borra como mucho
+    `tamano` filas (LIMIT), y se confirma por separado. `pausa` son segundos de
+    espera entre lotes para dejar pasar las lecturas de la API.
+    Devuelve el total de filas borradas.
+    """
+    valores = sorted(set(valores))
+    tamano = max(1, tamano)
+    etiqueta = etiqueta or tabla
+    total = 0
+
+    for inicio in range(0, len(valores), tamano):
+        lote = valores[inicio:inicio + tamano]
+        placeholders = ','.join(['%s'] * len(lote))
+        while True:
+            # Una columna no única (p. ej. leccion_id) puede abarcar muchas filas por valor
+            cursor.execute(f"DELETE FROM {tabla} WHERE {columna} IN ({placeholders}) LIMIT %s",
+                           lote + [tamano])
+            borradas = cursor.rowcount
+            conn.commit()
+            total += borradas
+            if borradas < tamano:
+                break
+            if pausa:
+                time.sleep(pausa)
+
+        hechos = min(inicio + tamano, len(valores))
+        print(f"   🗑️  {etiqueta}: {hechos}/{len(valores)} ({total} filas borradas)")
+        if pausa and hechos < len(valores):
+            time.sleep(pausa)
+
+    return total
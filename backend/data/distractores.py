@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🎯 POOL DE DISTRACTORES - SpeakLexi 2.0
+Vocabulario del KB por (idioma, nivel), armado una sola vez y agrupado en
+cubetas por longitud y frecuencia (en cuántas lecciones aparece la palabra).
+Sacar k distractores son k accesos por índice dentro de la cubeta de la
+respuesta correcta, sin reconstruir ni barajar listas en cada pregunta.
+Con NumPy las cubetas se arman vectorizadas; sin NumPy se usan listas.
+"""
+
+import random
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Cortes de longitud (caracteres): <=3, 4-6, 7-9, 10+
+CORTES_LONGITUD = (4, 7, 10)
+# Cortes de frecuencia (lecciones): 1, 2-3, 4-7, 8+
+CORTES_FRECUENCIA = (2, 4, 8)
+BANDAS_FRECUENCIA = len(CORTES_FRECUENCIA) + 1
+
+INTENTOS_POR_DISTRACTOR = 8
+
+def _banda(valor: int, cortes: Sequence[int]) -> int:
+    banda = 0
+    for corte in cortes:
+        if valor < corte:
+            break
+        banda += 1
+    return banda
+
+class PoolDistractores:
+    """Palabras de un (idioma, nivel) con cubetas precalculadas"""
+
+    def __init__(self, frecuencias: Dict[str, int]):
+        palabras = sorted(frecuencias)  # orden estable: mismo --seed, mismos distractores
+        self.indice = {p: i for i, p in enumerate(palabras)}
+        self.cubetas: Dict[int, Sequence[int]] = {}           # banda_longitud * BANDAS + banda_frecuencia
+        self.por_longitud: Dict[int, Sequence[int]] = {}
+        self.bandas: Sequence[int] = []
+
+        if np is not None:
+            self.palabras = np.array(palabras, dtype=object)
+            longitudes = np.fromiter((len(p) for p in palabras), dtype=np.int32, count=len(palabras))
+            veces = np.fromiter((frecuencias[p] for p in palabras), dtype=np.int32, count=len(palabras))
+            banda_lon = np.digitize(longitudes, CORTES_LONGITUD)
+            codigos = banda_lon * BANDAS_FRECUENCIA + np.digitize(veces, CORTES_FRECUENCIA)
+            self.bandas = codigos
+            self.cubetas = self._agrupar(codigos)
+            self.por_longitud = self._agrupar(banda_lon)
+        else:
+            self.palabras = palabras
+            codigos = [_banda(len(p), CORTES_LONGITUD) * BANDAS_FRECUENCIA
+                       + _banda(frecuencias[p], CORTES_FRECUENCIA) for p in palabras]
+            self.bandas = codigos
+            for i, codigo in enumerate(codigos):
+                self.cubetas.setdefault(codigo, []).append(i)
+                self.por_longitud.setdefault(codigo // BANDAS_FRECUENCIA, []).append(i)
+        self.todas = range(len(palabras))
+
+    @staticmethod
+    def _agrupar(codigos) -> Dict[int, Any]:
+        """{código: array de índices} con un solo argsort"""
+        orden = np.argsort(codigos, kind='stable')
+        valores, inicios = np.unique(codigos[orden], return_index=True)
+        return {int(v): grupo for v, grupo in zip(valores, np.split(orden, inicios[1:]))}
+
+    def __len__(self) -> int:
+        return len(self.palabras)
+
+    def _candidatas(self, referencia: Optional[str]) -> List[Sequence[int]]:
+        """Cubetas de la más parecida a la referencia a la más general"""
+        if referencia is None:
+            return [self.todas]
+        i = self.indice.get(referencia)
+        if i is not None:
+            codigo = int(self.bandas[i])
+        else:
+            codigo = _banda(len(referencia), CORTES_LONGITUD) * BANDAS_FRECUENCIA
+        niveles = [self.cubetas.get(codigo), self.por_longitud.get(codigo // BANDAS_FRECUENCIA), self.todas]
+        return [c for c in niveles if c is not None and len(c)]
+
+    def muestrear(self, rng: random.Random, k: int, excluir: Iterable[str] = (),
+                  referencia: Optional[str] = None) -> List[str]:
+        """
+        Hasta k palabras distintas, ninguna en `excluir`, de la misma cubeta de
+        longitud/frecuencia que `referencia` cuando alcanza. Usa el rng del generador,
+        así que con --seed el resultado es reproducible.
+        """
+        excluir = set(excluir)
+        if referencia is not None:
+            excluir.add(referencia)
+        elegidas: List[str] = []
+        vistas = set()
+        for cubeta in self._candidatas(referencia):
+            n = len(cubeta)
+            for _ in range(INTENTOS_POR_DISTRACTOR * k):
+                if len(elegidas) >= k:
+                    return elegidas
+                i = int(cubeta[rng.randrange(n)])
+                if i in vistas:
+                    continue
+                vistas.add(i)
+                palabra = str(self.palabras[i])
+                if palabra not in excluir:
+                    elegidas.append(palabra)
+        return elegidas
+
+def frecuencias_desde_kb(kb, solo: Optional[Iterable[Tuple[str, str]]] = None) -> Dict[Tuple[str, str], Counter]:
+    """
+    {(idioma, nivel): Counter(palabra -> lecciones donde aparece)} del vocabulario del KB.
+    Con `solo` se limita a esos pares y no se leen las demás lecciones del KB.
+    """
+    solo = set(solo) if solo is not None else None
+    conteos: Dict[Tuple[str, str], Counter] = {}
+    for clave in kb.por_titulo:
+        idioma, nivel, _ = clave
+        if solo is not None and (idioma, nivel) not in solo:
+            continue
+        nodo = kb.por_titulo[clave]
+        vocabulario = nodo.get('vocabulario', []) if isinstance(nodo, dict) else []
+        palabras = {p.strip() for p in vocabulario if isinstance(p, str) and p.strip()}
+        conteos.setdefault((idioma, nivel), Counter()).update(palabras)
+    return conteos
+
+def pools_desde_kb(kb, solo: Optional[Iterable[Tuple[str, str]]] = None) -> Dict[Tuple[str, str], PoolDistractores]:
+    return {clave: PoolDistractores(dict(veces)) for clave, veces in frecuencias_desde_kb(kb, solo).items()}
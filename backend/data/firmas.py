@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🔏 FIRMAS DE EJERCICIOS - SpeakLexi 2.0
+Hash estable del contenido de cada ejercicio, guardado en ejercicios.firma.
+Los generadores lo calculan al insertar y limpiar-duplicados detecta repetidos
+con un GROUP BY leccion_id, firma en vez de recorrer la tabla en Python.
+Un trigger vacía la firma cuando otro cliente (la API de Node) cambia el
+contenido o el tipo; rellenar_firmas la vuelve a calcular.
+
+La columna, el índice y el trigger se crean una sola vez, a mano (en MySQL el
+trigger necesita el privilegio TRIGGER). Los scripts solo verifican que la
+columna exista:
+
+    python firmas.py --migrar                 # MySQL (DB_HOST/DB_USER/DB_PASS/DB_NAME)
+    python firmas.py --migrar --rellenar --destino sqlite:local.db
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+import almacen
+from typing import Any, Dict, List
+
+COLUMNA_FIRMA = 'firma'
+INDICE_FIRMA = 'idx_ejercicios_leccion_firma'
+TRIGGER_FIRMA = 'trg_ejercicios_firma_obsoleta'
+
+def _canonico(valor: Any) -> str:
+    return json.dumps(valor, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+
+def clave_ejercicio(tipo: str, contenido: Any) -> str:
+    """
+    Texto que identifica a un ejercicio repetido dentro de una lección: la pregunta,
+    las afirmaciones, el texto, los pares o las instrucciones según el tipo.
+    Si el contenido no tiene la forma esperada se usa el JSON canónico completo.
+    """
+    if isinstance(contenido, (str, bytes)):
+        try:
+            contenido = json.loads(contenido)
+        except (TypeError, ValueError):
+            return f"{tipo}:{contenido}"
+    if not isinstance(contenido, dict):
+        return f"{tipo}:{_canonico(contenido)}"
+
+    try:
+        if tipo == 'seleccion_multiple' and contenido.get('preguntas'):
+            return f"{tipo}:{contenido['preguntas'][0]['pregunta']}"
+        if tipo == 'verdadero_falso' and 'afirmaciones' in contenido:
+            return f"{tipo}:{'|'.join(sorted(contenido['afirmaciones']))}"
+        if tipo == 'completar_espacios' and 'texto' in contenido:
+            return f"{tipo}:{contenido['texto']}"
+        if tipo == 'emparejamiento' and 'pares' in contenido:
+            pares = sorted(f"{p['izquierda']}-{p['derecha']}" for p in contenido['pares'])
+            return f"{tipo}:{'|'.join(pares)}"
+        if tipo == 'escritura' and 'instrucciones' in contenido:
+            return f"{tipo}:{contenido['instrucciones']}"
+    except (KeyError, IndexError, TypeError):
+        pass
+
+    return f"{tipo}:{_canonico(contenido)}"
+
+def firma_ejercicio(tipo: str, contenido: Any) -> str:
+    """blake2b de 16 bytes (32 hex) de la clave del ejercicio"""
+    return hashlib.blake2b(clave_ejercicio(tipo, contenido).encode('utf-8'), digest_size=16).hexdigest()
+
+def quitar_repetidos(ejercicios: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Descarta los ejercicios cuya firma ya apareció en el set (se queda el primero)
+    y renumera 'orden' de forma consecutiva. Agrega 'firma' a cada ejercicio.
+    """
+    vistos = set()
+    unicos = []
+    for e in ejercicios:
+        firma = firma_ejercicio(e.get('tipo'), e.get('contenido', {}))
+        if firma in vistos:
+            continue
+        vistos.add(firma)
+        e['firma'] = firma
+        unicos.append(e)
+
+    if len(unicos) < len(ejercicios) and unicos:
+        inicio = min(e.get('orden', 1) for e in ejercicios)
+        for i, e in enumerate(unicos):
+            e['orden'] = inicio + i
+    return unicos
+
+class SinColumnaFirma(RuntimeError):
+    """La tabla ejercicios todavía no tiene la columna firma (falta la migración)"""
+
+    def __init__(self):
+        super().__init__(f"Falta la columna ejercicios.{COLUMNA_FIRMA}: ejecuta una vez "
+                         f"'python firmas.py --migrar' sobre esta base de datos")
+
+def tiene_columna_firma(cursor) -> bool:
+    if almacen.dialecto(cursor) == 'sqlite':
+        cursor.execute("PRAGMA table_info(ejercicios)")
+        return COLUMNA_FIRMA in [f['name'] if isinstance(f, dict) else f[1] for f in cursor.fetchall()]
+    cursor.execute("""
+        SELECT COUNT(*) AS cnt FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'ejercicios' AND COLUMN_NAME = %s
+    """, (COLUMNA_FIRMA,))
+    fila = cursor.fetchone()
+    return bool(fila['cnt'] if isinstance(fila, dict) else fila[0])
+
+def verificar_columna_firma(cursor) -> None:
+    """Lo llaman los scripts antes de escribir: no tocan el esquema, fallan con SinColumnaFirma"""
+    if not tiene_columna_firma(cursor):
+        raise SinColumnaFirma()
+
+def migrar(cursor) -> bool:
+    """
+    Crea la columna firma, el índice (leccion_id, firma) y el trigger si faltan.
+    Solo desde `python firmas.py --migrar`. Devuelve True si cambió algo.
+    """
+    if almacen.dialecto(cursor) == 'sqlite':
+        return _migrar_sqlite(cursor)
+    cambios = False
+    if not tiene_columna_firma(cursor):
+        cursor.execute(f"ALTER TABLE ejercicios ADD COLUMN {COLUMNA_FIRMA} CHAR(32) NULL")
+        cambios = True
+
+    cursor.execute("""
+        SELECT COUNT(*) AS cnt FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'ejercicios' AND INDEX_NAME = %s
+    """, (INDICE_FIRMA,))
+    if not cursor.fetchone()['cnt']:
+        cursor.execute(f"CREATE INDEX {INDICE_FIRMA} ON ejercicios (leccion_id, {COLUMNA_FIRMA})")
+        cambios = True
+
+    cursor.execute("""
+        SELECT COUNT(*) AS cnt FROM information_schema.TRIGGERS
+        WHERE TRIGGER_SCHEMA = DATABASE() AND TRIGGER_NAME = %s
+    """, (TRIGGER_FIRMA,))
+    if not cursor.fetchone()['cnt']:
+        # Una sola sentencia: no hace falta cambiar el DELIMITER
+        cursor.execute(f"""
+            CREATE TRIGGER {TRIGGER_FIRMA} BEFORE UPDATE ON ejercicios FOR EACH ROW
+            SET NEW.{COLUMNA_FIRMA} = IF(NEW.contenido <=> OLD.contenido AND NEW.tipo <=> OLD.tipo,
+                                         NEW.{COLUMNA_FIRMA}, NULL)
+        """)
+        cambios = True
+    return cambios
+
+def _migrar_sqlite(cursor) -> bool:
+    nueva = not tiene_columna_firma(cursor)
+    if nueva:
+        cursor.execute(f"ALTER TABLE ejercicios ADD COLUMN {COLUMNA_FIRMA} TEXT")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {INDICE_FIRMA} ON ejercicios (leccion_id, {COLUMNA_FIRMA})")
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {TRIGGER_FIRMA} AFTER UPDATE OF contenido, tipo ON ejercicios
+        FOR EACH ROW WHEN NEW.contenido IS NOT OLD.contenido OR NEW.tipo IS NOT OLD.tipo
+        BEGIN
+            UPDATE ejercicios SET {COLUMNA_FIRMA} = NULL WHERE id = NEW.id;
+        END
+    """)
+    return nueva
+
+def rellenar_firmas(conn, cursor, lote: int = 1000) -> int:
+    """
+    Calcula la firma de los ejercicios que aún no la tienen (insertados por otras vías).
+    Confirma cada lote: no mantiene una transacción abierta sobre toda la tabla.
+    """
+    total = 0
+    ultimo_id = 0
+    while True:
+        cursor.execute(f"""
+            SELECT id, tipo, contenido FROM ejercicios
+            WHERE {COLUMNA_FIRMA} IS NULL AND id > %s
+            ORDER BY id LIMIT %s
+        """, (ultimo_id, lote))
+        filas = cursor.fetchall()
+        if not filas:
+            return total
+        cursor.executemany(
+            f"UPDATE ejercicios SET {COLUMNA_FIRMA} = %s WHERE id = %s",
+            [(firma_ejercicio(f['tipo'], f['contenido'] or {}), f['id']) for f in filas]
+        )
+        conn.commit()
+        ultimo_id = filas[-1]['id']
+        total += len(filas)
+
+def _json_columna(valor: Any) -> Any:
+    """contenido/respuesta_correcta como objeto, vengan de la BD (texto) o del generador"""
+    if isinstance(valor, (str, bytes)):
+        try:
+            return json.loads(valor) if valor else {}
+        except ValueError:
+            return valor
+    return {} if valor is None else valor
+
+def huella_set(ejercicios: List[Dict[str, Any]]) -> str:
+    """
+    Hash del set de ejercicios de una lección (titulo, descripcion, tipo, contenido,
+    respuesta_correcta, puntos_maximos y orden de cada uno). Los JSON se comparan
+    parseados: el formato con que se guardaron no cuenta. Lo usan los dos
+    generadores para saber si un set regenerado es igual al de la BD.
+    """
+    items = sorted(
+        [[e.get('titulo'), e.get('descripcion'), e.get('tipo'), _json_columna(e.get('contenido')),
+          _json_columna(e.get('respuesta_correcta')), e.get('puntos_maximos') or 0, e.get('orden') or 0]
+         for e in ejercicios],
+        key=lambda item: item[6]
+    )
+    canonico = json.dumps(items, sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(canonico.encode('utf-8'), digest_size=16).hexdigest()
+
+def consulta_huellas(leccion_ids: List[int]) -> str:
+    placeholders = ','.join(['%s'] * len(leccion_ids))
+    return f"""
+        SELECT leccion_id, titulo, descripcion, tipo, contenido,
+               respuesta_correcta, puntos_maximos, orden
+        FROM ejercicios
+        WHERE leccion_id IN ({placeholders})
+    """
+
+def agrupar_huellas(filas: List[Dict[str, Any]]) -> Dict[int, str]:
+    """{leccion_id: huella_set} de las filas de consulta_huellas"""
+    por_leccion: Dict[int, List[Dict[str, Any]]] = {}
+    for r in filas:
+        por_leccion.setdefault(r['leccion_id'], []).append(r)
+    return {leccion_id: huella_set(ejs) for leccion_id, ejs in por_leccion.items()}
+
+def huellas_existentes(cursor, leccion_ids: List[int]) -> Dict[int, str]:
+    """Hash del set de ejercicios guardado en BD para cada lección"""
+    if not leccion_ids:
+        return {}
+    cursor.execute(consulta_huellas(leccion_ids), leccion_ids)
+    return agrupar_huellas(cursor.fetchall())
+
+def firmas_vigentes(filas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Vuelve a calcular la firma desde tipo y contenido de cada fila (con 'firma'
+    guardada) y devuelve las que no coinciden, con 'firma' ya corregida.
+    """
+    obsoletas = []
+    for f in filas:
+        actual = firma_ejercicio(f['tipo'], f['contenido'] or {})
+        if actual != f['firma']:
+            f['firma'] = actual
+            obsoletas.append(f)
+    return obsoletas
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migración de la columna ejercicios.firma")
+    parser.add_argument("--migrar", action="store_true",
+                        help="Crear columna, índice y trigger (una sola vez por base de datos)")
+    parser.add_argument("--rellenar", action="store_true",
+                        help="Calcular la firma de los ejercicios que no la tienen")
+    parser.add_argument("--destino", type=str,
+                        default=f"sqlite:{os.getenv(almacen.ENV_SQLITE)}" if almacen.usa_sqlite() else "mysql",
+                        help="mysql o sqlite:ruta.db (default: SPEAKLEXI_SQLITE o mysql)")
+    parser.add_argument("--lote", type=int, default=1000)
+    args = parser.parse_args(argv)
+    if not args.migrar and not args.rellenar:
+        parser.error("indica --migrar y/o --rellenar")
+
+    conn = almacen.abrir(args.destino)
+    try:
+        cursor = conn.cursor()
+        if args.migrar:
+            if migrar(cursor):
+                print(f"🔏 Columna ejercicios.{COLUMNA_FIRMA}, índice y trigger creados en {args.destino}")
+            else:
+                print(f"✅ {args.destino} ya estaba migrada")
+            conn.commit()
+        if args.rellenar:
+            verificar_columna_firma(cursor)
+            print(f"🔏 {rellenar_firmas(conn, cursor, max(1, args.lote))} firmas calculadas")
+        cursor.close()
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error: {e}")
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -8,13 +8,28 @@ Genera ejercicios usando knowledge_base.json después de sincronización
 from __future__ import annotations
 import os
 import sys
+import time
 import json
+import asyncio
 import random
+import hashlib
 import argparse
 import getpass
 import pymysql
+import kb_cache
+import almacen
+import firmas
+import banco
+import validar_kb
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import groupby
 from typing import List, Dict, Any, Optional, Tuple
 
+try:
+    import aiomysql
+except ImportError:
+    aiomysql = None
+
 # DB Config
 DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_USER = os.getenv("DB_USER", "root")
@@ -31,38 +46,29 @@ except NameError:
 KB_DIR = os.path.join(SCRIPT_DIR, 'kb')
 KB = {}
 
+# Subir al cambiar plantillas o lógica de generación: invalida las huellas guardadas
+GENERADOR_VERSION = "5.1"
+MANIFIESTO_HUELLAS = os.path.join(SCRIPT_DIR, f"huellas_{DB_NAME}.json")
+
 def cargar_knowledge_base():
     global KB
     
     print("🔍 Cargando Knowledge Base...")
     
-    archivos_kb = {
-        'Inglés': os.path.join(KB_DIR, 'kb_ingles.json'),
-        'Francés': os.path.join(KB_DIR, 'kb_frances.json'),
-        'Alemán': os.path.join(KB_DIR, 'kb_aleman.json'),
-        'Italiano': os.path.join(KB_DIR, 'kb_italiano.json')
-    }
+    kb = kb_cache.cargar_kb(KB_DIR)
+    for idioma, error in kb.errores.items():
+        print(f"  ⚠️  Error cargando {idioma}: {error}")
     
-    archivos_cargados = 0
-    for idioma, path in archivos_kb.items():
-        if os.path.exists(path):
-            try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    KB[idioma] = data.get(idioma, data)
-                    
-                    # Contar lecciones
-                    total_lecciones = sum(len(temas) for temas in KB[idioma].values())
-                    print(f"  ✅ {idioma}: {total_lecciones} lecciones")
-                    archivos_cargados += 1
-            except Exception as e:
-                print(f"  ⚠️  Error cargando {idioma}: {e}")
+    KB.update(kb.datos)
+    for idioma in kb.datos:
+        print(f"  ✅ {idioma}: {kb.total_lecciones(idioma)} lecciones")
     
-    if archivos_cargados == 0:
+    if not kb.datos:
         print(f"\n❌ ERROR: No se encontraron archivos KB en {KB_DIR}")
         return False
     
-    print(f"\n✅ KB cargado: {archivos_cargados} idiomas\n")
+    origen = "caché" if kb.desde_cache else "JSON"
+    print(f"\n✅ KB cargado ({origen}): {len(kb.datos)} idiomas\n")
     return True
 
 def get_db_password():
@@ -73,8 +79,8 @@ def get_db_password():
 
 def conectar_bd():
     try:
-        pwd = get_db_password()
-        conn = pymysql.connect(
+        pwd = get_db_password() if not almacen.usa_sqlite() else None
+        conn = almacen.conectar(
             host=DB_HOST, user=DB_USER, password=pwd,
             database=DB_NAME, charset=DB_CHARSET,
             cursorclass=pymysql.cursors.DictCursor,
@@ -87,7 +93,7 @@ def conectar_bd():
         sys.exit(1)
 
 class GeneradorConKB:
-    def __init__(self, leccion_row: Dict[str, Any], verbose=False):
+    def __init__(self, leccion_row: Dict[str, Any], verbose=False, seed: Optional[int] = None):
         self.row = leccion_row
         self.id = leccion_row.get('id')
         self.titulo = leccion_row.get('titulo') or 'Untitled'
@@ -118,6 +124,13 @@ class GeneradorConKB:
         self.frases_clave = self.kb_leccion.get('frases_clave', [])
         self.ejemplos = self.kb_leccion.get('ejemplos', {})
         
+        # Con --seed cada lección tiene su propio Random: (seed, id, hash del nodo KB)
+        self.huella_kb = kb_cache.huella_nodo(self.kb_leccion)
+        if seed is None:
+            self.rng = random.Random()
+        else:
+            self.rng = random.Random(f"{seed}:{self.id}:{self.huella_kb}")
+        
         self.puntos = {'A1':5,'A2':7,'B1':10,'B2':12,'C1':15,'C2':20}
         if self.nivel not in self.puntos:
             self.nivel = 'A1'
@@ -130,14 +143,14 @@ class GeneradorConKB:
             correct_idx = 0
         correct_val = options[correct_idx]
         shuffled = options[:]
-        random.shuffle(shuffled)
+        self.rng.shuffle(shuffled)
         return shuffled, shuffled.index(correct_val)
 
     def gen_multiple_choice(self, orden: int) -> Dict[str,Any]:
         ejemplos_mc = self.ejemplos.get('seleccion_multiple', [])
         
-        if ejemplos_mc and random.random() < 0.7:
-            ejemplo = random.choice(ejemplos_mc)
+        if ejemplos_mc and self.rng.random() < 0.7:
+            ejemplo = self.rng.choice(ejemplos_mc)
             opciones = ejemplo['opciones']
             correcta = ejemplo['correcta']
             opts_shuffled, new_idx = self._shuffle_with_correct(opciones, correcta)
@@ -146,7 +159,7 @@ class GeneradorConKB:
             respuesta = {"respuestas": [new_idx]}
         else:
             if self.vocabulario:
-                palabra = random.choice(self.vocabulario)
+                palabra = self.rng.choice(self.vocabulario)
                 pregunta = f"What does '{palabra}' mean?"
                 correcta = f"Definition of {palabra}"
                 opciones = [correcta, f"Opposite of {palabra}", f"Synonym of {palabra}", "None"]
@@ -173,11 +186,11 @@ class GeneradorConKB:
         ejemplos_tf = self.ejemplos.get('verdadero_falso', [])
         
         if ejemplos_tf and len(ejemplos_tf) >= 3:
-            sample = random.sample(ejemplos_tf, 3)
+            sample = self.rng.sample(ejemplos_tf, 3)
             afirmaciones = [e['afirmacion'] for e in sample]
             respuestas = [e['respuesta'] for e in sample]
         else:
-            tema = random.choice(self.vocabulario) if self.vocabulario else "this topic"
+            tema = self.rng.choice(self.vocabulario) if self.vocabulario else "this topic"
             afirmaciones = [
                 f"Practice improves mastery of {tema}",
                 f"{tema} is important in {self.idioma}",
@@ -201,16 +214,16 @@ class GeneradorConKB:
     def gen_fill_blanks(self, orden: int) -> Dict[str,Any]:
         ejemplos_fill = self.ejemplos.get('completar_espacios', [])
         
-        if ejemplos_fill and random.random() < 0.7:
-            ejemplo = random.choice(ejemplos_fill)
+        if ejemplos_fill and self.rng.random() < 0.7:
+            ejemplo = self.rng.choice(ejemplos_fill)
             texto = ejemplo['texto']
             respuestas = ejemplo['respuestas']
         else:
             if self.frases_clave:
-                frase = random.choice(self.frases_clave)
+                frase = self.rng.choice(self.frases_clave)
                 palabras = frase.split()
                 if len(palabras) >= 3:
-                    idx1 = random.randint(0, len(palabras)-1)
+                    idx1 = self.rng.randint(0, len(palabras)-1)
                     respuesta1 = palabras[idx1]
                     palabras[idx1] = '___'
                     texto = ' '.join(palabras)
@@ -219,7 +232,7 @@ class GeneradorConKB:
                     texto = f"Complete: {frase} ___"
                     respuestas = ["word"]
             elif self.vocabulario:
-                palabra = random.choice(self.vocabulario)
+                palabra = self.rng.choice(self.vocabulario)
                 texto = f"Fill in the blank: In this lesson we study ___"
                 respuestas = [palabra]
             else:
@@ -243,10 +256,10 @@ class GeneradorConKB:
         ejemplos_match = self.ejemplos.get('emparejamiento', [])
         
         if ejemplos_match and len(ejemplos_match) >= 3:
-            pairs = random.sample(ejemplos_match, min(3, len(ejemplos_match)))
+            pairs = self.rng.sample(ejemplos_match, min(3, len(ejemplos_match)))
         else:
             if self.vocabulario and len(self.vocabulario) >= 3:
-                words = random.sample(self.vocabulario, 3)
+                words = self.rng.sample(self.vocabulario, 3)
                 pairs = [{"izquierda": w, "derecha": f"definition of {w}"} for w in words]
             else:
                 pairs = [
@@ -275,16 +288,16 @@ class GeneradorConKB:
         # Intentar obtener prompt desde KB
         ejemplos_writing = self.ejemplos.get('escritura', [])
         
-        if ejemplos_writing and random.random() < 0.7:
+        if ejemplos_writing and self.rng.random() < 0.7:
             # Usar prompt desde KB
-            ejemplo = random.choice(ejemplos_writing)
+            ejemplo = self.rng.choice(ejemplos_writing)
             prompt = ejemplo.get('instrucciones', '')
             if not prompt:
                 prompt = ejemplo.get('prompt', '')
         else:
             # Generar prompt basado en vocabulario del tema
             if self.vocabulario and len(self.vocabulario) > 0:
-                tema = random.choice(self.vocabulario[:5])  # Tomar palabra del tema
+                tema = self.rng.choice(self.vocabulario[:5])  # Tomar palabra del tema
                 
                 if self.nivel == 'A1':
                     prompts = [
@@ -317,7 +330,7 @@ class GeneradorConKB:
                         f"Evaluate the role of {tema} in contemporary culture. Minimum {wc} words."
                     ]
                 
-                prompt = random.choice(prompts)
+                prompt = self.rng.choice(prompts)
             else:
                 # Fallback genérico
                 if self.nivel == 'A1':
@@ -366,23 +379,41 @@ class GeneradorConKB:
         
         return ejercicios
 
-def count_existing_exercises(cursor, leccion_id: int) -> int:
-    cursor.execute("SELECT COUNT(*) AS cnt FROM ejercicios WHERE leccion_id = %s", (leccion_id,))
-    r = cursor.fetchone()
-    return int(r['cnt']) if r else 0
+LECCIONES_POR_LOTE = 100
 
-def delete_existing_exercises(cursor, leccion_id: int) -> None:
-    cursor.execute("DELETE FROM ejercicios WHERE leccion_id = %s", (leccion_id,))
+def contar_ejercicios_por_leccion(cursor, filtro_lecciones: str, params: Tuple) -> Dict[int, int]:
+    """Cuenta los ejercicios de todas las lecciones filtradas con un solo GROUP BY"""
+    cursor.execute(f"""
+        SELECT leccion_id, COUNT(*) AS cnt
+        FROM ejercicios
+        WHERE leccion_id IN (SELECT id FROM lecciones WHERE {filtro_lecciones})
+        GROUP BY leccion_id
+    """, params)
+    return {r['leccion_id']: int(r['cnt']) for r in cursor.fetchall()}
 
-def insertar_ejercicio(cursor, leccion_id: int, ejercicio: Dict[str,Any], creador_id: int) -> int:
-    q = """
+def consulta_borrado(leccion_ids: List[int]) -> str:
+    return f"DELETE FROM ejercicios WHERE leccion_id IN ({','.join(['%s'] * len(leccion_ids))})"
+
+def borrar_ejercicios_lecciones(cursor, leccion_ids: List[int]) -> int:
+    if not leccion_ids:
+        return 0
+    cursor.execute(consulta_borrado(leccion_ids), leccion_ids)
+    return cursor.rowcount
+
+INSERT_EJERCICIOS = """
     INSERT INTO ejercicios (
       leccion_id, titulo, descripcion, tipo,
       contenido, respuesta_correcta, puntos_maximos,
-      orden, estado, creado_por, creado_en
-    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 'activo', %s, NOW())
-    """
-    vals = (
+      orden, estado, creado_por, creado_en, firma
+    ) VALUES """
+FILA_EJERCICIO = "(%s, %s, %s, %s, %s, %s, %s, %s, 'activo', %s, NOW(), %s)"
+
+def insert_multifila(filas: List[Tuple]) -> Tuple[str, List[Any]]:
+    """Un INSERT con todas las filas y sus parámetros aplanados"""
+    return INSERT_EJERCICIOS + ", ".join([FILA_EJERCICIO] * len(filas)), [v for fila in filas for v in fila]
+
+def fila_ejercicio(leccion_id: int, ejercicio: Dict[str,Any], creador_id: int) -> Tuple:
+    return (
         leccion_id,
         ejercicio.get('titulo'),
         ejercicio.get('descripcion'),
@@ -391,11 +422,435 @@ def insertar_ejercicio(cursor, leccion_id: int, ejercicio: Dict[str,Any], creado
         json.dumps(ejercicio.get('respuesta_correcta', {}), ensure_ascii=False),
         ejercicio.get('puntos_maximos', 0),
         ejercicio.get('orden', 0),
-        creador_id
+        creador_id,
+        ejercicio.get('firma') or firmas.firma_ejercicio(ejercicio.get('tipo'), ejercicio.get('contenido', {}))
     )
-    cursor.execute(q, vals)
+
+def insertar_ejercicio(cursor, leccion_id: int, ejercicio: Dict[str,Any], creador_id: int) -> int:
+    cursor.execute(INSERT_EJERCICIOS + FILA_EJERCICIO, fila_ejercicio(leccion_id, ejercicio, creador_id))
     return cursor.lastrowid
 
+class EscritorEjercicios:
+    """
+    Acumula ejercicios y los inserta con un INSERT multi-fila por lote.
+    Solo vacía el buffer entre lecciones, así cada commit deja lecciones completas.
+    Con confirmar=False los INSERT quedan en la transacción abierta y el commit
+    lo hace quien llama (p. ej. junto con el DELETE de --overwrite).
+    """
+    def __init__(self, conn, cursor, batch_size: int = 500):
+        self.conn = conn
+        self.cursor = cursor
+        self.batch_size = max(1, batch_size)
+        self.pendientes: List[Tuple] = []
+        self.total = 0
+        self.lotes = 0
+
+    def agregar_leccion(self, leccion_id: int, ejercicios: List[Dict[str,Any]], creador_id: int) -> None:
+        self.agregar_filas([fila_ejercicio(leccion_id, e, creador_id) for e in ejercicios])
+
+    def agregar_filas(self, filas: List[Tuple], confirmar: bool = True) -> None:
+        """Agrega las filas ya serializadas de una lección completa"""
+        self.pendientes.extend(filas)
+        if len(self.pendientes) >= self.batch_size:
+            self.flush(confirmar)
+
+    def flush(self, confirmar: bool = True) -> int:
+        if not self.pendientes:
+            return 0
+        filas = self.pendientes
+        self.cursor.execute(*insert_multifila(filas))
+        if confirmar:
+            self.conn.commit()
+        self.pendientes = []
+        self.total += len(filas)
+        self.lotes += 1
+        return len(filas)
+
+def generar_lote(lecciones: List[Dict[str,Any]], verbose: bool = False,
+                 seed: Optional[int] = None, variantes: int = 0) -> List[Dict[str,Any]]:
+    """
+    Genera y serializa los ejercicios de un lote de lecciones.
+    Con `variantes` > 0 genera hasta ese número de ejercicios distintos por lección (banco).
+    Corre igual en el proceso principal o en un worker del pool.
+    """
+    resultado = []
+    for lesson in lecciones:
+        gen = GeneradorConKB(lesson, verbose=verbose, seed=seed)
+        if variantes:
+            ejercicios = list(banco.variantes(gen, variantes))
+        else:
+            # Un set no debe repetir ejercicios: se descartan al escribir, no en limpiar-duplicados
+            ejercicios = firmas.quitar_repetidos(gen.generar_set(start_order=1))
+        creador = lesson.get('creado_por') or 1
+        resultado.append({
+            'id': lesson.get('id'),
+            'titulo': gen.titulo,
+            'con_kb': bool(gen.kb_leccion),
+            'huella': firmas.huella_set(ejercicios),
+            'filas': [fila_ejercicio(lesson.get('id'), e, creador) for e in ejercicios]
+        })
+    return resultado
+
+def _init_worker():
+    # Con spawn (Windows) el worker arranca sin KB: se carga desde la caché compilada
+    if not KB:
+        KB.update(kb_cache.cargar_kb(KB_DIR).datos)
+
+def huella_generacion(lesson: Dict[str,Any], seed: Optional[int] = None, variantes: int = 0) -> str:
+    """Huella de todo lo que determina los ejercicios de una lección: nodo KB + versión + seed (+ variantes)"""
+    titulo = lesson.get('titulo') or 'Untitled'
+    nivel = (lesson.get('nivel') or 'A1').upper()
+    idioma = lesson.get('idioma') or 'Inglés'
+    nodo = KB.get(idioma, {}).get(nivel, {}).get(titulo, {})
+    fuente = f"{GENERADOR_VERSION}|{idioma}|{nivel}|{titulo}|{seed}|{kb_cache.huella_nodo(nodo)}"
+    if variantes:
+        fuente += f"|v{variantes}"
+    return hashlib.blake2b(fuente.encode('utf-8'), digest_size=16).hexdigest()
+
+def cargar_manifiesto(path: str) -> Dict[str, str]:
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('lecciones', {})
+    except Exception as e:
+        print(f"⚠️  Manifiesto de huellas ilegible ({e}), se regenerará todo")
+        return {}
+
+def guardar_manifiesto(path: str, huellas: Dict[str, str]) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({
+            'generador': GENERADOR_VERSION,
+            'base_datos': DB_NAME,
+            'lecciones': huellas
+        }, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+def particionar_lecciones(lessons: List[Dict[str,Any]], tamano: int) -> List[List[Dict[str,Any]]]:
+    """Agrupa por (idioma, nivel) respetando el orden de la consulta, en lotes de `tamano`"""
+    lotes = []
+    for _, grupo in groupby(lessons, key=lambda l: (l.get('idioma'), l.get('nivel'))):
+        grupo = list(grupo)
+        for i in range(0, len(grupo), tamano):
+            lotes.append(grupo[i:i + tamano])
+    return lotes
+
+def consulta_lecciones(args) -> Tuple[str, List[Any], str, List[Any]]:
+    """(filtro, params, consulta, params de la consulta) de las lecciones a generar según los flags"""
+    filtro = "estado = 'activa'"
+    params = []
+    if args.idioma:
+        filtro += " AND idioma = %s"
+        params.append(args.idioma)
+    if args.nivel:
+        filtro += " AND nivel = %s"
+        params.append(args.nivel.upper())
+    q = f"SELECT id, titulo, descripcion, contenido, nivel, idioma, creado_por FROM lecciones WHERE {filtro}"
+    q += " ORDER BY nivel, idioma, orden"
+    q_params = list(params)
+    if args.limit and args.limit > 0:
+        q += " LIMIT %s"
+        q_params.append(args.limit)
+    return filtro, params, q, q_params
+
+def resultados_en_paralelo(executor, lotes: List[List[Dict[str,Any]]], *args, en_vuelo: int = 4):
+    """
+    Resultados de generar_lote a medida que terminan, con como mucho `en_vuelo`
+    lotes pendientes: la memoria no crece con el número de lotes.
+    """
+    pendientes = set()
+    siguiente = iter(lotes)
+    for lote in siguiente:
+        pendientes.add(executor.submit(generar_lote, lote, *args))
+        if len(pendientes) >= en_vuelo:
+            break
+    while pendientes:
+        listos, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+        for futuro in listos:
+            lote = next(siguiente, None)
+            if lote is not None:
+                pendientes.add(executor.submit(generar_lote, lote, *args))
+            yield futuro.result()
+
+# ============================================
+# MODO ASYNC (--async)
+# ============================================
+# Lectura, generación y escritura se solapan: un lector va pasando lotes de
+# lecciones a una cola acotada, la generación corre en procesos y varios
+# escritores (cada uno con su conexión) insertan y confirman lote por lote.
+# Con aiomysql las conexiones son asíncronas de verdad; sin él (o con el SQLite
+# de almacen) cada conexión bloqueante corre en su propio hilo.
+
+class CursorEnHilo:
+    """Cursor bloqueante con la interfaz awaitable de aiomysql"""
+    def __init__(self, conexion: 'ConexionEnHilo', cursor):
+        self._conexion = conexion
+        self._cursor = cursor
+
+    @property
+    def rowcount(self) -> int:
+        return self._cursor.rowcount
+
+    async def execute(self, q, params=None):
+        return await self._conexion._correr(self._cursor.execute, q, params)
+
+    async def fetchmany(self, n: int):
+        return await self._conexion._correr(self._cursor.fetchmany, n)
+
+    async def fetchall(self):
+        return await self._conexion._correr(self._cursor.fetchall)
+
+    async def close(self):
+        await self._conexion._correr(self._cursor.close)
+
+class ConexionEnHilo:
+    """
+    Conexión pymysql (o SQLite) usada desde asyncio. Todas sus llamadas, incluida
+    la apertura, corren en un único hilo propio: el driver nunca ve dos hilos.
+    """
+    def __init__(self):
+        self._hilo = ThreadPoolExecutor(max_workers=1)
+        self._conn = None
+
+    async def _correr(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._hilo, fn, *args)
+
+    async def abrir(self) -> 'ConexionEnHilo':
+        self._conn = await self._correr(nueva_conexion_bloqueante)
+        return self
+
+    async def cursor(self, cursorclass=None) -> CursorEnHilo:
+        cursor = await self._correr(self._conn.cursor, cursorclass)
+        return CursorEnHilo(self, cursor)
+
+    async def commit(self):
+        await self._correr(self._conn.commit)
+
+    async def rollback(self):
+        await self._correr(self._conn.rollback)
+
+    async def cerrar(self):
+        await self._correr(self._conn.close)
+        self._hilo.shutdown()
+
+def nueva_conexion_bloqueante():
+    """Conexión propia (nunca la compartida de speaklexi-data: aquí hay varias en paralelo)"""
+    ruta = os.getenv(almacen.ENV_SQLITE)
+    if ruta:
+        return almacen.conectar_sqlite(ruta)
+    return pymysql.connect(host=DB_HOST, user=DB_USER, password=get_db_password(),
+                           database=DB_NAME, charset=DB_CHARSET, autocommit=False)
+
+def usa_aiomysql() -> bool:
+    return aiomysql is not None and not almacen.usa_sqlite()
+
+def clases_cursor() -> Tuple[Any, Any]:
+    """(DictCursor, SSDictCursor) del driver en uso"""
+    if usa_aiomysql():
+        return aiomysql.DictCursor, aiomysql.SSDictCursor
+    return pymysql.cursors.DictCursor, pymysql.cursors.SSDictCursor
+
+async def abrir_conexion_async():
+    if usa_aiomysql():
+        return await aiomysql.connect(host=DB_HOST, user=DB_USER, password=get_db_password(),
+                                      db=DB_NAME, charset=DB_CHARSET, autocommit=False)
+    return await ConexionEnHilo().abrir()
+
+async def cerrar_conexion_async(conn) -> None:
+    if isinstance(conn, ConexionEnHilo):
+        await conn.cerrar()
+    else:
+        conn.close()
+
+async def leer_lecciones_async(args, q: str, q_params: List[Any], cola: asyncio.Queue,
+                               por_lote: int, consumidores: int, seleccionar, stats: Dict[str, Any]) -> None:
+    """Lee las lecciones con un cursor del servidor y encola lotes filtrados por `seleccionar`"""
+    _, ss_dict = clases_cursor()
+    conn = await abrir_conexion_async()
+    try:
+        cursor = await conn.cursor(ss_dict)
+        await cursor.execute(q, tuple(q_params))
+        # SQLite no deja escribir mientras hay una lectura abierta: se lee todo de una vez
+        pendientes = list(await cursor.fetchall()) if almacen.usa_sqlite() else []
+        while True:
+            if almacen.usa_sqlite():
+                filas, pendientes = pendientes[:por_lote], pendientes[por_lote:]
+            else:
+                filas = await cursor.fetchmany(por_lote)
+            if not filas:
+                break
+            stats['leidas'] += len(filas)
+            lote = seleccionar(list(filas))
+            if lote:
+                stats['seleccionadas'] += len(lote)
+                await cola.put(lote)
+        await cursor.close()
+    finally:
+        for _ in range(consumidores):
+            await cola.put(None)
+        await cerrar_conexion_async(conn)
+
+async def generar_async(executor, args, entrada: asyncio.Queue, salida: asyncio.Queue,
+                        stats: Dict[str, Any]) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        lote = await entrada.get()
+        if lote is None:
+            return
+        inicio = time.perf_counter()
+        resultado = await loop.run_in_executor(executor, generar_lote, lote, args.verbose, args.seed, args.variants)
+        stats['t_generacion'] += time.perf_counter() - inicio
+        await salida.put(resultado)
+
+async def escribir_async(args, cola: asyncio.Queue, existentes: Dict[int, int], stats: Dict[str, Any]) -> None:
+    """Borra (con --overwrite), inserta en INSERT multi-fila y confirma cada lote recibido"""
+    dict_cursor, _ = clases_cursor()
+    conn = None if args.dry_run else await abrir_conexion_async()
+    try:
+        cursor = await conn.cursor(dict_cursor) if conn else None
+        while True:
+            resultado = await cola.get()
+            if resultado is None:
+                break
+            inicio = time.perf_counter()
+            if args.overwrite and conn:
+                con_existentes = [r['id'] for r in resultado if existentes.get(r['id'])]
+                if args.seed is not None and con_existentes:
+                    await cursor.execute(firmas.consulta_huellas(con_existentes), con_existentes)
+                    previas = firmas.agrupar_huellas(await cursor.fetchall())
+                    iguales = {r['id'] for r in resultado if previas.get(r['id']) == r['huella']}
+                    resultado = [r for r in resultado if r['id'] not in iguales]
+                    con_existentes = [i for i in con_existentes if i not in iguales]
+                    stats['sin_cambios'] += len(iguales)
+                if con_existentes:
+                    await cursor.execute(consulta_borrado(con_existentes), con_existentes)
+
+            filas = []
+            for r in resultado:
+                stats['con_kb' if r['con_kb'] else 'sin_kb'] += len(r['filas'])
+                if args.dry_run:
+                    print(f"📖 {r['titulo']} → {len(r['filas'])} ejercicios")
+                filas.extend(r['filas'])
+            if conn:
+                for i in range(0, len(filas), max(1, args.batch_size)):
+                    await cursor.execute(*insert_multifila(filas[i:i + args.batch_size]))
+                    stats['lotes'] += 1
+                await conn.commit()
+                stats['insertados'] += len(filas)
+            stats['lecciones'] += len(resultado)
+            stats['t_escritura'] += time.perf_counter() - inicio
+            if conn and stats['lecciones'] // 100 != (stats['lecciones'] - len(resultado)) // 100:
+                print(f"   ✓ {stats['lecciones']} lecciones ({stats['insertados']} ejercicios)")
+        if cursor:
+            await cursor.close()
+    except BaseException:
+        if conn:
+            await conn.rollback()
+        raise
+    finally:
+        if conn:
+            await cerrar_conexion_async(conn)
+
+async def pipeline_async(args, q: str, q_params: List[Any], existentes: Dict[int, int],
+                         seleccionar, escritores: int) -> Dict[str, Any]:
+    stats = {k: 0 for k in ('leidas', 'seleccionadas', 'lecciones', 'insertados', 'lotes',
+                            'con_kb', 'sin_kb', 'sin_cambios', 't_generacion', 't_escritura')}
+    generadores = max(1, args.workers)
+    por_lote = max(1, LECCIONES_POR_LOTE * 9 // args.variants) if args.variants else LECCIONES_POR_LOTE
+    # Colas acotadas: el lector no se adelanta más de unos pocos lotes
+    lotes: asyncio.Queue = asyncio.Queue(maxsize=generadores * 2)
+    resultados: asyncio.Queue = asyncio.Queue(maxsize=escritores * 2)
+
+    if args.workers > 1:
+        executor = ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker)
+    else:
+        executor = ThreadPoolExecutor(max_workers=1)
+    tareas = []
+    try:
+        tareas.append(asyncio.create_task(
+            leer_lecciones_async(args, q, q_params, lotes, por_lote, generadores, seleccionar, stats)))
+        gen_tareas = [asyncio.create_task(generar_async(executor, args, lotes, resultados, stats))
+                      for _ in range(generadores)]
+        esc_tareas = [asyncio.create_task(escribir_async(args, resultados, existentes, stats))
+                      for _ in range(escritores)]
+        tareas += gen_tareas + esc_tareas
+
+        async def cerrar_generacion():
+            await asyncio.gather(*gen_tareas)
+            for _ in range(escritores):
+                await resultados.put(None)
+        tareas.append(asyncio.create_task(cerrar_generacion()))
+        await asyncio.gather(*tareas)
+    except BaseException:
+        for tarea in tareas:
+            tarea.cancel()
+        await asyncio.gather(*tareas, return_exceptions=True)
+        raise
+    finally:
+        executor.shutdown(cancel_futures=True)
+    return stats
+
+def main_async(args) -> None:
+    """--async: preparación corta en la conexión normal, luego el pipeline asíncrono"""
+    filtro, params, q, q_params = consulta_lecciones(args)
+    conn = conectar_bd()
+    try:
+        cursor = conn.cursor()
+        if not args.dry_run:
+            firmas.verificar_columna_firma(cursor)
+        existentes = contar_ejercicios_por_leccion(cursor, filtro, tuple(params))
+        conn.commit()
+        cursor.close()
+    except firmas.SinColumnaFirma as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+    manifiesto = cargar_manifiesto(args.manifest)
+    huellas: Dict[int, str] = {}
+
+    def seleccionar(lote: List[Dict[str,Any]]) -> List[Dict[str,Any]]:
+        actuales = {l['id']: huella_generacion(l, args.seed, args.variants) for l in lote}
+        if args.changed_only:
+            lote = [l for l in lote
+                    if not existentes.get(l['id']) or manifiesto.get(str(l['id'])) != actuales[l['id']]]
+        if not args.overwrite and not args.dry_run:
+            lote = [l for l in lote if not existentes.get(l['id'])]
+        # Solo las que se van a generar: una lección saltada no queda como al día en el manifiesto
+        huellas.update((l['id'], actuales[l['id']]) for l in lote)
+        return lote
+
+    escritores = 1 if almacen.usa_sqlite() else max(1, args.writers)
+    driver = 'aiomysql' if usa_aiomysql() else 'conexiones en hilos'
+    print(f"⚡ Modo async: {max(1, args.workers)} generadores, {escritores} escritores ({driver})\n")
+
+    inicio = time.perf_counter()
+    stats = asyncio.run(pipeline_async(args, q, q_params, existentes, seleccionar, escritores))
+    total = time.perf_counter() - inicio
+
+    if not stats['leidas']:
+        print("⚠️ No se encontraron lecciones")
+        return
+    if not args.dry_run:
+        manifiesto.update({str(i): h for i, h in huellas.items()})
+        guardar_manifiesto(args.manifest, manifiesto)
+        print(f"\n🎉 Generación completada ({stats['insertados']} ejercicios en {stats['lotes']} INSERT)")
+
+    ejercicios = stats['con_kb'] + stats['sin_kb']
+    print(f"\n{'='*70}")
+    print(f"📊 RESUMEN")
+    print(f"{'='*70}")
+    print(f"Lecciones leídas: {stats['leidas']} (procesadas: {stats['seleccionadas']})")
+    print(f"Total ejercicios: {ejercicios}")
+    print(f"✅ Con KB: {stats['con_kb']} ({stats['con_kb']*100//ejercicios if ejercicios else 0}%)")
+    print(f"🔄 Sin KB: {stats['sin_kb']} ({stats['sin_kb']*100//ejercicios if ejercicios else 0}%)")
+    if args.seed is not None and args.overwrite:
+        print(f"⏭️  Lecciones sin cambios (no reescritas): {stats['sin_cambios']}")
+    print(f"⏱️  Total {total:.2f}s | generación {stats['t_generacion']:.2f}s | escritura {stats['t_escritura']:.2f}s")
+    print(f"{'='*70}\n")
+
 def main(argv=None):
     parser = argparse.ArgumentParser(description="SpeakLexi Generator V5")
     parser.add_argument("--dry-run", action="store_true")
@@ -404,31 +859,62 @@ def main(argv=None):
     parser.add_argument("--nivel", type=str)
     parser.add_argument("--limit", type=int, default=0)
     parser.add_argument("--verbose", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=500,
+                        help="Ejercicios por INSERT multi-fila (default: 500)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Procesos para generar ejercicios en paralelo (default: 1)")
+    parser.add_argument("--seed", type=int,
+                        help="Generación determinista; con --overwrite no reescribe lecciones sin cambios")
+    parser.add_argument("--changed-only", action="store_true",
+                        help="Regenerar solo lecciones cuya huella (KB + versión del generador) cambió")
+    parser.add_argument("--manifest", type=str, default=MANIFIESTO_HUELLAS,
+                        help="Archivo JSON con las huellas por lección")
+    parser.add_argument("--variants", type=int, default=0,
+                        help="Banco de práctica: hasta N ejercicios distintos por lección en vez del set de 9")
+    parser.add_argument("--bank-out", type=str,
+                        help="Con --variants, escribir el banco a este JSONL (.gz/.zst) en vez de a la BD")
+    parser.add_argument("--async", dest="modo_async", action="store_true",
+                        help="Solapar lectura, generación y escritura (aiomysql si está instalado)")
+    parser.add_argument("--writers", type=int, default=2,
+                        help="Con --async, conexiones escribiendo en paralelo (default: 2)")
+    parser.add_argument("--sin-validar", action="store_true",
+                        help="No validar la estructura del KB antes de conectar")
     args = parser.parse_args(argv)
+    if args.changed_only:
+        args.overwrite = True
+    if args.bank_out and not args.variants:
+        parser.error("--bank-out requiere --variants N")
+    if args.bank_out and args.modo_async:
+        parser.error("--bank-out ya escribe en streaming; no se combina con --async")
+    a_archivo = bool(args.bank_out)
 
     if not cargar_knowledge_base():
         sys.exit(1)
+    # Un ejemplo mal formado fallaría a mitad de la escritura; se rechaza antes de conectar
+    if not args.sin_validar and not validar_kb.kb_valido(KB_DIR):
+        print("\n❌ Corrige el KB (python validar_kb.py) o usa --sin-validar")
+        sys.exit(1)
+
+    if args.modo_async:
+        try:
+            main_async(args)
+        except Exception as e:
+            print(f"\n❌ Error: {e}")
+            import traceback
+            traceback.print_exc()
+            sys.exit(1)
+        return
 
     conn = None
     cursor = None
+    executor = None
+    escritor_banco = None
     try:
         conn = conectar_bd()
         cursor = conn.cursor()
 
-        q = "SELECT id, titulo, descripcion, contenido, nivel, idioma, creado_por FROM lecciones WHERE estado = 'activa'"
-        params = []
-        if args.idioma:
-            q += " AND idioma = %s"
-            params.append(args.idioma)
-        if args.nivel:
-            q += " AND nivel = %s"
-            params.append(args.nivel.upper())
-        q += " ORDER BY nivel, idioma, orden"
-        if args.limit and args.limit > 0:
-            q += " LIMIT %s"
-            params.append(args.limit)
-
-        cursor.execute(q, tuple(params))
+        filtro, params, q, q_params = consulta_lecciones(args)
+        cursor.execute(q, tuple(q_params))
         lessons = cursor.fetchall()
         
         if not lessons:
@@ -438,47 +924,102 @@ def main(argv=None):
         print(f"📚 {len(lessons)} lecciones encontradas")
         print(f"⚙️ Modo: {'DRY-RUN' if args.dry_run else 'PRODUCCIÓN'}")
         print(f"🔄 Sobrescribir: {'SÍ' if args.overwrite else 'NO'}")
+        if args.variants:
+            print(f"🏦 Banco: hasta {args.variants} variantes por lección → {args.bank_out or 'BD'}")
         print()
 
-        total_ejercicios = 0
+        if not args.dry_run and not a_archivo:
+            firmas.verificar_columna_firma(cursor)
+
+        escritor = EscritorEjercicios(conn, cursor, batch_size=args.batch_size)
+        escritor_banco = banco.EscritorBanco(args.bank_out) if a_archivo and not args.dry_run else None
         con_kb = 0
         sin_kb = 0
 
-        for idx, lesson in enumerate(lessons, start=1):
-            gen = GeneradorConKB(lesson, verbose=args.verbose)
+        # Conteo previo de ejercicios existentes (una sola consulta)
+        existentes = contar_ejercicios_por_leccion(cursor, filtro, tuple(params))
 
-            existing = count_existing_exercises(cursor, lesson.get('id'))
-            if existing and not args.overwrite and not args.dry_run:
-                continue
+        manifiesto = cargar_manifiesto(args.manifest)
+        huellas = {l['id']: huella_generacion(l, args.seed, args.variants) for l in lessons}
 
-            if existing and args.overwrite and not args.dry_run:
-                delete_existing_exercises(cursor, lesson.get('id'))
+        # Un banco a archivo no depende de lo que ya hay en la BD
+        if args.changed_only and not a_archivo:
+            total = len(lessons)
+            lessons = [l for l in lessons
+                       if not existentes.get(l['id']) or manifiesto.get(str(l['id'])) != huellas[l['id']]]
+            print(f"🔍 Solo cambios: {len(lessons)}/{total} lecciones con huella distinta\n")
+        if not args.overwrite and not args.dry_run and not a_archivo:
+            lessons = [l for l in lessons if not existentes.get(l['id'])]
+        # Con --variants cada lote pesa tanto como ~LECCIONES_POR_LOTE sets normales
+        por_lote = max(1, LECCIONES_POR_LOTE * 9 // args.variants) if args.variants else LECCIONES_POR_LOTE
+        lotes = particionar_lecciones(lessons, por_lote)
 
-            ejercicios = gen.generar_set(start_order=1)
-            
-            if gen.kb_leccion:
-                con_kb += len(ejercicios)
-            else:
-                sin_kb += len(ejercicios)
+        if args.workers > 1:
+            print(f"🧵 Generando con {args.workers} procesos ({len(lotes)} lotes)\n")
+            executor = ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker)
+            resultados = resultados_en_paralelo(executor, lotes, args.verbose, args.seed, args.variants,
+                                                en_vuelo=args.workers * 2)
+        else:
+            resultados = (generar_lote(lote, args.verbose, args.seed, args.variants) for lote in lotes)
 
-            if args.dry_run:
-                print(f"📖 [{idx}/{len(lessons)}] {gen.titulo} → {len(ejercicios)} ejercicios")
-                continue
+        idx = 0
+        sin_cambios = 0
+        for resultado in resultados:
+            if args.overwrite and not args.dry_run and not a_archivo:
+                con_existentes = [r['id'] for r in resultado if existentes.get(r['id'])]
+                # Con --seed, las lecciones que regeneran exactamente lo mismo no se tocan
+                if args.seed is not None:
+                    previas = firmas.huellas_existentes(cursor, con_existentes)
+                    iguales = {r['id'] for r in resultado if previas.get(r['id']) == r['huella']}
+                    resultado = [r for r in resultado if r['id'] not in iguales]
+                    con_existentes = [i for i in con_existentes if i not in iguales]
+                    sin_cambios += len(iguales)
+                    idx += len(iguales)
+                # Sobrescribir: un DELETE por lote de lecciones en vez de uno por lección.
+                # No se confirma hasta insertar el lote completo (ver abajo)
+                borrar_ejercicios_lecciones(cursor, con_existentes)
 
-            creador = lesson.get('creado_por') or 1
-            for e in ejercicios:
-                insertar_ejercicio(cursor, lesson.get('id'), e, creador)
-                total_ejercicios += 1
+            for r in resultado:
+                idx += 1
+                if r['con_kb']:
+                    con_kb += len(r['filas'])
+                else:
+                    sin_kb += len(r['filas'])
 
-            if idx % 20 == 0:
-                conn.commit()
+                if args.dry_run:
+                    print(f"📖 [{idx}/{len(lessons)}] {r['titulo']} → {len(r['filas'])} ejercicios")
+                    continue
 
-            if idx % 10 == 0:
-                print(f"   ✓ {idx}/{len(lessons)} lecciones ({total_ejercicios} ejercicios)")
+                if escritor_banco:
+                    escritor_banco.agregar_filas(r['filas'])
+                    if idx % 100 == 0:
+                        print(f"   ✓ {idx}/{len(lessons)} lecciones ({escritor_banco.total} variantes)")
+                    continue
 
-        if not args.dry_run:
+                escritor.agregar_filas(r['filas'], confirmar=False)
+
+                if idx % 10 == 0:
+                    print(f"   ✓ {idx}/{len(lessons)} lecciones ({escritor.total + len(escritor.pendientes)} ejercicios)")
+
+            # DELETE e INSERT del lote en el mismo commit: si la corrida se corta,
+            # ninguna lección queda sin ejercicios o con solo una parte
+            if not args.dry_run and not escritor_banco:
+                escritor.flush(confirmar=False)
+                conn.commit()
+
+        if escritor_banco:
+            escritor_banco.cerrar()
+            print(f"\n🏦 Banco guardado: {escritor_banco.path} ({escritor_banco.total} ejercicios, "
+                  f"{escritor_banco.lecciones} lecciones)")
+            print(f"   Cargar con: python restaurar_backup.py {escritor_banco.path}")
+        elif not args.dry_run:
+            escritor.flush()
             conn.commit()
-            print("\n🎉 Generación completada")
+            print(f"\n🎉 Generación completada ({escritor.total} ejercicios en {escritor.lotes} lotes)")
+
+            # Solo después del commit final: si algo falla, esas lecciones se regeneran la próxima vez
+            manifiesto.update({str(l['id']): huellas[l['id']] for l in lessons})
+            guardar_manifiesto(args.manifest, manifiesto)
 
         print(f"\n{'='*70}")
         print(f"📊 RESUMEN")
@@ -486,16 +1027,22 @@ def main(argv=None):
         print(f"Total ejercicios: {con_kb + sin_kb}")
         print(f"✅ Con KB: {con_kb} ({con_kb*100//(con_kb+sin_kb) if con_kb+sin_kb else 0}%)")
         print(f"🔄 Sin KB: {sin_kb} ({sin_kb*100//(con_kb+sin_kb) if con_kb+sin_kb else 0}%)")
+        if args.seed is not None and args.overwrite:
+            print(f"⏭️  Lecciones sin cambios (no reescritas): {sin_cambios}")
         print(f"{'='*70}\n")
 
     except Exception as e:
         print(f"\n❌ Error: {e}")
+        if escritor_banco:
+            escritor_banco.descartar()
         if conn:
             conn.rollback()
         import traceback
         traceback.print_exc()
         sys.exit(1)
     finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
         if cursor:
             cursor.close()
         if conn:
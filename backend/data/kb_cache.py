@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+📦 CACHÉ COMPILADA DEL KNOWLEDGE BASE - SpeakLexi 2.0
+Compila los archivos kb/*.json en un paquete con índices precalculados.
+Los scripts de datos cargan la caché y solo se vuelve a parsear el JSON
+cuando un archivo KB cambia de verdad (mtime + hash).
+
+El paquete (.cache/kb.pack) tiene una tabla de offsets por (idioma, nivel, titulo)
+y cada lección serializada por separado; se abre con mmap y cada nodo se
+decodifica la primera vez que se pide. Una corrida con --idioma/--nivel solo
+lee los bytes de sus lecciones, y sumar idiomas no alarga el arranque.
+
+La validación de validar_kb corre al compilar, solo para los archivos que se
+vuelven a parsear; su resultado queda en el índice por sha y se reutiliza.
+"""
+
+import os
+import sys
+import json
+import mmap
+import pickle
+import struct
+import hashlib
+from collections.abc import Mapping
+from typing import Dict, Any, Iterator, List, Tuple, Optional
+
+try:
+    SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+except NameError:
+    SCRIPT_DIR = os.getcwd()
+
+KB_DIR = os.path.join(SCRIPT_DIR, 'kb')
+
+KB_FILES = {
+    'Inglés': 'kb_ingles.json',
+    'Francés': 'kb_frances.json',
+    'Alemán': 'kb_aleman.json',
+    'Italiano': 'kb_italiano.json'
+}
+
+CACHE_VERSION = 3
+CACHE_FILE = os.path.join('.cache', 'kb.pack')
+PACK_MAGIC = b'SLKB'
+CABECERA = struct.Struct('<4sIQ')  # magic, versión, largo del índice
+
+Clave = Tuple[str, str, str]  # (idioma, nivel, titulo)
+
+_en_memoria: Dict[str, 'KnowledgeBase'] = {}  # KB ya cargados en este proceso, por kb_dir
+
+class KnowledgeBase:
+    """KB ya parseado con índices por (idioma, nivel, titulo) y por palabra"""
+
+    def __init__(self, datos: Dict[str, Any], archivos: Dict[str, Tuple[int, int, str]],
+                 errores: Optional[Dict[str, str]] = None, indices: Optional[Dict[str, Any]] = None,
+                 validacion: Optional[Dict[str, Tuple[str, int, List[Dict[str, Any]]]]] = None):
+        self.datos = datos          # {idioma: {nivel: {titulo: nodo}}}
+        self.archivos = archivos    # {idioma: (mtime_ns, tamaño, sha256)}
+        self.errores = errores or {}
+        self.validacion = validacion or {}  # {idioma: (sha256, lecciones revisadas, errores)}
+        self.desde_cache = False
+        self.paquete: Optional['PaqueteKB'] = None
+        if indices:
+            self.por_titulo = indices['por_titulo']
+            self.por_palabra = indices['por_palabra']
+            self.huellas = indices['huellas']
+        else:
+            self._indexar()
+
+    def _indexar(self):
+        self.por_titulo: Dict[Clave, Dict[str, Any]] = {}
+        self.por_palabra: Dict[str, List[Clave]] = {}
+        self.huellas: Dict[Clave, str] = {}
+
+        for idioma, niveles in self.datos.items():
+            if not isinstance(niveles, Mapping):
+                continue
+            for nivel, lecciones in niveles.items():
+                if not isinstance(lecciones, Mapping):
+                    continue
+                for titulo, nodo in lecciones.items():
+                    clave = (idioma, nivel, titulo)
+                    self.por_titulo[clave] = nodo
+                    self.huellas[clave] = huella_nodo(nodo)
+                    vocabulario = nodo.get('vocabulario', []) if isinstance(nodo, dict) else []
+                    for palabra in vocabulario:
+                        if isinstance(palabra, str):
+                            self.por_palabra.setdefault(palabra.strip().lower(), []).append(clave)
+
+    def leccion(self, idioma: str, nivel: str, titulo: str) -> Dict[str, Any]:
+        return self.por_titulo.get((idioma, nivel, titulo), {})
+
+    def huella(self, idioma: str, nivel: str, titulo: str) -> str:
+        """Hash del nodo KB de la lección ('' si no existe)"""
+        return self.huellas.get((idioma, nivel, titulo), '')
+
+    def lecciones_con_palabra(self, palabra: str) -> List[Clave]:
+        return self.por_palabra.get(palabra.strip().lower(), [])
+
+    def total_lecciones(self, idioma: str) -> int:
+        return sum(len(temas) for temas in self.datos.get(idioma, {}).values())
+
+    def cerrar(self) -> None:
+        """Suelta el mmap del paquete; los nodos ya decodificados siguen disponibles"""
+        if self.paquete is not None:
+            self.paquete.cerrar()
+
+class PaqueteKB:
+    """kb.pack abierto con mmap: índice en memoria, nodos leídos bajo demanda"""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, largo = CABECERA.unpack_from(self.mm, 0)
+            if magic != PACK_MAGIC or version != CACHE_VERSION:
+                raise ValueError("paquete KB de otra versión")
+            self.indice = pickle.loads(self.mm[CABECERA.size:CABECERA.size + largo])
+        except Exception:
+            self.mm.close()
+            raise
+        self.base = CABECERA.size + largo
+        self.decodificados = 0
+
+    def nodo(self, clave: Clave) -> Any:
+        inicio, largo = self.indice['offsets'][clave]
+        inicio += self.base
+        self.decodificados += 1
+        return pickle.loads(self.mm[inicio:inicio + largo])
+
+    def cerrar(self) -> None:
+        if not self.mm.closed:
+            self.mm.close()
+
+class LeccionesPerezosas(Mapping):
+    """{titulo: nodo} de un (idioma, nivel); cada nodo se decodifica la primera vez"""
+
+    def __init__(self, paquete: PaqueteKB, idioma: str, nivel: str, titulos: List[str]):
+        self._paquete = paquete
+        self._idioma = idioma
+        self._nivel = nivel
+        self._titulos = dict.fromkeys(titulos)
+        self._nodos: Dict[str, Any] = {}
+
+    def __getitem__(self, titulo: str) -> Any:
+        try:
+            return self._nodos[titulo]
+        except KeyError:
+            if titulo not in self._titulos:
+                raise
+        nodo = self._nodos[titulo] = self._paquete.nodo((self._idioma, self._nivel, titulo))
+        return nodo
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._titulos)
+
+    def __len__(self) -> int:
+        return len(self._titulos)
+
+    def __contains__(self, titulo) -> bool:
+        return titulo in self._titulos
+
+    def __reduce__(self):
+        # Se copia como dict normal (p. ej. al pasar a otro proceso): el mmap no viaja
+        return (dict, (dict(self.items()),))
+
+class PorTitulo(Mapping):
+    """{(idioma, nivel, titulo): nodo} sobre las LeccionesPerezosas de datos"""
+
+    def __init__(self, datos: Dict[str, Any], claves: List[Clave]):
+        self._datos = datos
+        self._claves = dict.fromkeys(claves)
+
+    def __getitem__(self, clave: Clave) -> Any:
+        if clave not in self._claves:
+            raise KeyError(clave)
+        idioma, nivel, titulo = clave
+        return self._datos[idioma][nivel][titulo]
+
+    def __iter__(self) -> Iterator[Clave]:
+        return iter(self._claves)
+
+    def __len__(self) -> int:
+        return len(self._claves)
+
+    def __contains__(self, clave) -> bool:
+        return clave in self._claves
+
+    def __reduce__(self):
+        return (dict, (dict(self.items()),))
+
+def huella_nodo(nodo: Any) -> str:
+    """Hash estable del contenido de un nodo KB"""
+    canonico = json.dumps(nodo, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.blake2b(canonico.encode('utf-8'), digest_size=16).hexdigest()
+
+def _sha256_archivo(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 16), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+def _leer_cache(path: str) -> Optional[KnowledgeBase]:
+    """Abre el paquete sin decodificar ninguna lección"""
+    try:
+        paquete = PaqueteKB(path)
+    except Exception:
+        return None
+    indice = paquete.indice
+    datos: Dict[str, Any] = {}
+    for idioma, niveles in indice['estructura'].items():
+        if not isinstance(niveles, dict):
+            datos[idioma] = niveles  # valor mal formado, se conserva tal cual
+            continue
+        datos[idioma] = {}
+        for nivel, titulos in niveles.items():
+            if isinstance(titulos, list):
+                datos[idioma][nivel] = LeccionesPerezosas(paquete, idioma, nivel, titulos)
+            else:
+                datos[idioma][nivel] = titulos['crudo']
+    kb = KnowledgeBase(datos, indice['archivos'], indices={
+        'por_titulo': PorTitulo(datos, list(indice['offsets'])),
+        'por_palabra': indice['por_palabra'],
+        'huellas': indice['huellas']
+    }, validacion=indice['validacion'])
+    kb.paquete = paquete
+    return kb
+
+def _guardar_cache(path: str, kb: KnowledgeBase, anterior: Optional[KnowledgeBase] = None) -> None:
+    """
+    Escribe el paquete: cabecera, índice (estructura, offsets, índices) y los nodos.
+    Solo tipos básicos en los pickles: la caché no depende de cómo se importe este módulo.
+    """
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        estructura: Dict[str, Any] = {}
+        offsets: Dict[Clave, Tuple[int, int]] = {}
+        nodos: List[bytes] = []
+        posicion = 0
+        for idioma, niveles in kb.datos.items():
+            if not isinstance(niveles, Mapping):
+                estructura[idioma] = niveles
+                continue
+            estructura[idioma] = {}
+            for nivel, lecciones in niveles.items():
+                if not isinstance(lecciones, Mapping):
+                    estructura[idioma][nivel] = {'crudo': lecciones}
+                    continue
+                estructura[idioma][nivel] = list(lecciones)
+                for titulo, nodo in lecciones.items():
+                    blob = pickle.dumps(nodo, protocol=pickle.HIGHEST_PROTOCOL)
+                    offsets[(idioma, nivel, titulo)] = (posicion, len(blob))
+                    nodos.append(blob)
+                    posicion += len(blob)
+        indice = pickle.dumps({
+            'archivos': kb.archivos,
+            'estructura': estructura,
+            'offsets': offsets,
+            'por_palabra': dict(kb.por_palabra),
+            'huellas': dict(kb.huellas),
+            'validacion': kb.validacion
+        }, protocol=pickle.HIGHEST_PROTOCOL)
+        with open(tmp, 'wb') as f:
+            f.write(CABECERA.pack(PACK_MAGIC, CACHE_VERSION, len(indice)))
+            f.write(indice)
+            for blob in nodos:
+                f.write(blob)
+        # Todos los nodos ya se leyeron al escribir; el mmap viejo puede soltarse
+        # (en Windows no se puede reemplazar un archivo mapeado)
+        if anterior is not None:
+            anterior.cerrar()
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"  ⚠️  No se pudo guardar la caché del KB: {e}")
+
+def _sin_cambios(kb: Optional[KnowledgeBase], kb_dir: str) -> bool:
+    """El KB en memoria sigue valiendo si ningún archivo cambió de mtime ni de tamaño"""
+    if kb is None:
+        return False
+    for idioma, filename in KB_FILES.items():
+        path = os.path.join(kb_dir, filename)
+        if not os.path.exists(path):
+            if idioma in kb.archivos:
+                return False
+            continue
+        st = os.stat(path)
+        if kb.archivos.get(idioma, (None, None))[:2] != (st.st_mtime_ns, st.st_size):
+            return False
+    return True
+
+def cargar_kb(kb_dir: Any = KB_DIR, usar_cache: bool = True, workers: Optional[int] = None) -> KnowledgeBase:
+    """
+    Devuelve el KB compilado. Reutiliza la caché si ningún archivo cambió;
+    si solo cambió el mtime (mismo hash) se actualiza la caché sin re-parsear,
+    y si cambió el contenido solo se vuelven a parsear (y validar) esos idiomas.
+    """
+    kb_dir = str(kb_dir)
+    if usar_cache and _sin_cambios(_en_memoria.get(kb_dir), kb_dir):
+        return _en_memoria[kb_dir]
+
+    cache_path = os.path.join(kb_dir, CACHE_FILE)
+    anterior = _leer_cache(cache_path) if usar_cache else None
+    archivos_cache = anterior.archivos if anterior else {}
+
+    datos: Dict[str, Any] = {}
+    archivos: Dict[str, Tuple[int, int, str]] = {}
+    errores: Dict[str, str] = {}
+    validacion: Dict[str, Tuple[str, int, List[Dict[str, Any]]]] = {}
+    por_validar: List[Tuple[str, str]] = []
+    reparseados = 0
+    stats_cambiados = False
+
+    for idioma, filename in KB_FILES.items():
+        path = os.path.join(kb_dir, filename)
+        if not os.path.exists(path):
+            continue
+        st = os.stat(path)
+        previo = archivos_cache.get(idioma)
+
+        if previo and previo[:2] == (st.st_mtime_ns, st.st_size) and idioma in anterior.datos:
+            datos[idioma] = anterior.datos[idioma]
+            archivos[idioma] = previo
+            validacion[idioma] = anterior.validacion[idioma]
+            continue
+
+        sha = _sha256_archivo(path)
+        if previo and previo[2] == sha and idioma in anterior.datos:
+            # Solo cambió el mtime (checkout, copia...): el contenido es el mismo
+            datos[idioma] = anterior.datos[idioma]
+            archivos[idioma] = (st.st_mtime_ns, st.st_size, sha)
+            validacion[idioma] = anterior.validacion[idioma]
+            stats_cambiados = True
+            continue
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            datos[idioma] = data.get(idioma, data)
+            archivos[idioma] = (st.st_mtime_ns, st.st_size, sha)
+            por_validar.append((idioma, path))
+            reparseados += 1
+        except Exception as e:
+            errores[idioma] = str(e)
+
+    if por_validar:
+        import validar_kb  # importa este módulo; se carga solo cuando hay que validar
+        for (idioma, _), (revisadas, lista) in zip(por_validar, validar_kb.validar_archivos(por_validar, workers)):
+            validacion[idioma] = (archivos[idioma][2], revisadas, lista)
+
+    if anterior and not reparseados and not errores and set(archivos) == set(archivos_cache):
+        if stats_cambiados:
+            anterior.archivos = archivos
+            _guardar_cache(cache_path, anterior, anterior)
+        anterior.desde_cache = True
+        _en_memoria[kb_dir] = anterior
+        return anterior
+
+    kb = KnowledgeBase(datos, archivos, errores, validacion=validacion)
+    if usar_cache and archivos and not errores:
+        _guardar_cache(cache_path, kb, anterior)
+        _en_memoria[kb_dir] = kb
+    return kb
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Compila la caché del Knowledge Base")
+    parser.add_argument("--kb-dir", type=str, default=KB_DIR)
+    parser.add_argument("--rebuild", action="store_true", help="Ignorar la caché existente")
+    args = parser.parse_args(argv)
+
+    kb = cargar_kb(args.kb_dir, usar_cache=not args.rebuild)
+    if args.rebuild and kb.archivos and not kb.errores:
+        _guardar_cache(os.path.join(args.kb_dir, CACHE_FILE), kb)
+
+    print(f"📦 KB {'desde caché' if kb.desde_cache else 'compilado'}: {args.kb_dir}")
+    for idioma in kb.datos:
+        print(f"  ✅ {idioma}: {kb.total_lecciones(idioma)} lecciones")
+    for idioma, error in kb.errores.items():
+        print(f"  ⚠️  Error cargando {idioma}: {error}")
+    print(f"  🔑 {len(kb.por_titulo)} lecciones indexadas, {len(kb.por_palabra)} palabras")
+    invalidos = sum(len(lista) for _, _, lista in kb.validacion.values())
+    if invalidos:
+        print(f"  ❌ {invalidos} errores de estructura (python validar_kb.py)")
+    return 1 if kb.errores else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,10 +5,17 @@
 Detecta y elimina ejercicios duplicados en SpeakLexi 2.0
 """
 
+import sys
 import pymysql
+import pymysql.cursors
 from collections import defaultdict
+import argparse
 import json
-from datetime import datetime
+import firmas
+import reorden
+import borrado_lotes
+import backup
+import almacen
 
 # ============================================
 # CONFIGURACIÓN
@@ -25,7 +32,7 @@ DB_CONFIG = {
 def conectar_bd():
     """Conectar a la base de datos"""
     try:
-        conexion = pymysql.connect(**DB_CONFIG)
+        conexion = almacen.conectar(**DB_CONFIG)
         print("✅ Conexión exitosa a la base de datos")
         return conexion
     except Exception as e:
@@ -60,40 +67,7 @@ def obtener_ejercicios(cursor):
 
 def generar_firma_ejercicio(ejercicio):
     """Generar firma única para detectar duplicados"""
-    tipo = ejercicio['tipo']
-    contenido = ejercicio['contenido']
-    
-    if tipo == 'seleccion_multiple':
-        # Firma basada en la pregunta
-        if 'preguntas' in contenido and len(contenido['preguntas']) > 0:
-            pregunta = contenido['preguntas'][0]['pregunta']
-            return f"{tipo}:{pregunta}"
-    
-    elif tipo == 'verdadero_falso':
-        # Firma basada en las afirmaciones
-        if 'afirmaciones' in contenido:
-            afirmaciones = '|'.join(sorted(contenido['afirmaciones']))
-            return f"{tipo}:{afirmaciones}"
-    
-    elif tipo == 'completar_espacios':
-        # Firma basada en el texto
-        if 'texto' in contenido:
-            texto = contenido['texto']
-            return f"{tipo}:{texto}"
-    
-    elif tipo == 'emparejamiento':
-        # Firma basada en los pares
-        if 'pares' in contenido:
-            pares = '|'.join(sorted([f"{p['izquierda']}-{p['derecha']}" for p in contenido['pares']]))
-            return f"{tipo}:{pares}"
-    
-    elif tipo == 'escritura':
-        # Firma basada en las instrucciones
-        if 'instrucciones' in contenido:
-            instrucciones = contenido['instrucciones']
-            return f"{tipo}:{instrucciones}"
-    
-    return f"{tipo}:unknown"
+    return firmas.clave_ejercicio(ejercicio['tipo'], ejercicio['contenido'])
 
 def detectar_duplicados(ejercicios):
     """Detectar ejercicios duplicados por lección"""
@@ -106,6 +80,115 @@ def detectar_duplicados(ejercicios):
     
     return duplicados_por_leccion
 
+def detectar_duplicados_streaming(conn):
+    """
+    Detectar duplicados leyendo los ejercicios con un cursor del lado del servidor.
+    Solo se mantiene en memoria el mapa de firmas de la lección en curso; de cada
+    lección se conservan únicamente las firmas repetidas (id y tipo de cada ejercicio).
+    Devuelve (duplicados_por_leccion, total_ejercicios).
+    """
+    query = """
+        SELECT 
+            e.id,
+            e.leccion_id,
+            e.tipo,
+            e.contenido,
+            l.titulo as leccion_titulo
+        FROM ejercicios e
+        JOIN lecciones l ON e.leccion_id = l.id
+        ORDER BY e.leccion_id, e.orden
+    """
+    duplicados_por_leccion = {}
+    total = 0
+    leccion_actual = None
+    vistas = defaultdict(list)
+
+    def cerrar_leccion():
+        repetidas = {firma: ejs for firma, ejs in vistas.items() if len(ejs) > 1}
+        if repetidas:
+            duplicados_por_leccion[leccion_actual] = repetidas
+
+    cursor = conn.cursor(pymysql.cursors.SSDictCursor)
+    try:
+        cursor.execute(query)
+        for row in cursor:
+            total += 1
+            if row['leccion_id'] != leccion_actual:
+                cerrar_leccion()
+                leccion_actual = row['leccion_id']
+                vistas = defaultdict(list)
+
+            row['contenido'] = json.loads(row['contenido'])
+            firma = generar_firma_ejercicio(row)
+            vistas[firma].append({
+                'id': row['id'],
+                'tipo': row['tipo'],
+                'leccion_titulo': row['leccion_titulo']
+            })
+        cerrar_leccion()
+    finally:
+        cursor.close()
+
+    return duplicados_por_leccion, total
+
+def detectar_duplicados_por_firma(conn):
+    """
+    Detectar duplicados con la columna ejercicios.firma: un GROUP BY leccion_id, firma
+    en el servidor y solo se traen las filas repetidas.
+    Devuelve (duplicados_por_leccion, total_ejercicios).
+    """
+    cursor = conn.cursor()
+    try:
+        firmas.verificar_columna_firma(cursor)
+        rellenadas = firmas.rellenar_firmas(conn, cursor)
+        if rellenadas:
+            print(f"🔏 {rellenadas} firmas calculadas para ejercicios sin firma")
+
+        cursor.execute("SELECT COUNT(*) AS total FROM ejercicios")
+        total = cursor.fetchone()['total']
+
+        cursor.execute("""
+            SELECT 
+                e.id,
+                e.leccion_id,
+                e.tipo,
+                e.contenido,
+                e.firma,
+                l.titulo as leccion_titulo
+            FROM ejercicios e
+            JOIN (
+                SELECT leccion_id, firma
+                FROM ejercicios
+                GROUP BY leccion_id, firma
+                HAVING COUNT(*) > 1
+            ) d ON d.leccion_id = e.leccion_id AND d.firma = e.firma
+            JOIN lecciones l ON e.leccion_id = l.id
+            ORDER BY e.leccion_id, e.id
+        """)
+        candidatos = cursor.fetchall()
+
+        # La firma guardada puede haber quedado vieja (contenido editado sin el trigger):
+        # antes de borrar nada se recalcula desde el contenido y se corrige
+        obsoletas = firmas.firmas_vigentes(candidatos)
+        if obsoletas:
+            cursor.executemany("UPDATE ejercicios SET firma = %s WHERE id = %s",
+                               [(f['firma'], f['id']) for f in obsoletas])
+            conn.commit()
+            print(f"🔏 {len(obsoletas)} firmas desactualizadas corregidas")
+
+        grupos = defaultdict(lambda: defaultdict(list))
+        for row in candidatos:
+            grupos[row['leccion_id']][row['firma']].append(row)
+        duplicados_por_leccion = defaultdict(lambda: defaultdict(list))
+        for leccion_id, por_firma in grupos.items():
+            for firma, filas in por_firma.items():
+                if len(filas) > 1:
+                    duplicados_por_leccion[leccion_id][firma] = filas
+    finally:
+        cursor.close()
+
+    return duplicados_por_leccion, total
+
 def mostrar_reporte(duplicados_por_leccion):
     """Mostrar reporte de duplicados"""
     total_duplicados = 0
@@ -152,7 +235,8 @@ def mostrar_reporte(duplicados_por_leccion):
     
     return total_duplicados
 
-def eliminar_duplicados(cursor, duplicados_por_leccion):
+def eliminar_duplicados(conn, cursor, duplicados_por_leccion,
+                        tamano_lote=borrado_lotes.TAMANO_LOTE, pausa=0.0):
     """Eliminar ejercicios duplicados, manteniendo el primero"""
     ids_a_eliminar = []
     
@@ -168,13 +252,14 @@ def eliminar_duplicados(cursor, duplicados_por_leccion):
     if ids_a_eliminar:
         print(f"\n🗑️  Eliminando {len(ids_a_eliminar)} ejercicios duplicados...")
         
-        # Eliminar en lotes
-        placeholders = ','.join(['%s'] * len(ids_a_eliminar))
-        query = f"DELETE FROM ejercicios WHERE id IN ({placeholders})"
-        cursor.execute(query, ids_a_eliminar)
+        # Eliminar en lotes, con commit por lote
+        eliminados = borrado_lotes.borrar_en_lotes(
+            conn, cursor, 'ejercicios', 'id', ids_a_eliminar,
+            tamano=tamano_lote, pausa=pausa, etiqueta='Duplicados'
+        )
         
-        print(f"✅ {len(ids_a_eliminar)} ejercicios eliminados correctamente")
-        return len(ids_a_eliminar)
+        print(f"✅ {eliminados} ejercicios eliminados correctamente")
+        return eliminados
     
     return 0
 
@@ -182,62 +267,37 @@ def reordenar_ejercicios(cursor):
     """Reordenar ejercicios después de eliminar duplicados"""
     print("\n🔄 Reordenando ejercicios...")
     
-    # Obtener todas las lecciones
-    cursor.execute("SELECT DISTINCT leccion_id FROM ejercicios ORDER BY leccion_id")
-    lecciones = cursor.fetchall()
+    # Un solo UPDATE para todas las lecciones; solo cambian las filas con huecos
+    actualizados = reorden.reordenar(cursor, 'ejercicios', particion=['leccion_id'], orden_por=['orden'])
     
-    for leccion in lecciones:
-        leccion_id = leccion['leccion_id']
-        
-        # Obtener ejercicios de esta lección ordenados
-        cursor.execute("""
-            SELECT id FROM ejercicios 
-            WHERE leccion_id = %s 
-            ORDER BY orden, id
-        """, (leccion_id,))
-        
-        ejercicios = cursor.fetchall()
-        
-        # Actualizar orden
-        for nuevo_orden, ej in enumerate(ejercicios, start=1):
-            cursor.execute("""
-                UPDATE ejercicios 
-                SET orden = %s 
-                WHERE id = %s
-            """, (nuevo_orden, ej['id']))
-    
-    print("✅ Ejercicios reordenados correctamente")
+    print(f"✅ Ejercicios reordenados correctamente ({actualizados} cambiaron de orden)")
 
-def generar_backup(cursor):
+def generar_backup(conn, formato='sql', compresion='none'):
     """Generar backup de ejercicios antes de eliminar"""
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    filename = f'backup_ejercicios_{timestamp}.sql'
+    filename = backup.nombre_backup('ejercicios', formato, compresion)
     
     print(f"\n💾 Generando backup en {filename}...")
     
-    cursor.execute("SELECT * FROM ejercicios")
-    ejercicios = cursor.fetchall()
+    filename, total = backup.generar_backup(conn, 'ejercicios', formato, compresion, path=filename)
     
-    with open(filename, 'w', encoding='utf-8') as f:
-        f.write("-- Backup de ejercicios\n")
-        f.write(f"-- Fecha: {datetime.now()}\n")
-        f.write(f"-- Total ejercicios: {len(ejercicios)}\n\n")
-        
-        for ej in ejercicios:
-            # Escapar comillas
-            titulo = ej['titulo'].replace("'", "\\'")
-            descripcion = (ej['descripcion'] or '').replace("'", "\\'")
-            contenido = ej['contenido'].replace("'", "\\'")
-            respuesta = ej['respuesta_correcta'].replace("'", "\\'")
-            
-            sql = f"""INSERT INTO ejercicios (id, leccion_id, titulo, descripcion, tipo, contenido, respuesta_correcta, puntos_maximos, orden, estado, creado_por, creado_en) 
-VALUES ({ej['id']}, {ej['leccion_id']}, '{titulo}', '{descripcion}', '{ej['tipo']}', '{contenido}', '{respuesta}', {ej['puntos_maximos']}, {ej['orden']}, '{ej['estado']}', {ej['creado_por']}, '{ej['creado_en']}');\n"""
-            f.write(sql)
-    
-    print(f"✅ Backup guardado: {filename}")
+    print(f"✅ Backup guardado: {filename} ({total} ejercicios)")
     return filename
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Limpiar ejercicios duplicados")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Recorrer los ejercicios con un cursor del servidor (memoria constante)")
+    parser.add_argument("--por-firma", action="store_true",
+                        help="Agrupar por la columna ejercicios.firma en la base de datos")
+    parser.add_argument("--lote-borrado", type=int, default=borrado_lotes.TAMANO_LOTE,
+                        help=f"Ejercicios por DELETE (default: {borrado_lotes.TAMANO_LOTE})")
+    parser.add_argument("--pausa", type=float, default=0.0,
+                        help="Segundos de espera entre lotes de borrado")
+    parser.add_argument("--formato-backup", choices=backup.FORMATOS, default="sql")
+    parser.add_argument("--compresion", choices=backup.COMPRESIONES, default="none",
+                        help="Comprimir el backup (zstd requiere el paquete zstandard)")
+    args = parser.parse_args(argv)
+    
     print("="*80)
     print("🧹 LIMPIADOR DE EJERCICIOS DUPLICADOS - SpeakLexi 2.0")
     print("="*80)
@@ -248,14 +308,25 @@ def main():
     cursor = conn.cursor()
     
     try:
-        # Obtener ejercicios
-        print("📥 Cargando ejercicios...")
-        ejercicios = obtener_ejercicios(cursor)
-        print(f"✅ {len(ejercicios)} ejercicios cargados\n")
-        
-        # Detectar duplicados
-        print("🔍 Detectando duplicados...")
-        duplicados_por_leccion = detectar_duplicados(ejercicios)
+        if args.por_firma:
+            print("🔍 Detectando duplicados por firma...")
+            duplicados_por_leccion, total_ejercicios = detectar_duplicados_por_firma(conn)
+            print(f"✅ {total_ejercicios} ejercicios revisados\n")
+        elif args.streaming:
+            # Obtener y detectar en una sola pasada
+            print("🔍 Detectando duplicados (streaming)...")
+            duplicados_por_leccion, total_ejercicios = detectar_duplicados_streaming(conn)
+            print(f"✅ {total_ejercicios} ejercicios revisados\n")
+        else:
+            # Obtener ejercicios
+            print("📥 Cargando ejercicios...")
+            ejercicios = obtener_ejercicios(cursor)
+            total_ejercicios = len(ejercicios)
+            print(f"✅ {total_ejercicios} ejercicios cargados\n")
+            
+            # Detectar duplicados
+            print("🔍 Detectando duplicados...")
+            duplicados_por_leccion = detectar_duplicados(ejercicios)
         
         # Mostrar reporte
         total_duplicados = mostrar_reporte(duplicados_por_leccion)
@@ -273,10 +344,11 @@ def main():
             return
         
         # Generar backup
-        backup_file = generar_backup(cursor)
+        backup_file = generar_backup(conn, args.formato_backup, args.compresion)
         
         # Eliminar duplicados
-        eliminados = eliminar_duplicados(cursor, duplicados_por_leccion)
+        eliminados = eliminar_duplicados(conn, cursor, duplicados_por_leccion,
+                                         args.lote_borrado, args.pausa)
         
         # Reordenar
         reordenar_ejercicios(cursor)
@@ -289,12 +361,13 @@ def main():
         print("="*80)
         print(f"✅ Ejercicios eliminados: {eliminados}")
         print(f"💾 Backup guardado en: {backup_file}")
-        print(f"📊 Ejercicios restantes: {len(ejercicios) - eliminados}")
+        print(f"📊 Ejercicios restantes: {total_ejercicios - eliminados}")
         print()
         
     except Exception as e:
         print(f"\n❌ Error: {e}")
         conn.rollback()
+        return 1
     
     finally:
         cursor.close()
@@ -302,4 +375,4 @@ def main():
         print("👋 Conexión cerrada")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🔢 REORDEN EN BLOQUE - SpeakLexi 2.0
+Recalcula la columna orden de una tabla por grupos con una sola sentencia
+(ROW_NUMBER() OVER (PARTITION BY ...)). En servidores sin funciones de ventana
+usa una tabla temporal y un UPDATE ... JOIN. Solo toca filas cuyo orden cambia.
+"""
+
+import pymysql
+import almacen
+from typing import Sequence
+
+ER_PARSE_ERROR = 1064
+FILAS_POR_INSERT = 1000
+
+def reordenar(cursor, tabla: str, particion: Sequence[str], orden_por: Sequence[str],
+              filtro: str = "1 = 1", params: Sequence = (), columna: str = 'orden') -> int:
+    """
+    Asigna orden 1..N dentro de cada grupo de `particion`, siguiendo `orden_por`
+    (siempre se desempata por id). Devuelve cuántas filas cambiaron.
+    Los nombres de tabla y columnas vienen del código, nunca del usuario.
+    """
+    orden_sql = ', '.join(list(orden_por) + ['id'])
+    if almacen.dialecto(cursor) == 'sqlite':
+        return _reordenar_sqlite(cursor, tabla, particion, orden_sql, filtro, params, columna)
+    try:
+        cursor.execute(f"""
+            UPDATE {tabla} t
+            JOIN (
+                SELECT id, ROW_NUMBER() OVER (PARTITION BY {', '.join(particion)} ORDER BY {orden_sql}) AS nuevo
+                FROM {tabla}
+                WHERE {filtro}
+            ) r ON r.id = t.id
+            SET t.{columna} = r.nuevo
+            WHERE t.{columna} IS NULL OR t.{columna} <> r.nuevo
+        """, tuple(params))
+        return cursor.rowcount
+    except pymysql.err.ProgrammingError as e:
+        if e.args[0] != ER_PARSE_ERROR:
+            raise
+    return _reordenar_con_temporal(cursor, tabla, particion, orden_sql, filtro, params, columna)
+
+def _reordenar_sqlite(cursor, tabla, particion, orden_sql, filtro, params, columna) -> int:
+    """SQLite 3.33+: la misma numeración con UPDATE ... FROM"""
+    cursor.execute(f"""
+        UPDATE {tabla} SET {columna} = r.nuevo
+        FROM (
+            SELECT id, ROW_NUMBER() OVER (PARTITION BY {', '.join(particion)} ORDER BY {orden_sql}) AS nuevo
+            FROM {tabla}
+            WHERE {filtro}
+        ) AS r
+        WHERE r.id = {tabla}.id AND ({tabla}.{columna} IS NULL OR {tabla}.{columna} <> r.nuevo)
+    """, tuple(params))
+    return cursor.rowcount
+
+def _reordenar_con_temporal(cursor, tabla, particion, orden_sql, filtro, params, columna) -> int:
+    """MySQL < 8: numerar en Python con una sola lectura y aplicar con un UPDATE ... JOIN"""
+    cursor.execute(f"""
+        SELECT id, {columna} AS actual, {', '.join(particion)}
+        FROM {tabla}
+        WHERE {filtro}
+        ORDER BY {', '.join(particion)}, {orden_sql}
+    """, tuple(params))
+
+    cambios = []
+    grupo = None
+    nuevo = 0
+    for fila in cursor.fetchall():
+        clave = tuple(fila[c] for c in particion)
+        if clave != grupo:
+            grupo = clave
+            nuevo = 0
+        nuevo += 1
+        if fila['actual'] != nuevo:
+            cambios.append((fila['id'], nuevo))
+
+    if not cambios:
+        return 0
+
+    cursor.execute("DROP TEMPORARY TABLE IF EXISTS tmp_reorden")
+    cursor.execute("CREATE TEMPORARY TABLE tmp_reorden (id INT PRIMARY KEY, nuevo INT NOT NULL)")
+    try:
+        for i in range(0, len(cambios), FILAS_POR_INSERT):
+            cursor.executemany("INSERT INTO tmp_reorden (id, nuevo) VALUES (%s, %s)",
+                               cambios[i:i + FILAS_POR_INSERT])
+        cursor.execute(f"""
+            UPDATE {tabla} t
+            JOIN tmp_reorden r ON r.id = t.id
+            SET t.{columna} = r.nuevo
+        """)
+        return cursor.rowcount
+    finally:
+        cursor.execute("DROP TEMPORARY TABLE IF EXISTS tmp_reorden")
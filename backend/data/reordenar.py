@@ -5,7 +5,11 @@
 Asigna orden correcto a todas las lecciones
 """
 
+import sys
+import argparse
 import pymysql
+import reorden
+import almacen
 
 DB_CONFIG = {
     'host': 'localhost',
@@ -18,7 +22,7 @@ DB_CONFIG = {
 
 def conectar_bd():
     try:
-        conexion = pymysql.connect(**DB_CONFIG)
+        conexion = almacen.conectar(**DB_CONFIG)
         print("✅ Conexión exitosa\n")
         return conexion
     except Exception as e:
@@ -30,45 +34,30 @@ def reordenar_lecciones(cursor):
     
     print("🔄 Reordenando lecciones...\n")
     
-    # Obtener combinaciones únicas de idioma-nivel
+    # Un solo UPDATE para todo el catálogo: orden por título dentro de cada idioma-nivel
+    total_actualizadas = reorden.reordenar(
+        cursor, 'lecciones',
+        particion=['idioma', 'nivel'],
+        orden_por=['titulo'],
+        filtro="estado = 'activa'"
+    )
+    
     cursor.execute("""
-        SELECT DISTINCT idioma, nivel 
-        FROM lecciones 
+        SELECT idioma, nivel, COUNT(*) AS total
+        FROM lecciones
         WHERE estado = 'activa'
+        GROUP BY idioma, nivel
         ORDER BY idioma, nivel
     """)
     
-    combinaciones = cursor.fetchall()
-    total_actualizadas = 0
-    
-    for combo in combinaciones:
-        idioma = combo['idioma']
-        nivel = combo['nivel']
-        
-        # Obtener lecciones de esta combinación ordenadas por título
-        cursor.execute("""
-            SELECT id, titulo
-            FROM lecciones
-            WHERE idioma = %s AND nivel = %s AND estado = 'activa'
-            ORDER BY titulo
-        """, (idioma, nivel))
-        
-        lecciones = cursor.fetchall()
-        
-        # Asignar orden secuencial
-        for orden, leccion in enumerate(lecciones, start=1):
-            cursor.execute("""
-                UPDATE lecciones 
-                SET orden = %s
-                WHERE id = %s
-            """, (orden, leccion['id']))
-            total_actualizadas += 1
-        
-        print(f"✅ {idioma} {nivel}: {len(lecciones)} lecciones reordenadas")
+    for combo in cursor.fetchall():
+        print(f"✅ {combo['idioma']} {combo['nivel']}: {combo['total']} lecciones en orden")
     
     return total_actualizadas
 
-def main():
+def main(argv=None):
+    argparse.ArgumentParser(description="Reordenar lecciones por idioma y nivel").parse_args(argv)
+    
     print("="*70)
     print("🔢 REORDENADOR DE LECCIONES - SpeakLexi 2.0")
     print("="*70)
@@ -81,7 +70,7 @@ def main():
         total = reordenar_lecciones(cursor)
         
         print(f"\n{'='*70}")
-        print(f"✅ {total} lecciones reordenadas correctamente")
+        print(f"✅ {total} lecciones cambiaron de orden")
         print(f"{'='*70}\n")
         
         # Confirmar
@@ -97,6 +86,7 @@ def main():
     except Exception as e:
         print(f"\n❌ Error: {e}")
         conn.rollback()
+        return 1
     
     finally:
         cursor.close()
@@ -104,4 +94,4 @@ def main():
         print("\n👋 Conexión cerrada")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    sys.exit(main())
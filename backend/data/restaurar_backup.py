@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+♻️ RESTAURAR BACKUP - SpeakLexi 2.0
+Carga un backup de backup.py o de los antiguos backup_ejercicios_*.sql
+(.sql, .jsonl, también .gz / .zst) con INSERT multi-fila por lotes,
+sin pasar fila por fila por el cliente mysql.
+"""
+
+import re
+import sys
+import json
+import argparse
+import backup
+import firmas
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+LOTE = 1000
+
+INSERT_RE = re.compile(r"INSERT\s+INTO\s+`?(\w+)`?\s*\(([^)]*)\)\s*VALUES\s*", re.IGNORECASE)
+TOKEN_RE = re.compile(r"""
+    \s*(?:
+        (?P<cadena>'(?:[^'\\]|\\.|'')*')
+      | (?P<nulo>NULL)\b
+      | (?P<numero>-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)
+      | (?P<simbolo>[(),;])
+    )""", re.VERBOSE | re.DOTALL | re.IGNORECASE)
+# Los backups viejos solo escapaban la comilla simple (el resto de las barras es literal)
+# y escribían los NULL sin comillas como None (el str() de Python)
+TOKEN_LEGACY_RE = re.compile(TOKEN_RE.pattern
+                             .replace(r"(?:[^'\\]|\\.|'')*", r"(?:[^'\\]|\\'|\\(?!')|'')*")
+                             .replace("(?P<nulo>NULL)", "(?P<nulo>NULL|None)"),
+                             re.VERBOSE | re.DOTALL | re.IGNORECASE)
+
+ESCAPES = {'0': '\0', "'": "'", '"': '"', 'b': '\b', 'n': '\n', 'r': '\r',
+           't': '\t', 'Z': '\x1a', '\\': '\\', '%': '\\%', '_': '\\_'}
+
+BACKUPS_JSONL = ('.jsonl', '.jsonl.gz', '.jsonl.zst')
+
+class SentenciaIncompleta(Exception):
+    pass
+
+class TokenInvalido(ValueError):
+    """Texto que no es un valor SQL reconocible; `pos` es el offset dentro de la sentencia"""
+    def __init__(self, pos: int, texto: str):
+        super().__init__(f"Token no reconocido: {texto!r}")
+        self.pos = pos
+        self.texto = texto
+
+def _cadena(literal: str, legacy: bool) -> str:
+    cuerpo = literal[1:-1].replace("''", "'")
+    if legacy:
+        return cuerpo.replace("\\'", "'")
+    return re.sub(r"\\(.)", lambda m: ESCAPES.get(m.group(1), m.group(1)), cuerpo, flags=re.DOTALL)
+
+def _numero(texto: str) -> Any:
+    return int(texto) if re.fullmatch(r"-?\d+", texto) else float(texto)
+
+def parsear_insert(sentencia: str, legacy: bool = False) -> Tuple[str, List[str], List[Tuple]]:
+    """
+    Parsea un INSERT INTO t (cols) VALUES (...), (...); y devuelve (tabla, columnas, filas).
+    Lanza SentenciaIncompleta si falta texto (p. ej. una cadena con saltos de línea)
+    y TokenInvalido si aparece algo que no es un valor, sin esperar más líneas.
+    """
+    m = INSERT_RE.match(sentencia.lstrip())
+    if not m:
+        raise ValueError(f"Sentencia no soportada: {sentencia[:80]}")
+    tabla = m.group(1)
+    columnas = [c.strip().strip('`') for c in m.group(2).split(',')]
+    texto = sentencia.lstrip()
+    pos = m.end()
+    token_re = TOKEN_LEGACY_RE if legacy else TOKEN_RE
+
+    filas = []
+    fila: Optional[List[Any]] = None
+    while True:
+        t = token_re.match(texto, pos)
+        if not t:
+            resto = texto[pos:].lstrip()
+            # Cadena sin cerrar o fin del texto: la sentencia sigue en otra línea
+            if not resto or resto.startswith("'"):
+                raise SentenciaIncompleta()
+            inicio = len(texto) - len(resto)
+            raise TokenInvalido(inicio, re.split(r"[\s,();]", resto, 1)[0][:40])
+        pos = t.end()
+        simbolo = t.group('simbolo')
+        if fila is None:
+            if simbolo == '(':
+                fila = []
+            elif simbolo == ';':
+                return tabla, columnas, filas
+            elif simbolo != ',':
+                raise ValueError(f"Token inesperado en {tabla}: {t.group(0).strip()}")
+            continue
+        if t.group('cadena') is not None:
+            fila.append(_cadena(t.group('cadena'), legacy))
+        elif t.group('nulo') is not None:
+            fila.append(None)
+        elif t.group('numero') is not None:
+            fila.append(_numero(t.group('numero')))
+        elif simbolo == ')':
+            if len(fila) != len(columnas):
+                raise ValueError(f"Fila con {len(fila)} valores para {len(columnas)} columnas")
+            filas.append(tuple(fila))
+            fila = None
+
+def leer_sql(f, legacy: bool) -> Iterator[Tuple[str, List[str], List[Tuple]]]:
+    """Recorre las sentencias INSERT del archivo, una a la vez"""
+    pendiente = []
+    inicio = 0
+    for numero, linea in enumerate(f, 1):
+        if not pendiente and (not linea.strip() or linea.startswith('--')):
+            continue
+        if not pendiente:
+            inicio = numero
+        pendiente.append(linea)
+        if not linea.rstrip().endswith(';'):
+            continue
+        sentencia = ''.join(pendiente)
+        try:
+            yield parsear_insert(sentencia, legacy)
+            pendiente = []
+        except SentenciaIncompleta:
+            continue
+        except TokenInvalido as e:
+            linea_error = inicio + sentencia.lstrip()[:e.pos].count('\n')
+            raise ValueError(f"Línea {linea_error}: {e}") from None
+    if pendiente:
+        raise ValueError(f"El backup termina con una sentencia incompleta (empieza en la línea {inicio})")
+
+def leer_jsonl(f, tabla: str) -> Iterator[Tuple[str, List[str], List[Tuple]]]:
+    columnas = None
+    filas = []
+    for linea in f:
+        if not linea.strip():
+            continue
+        registro = json.loads(linea)
+        if columnas is None:
+            columnas = list(registro)
+        filas.append(tuple(registro.get(c) for c in columnas))
+        if len(filas) >= LOTE:
+            yield tabla, columnas, filas
+            filas = []
+    if filas:
+        yield tabla, columnas, filas
+
+def es_legacy(path: str) -> bool:
+    """Los backups de backup.py declaran sus columnas en el encabezado; los viejos no"""
+    with backup.abrir_entrada(path) as f:
+        for _ in range(5):
+            linea = f.readline()
+            if linea.startswith('-- Columnas:'):
+                return False
+    return True
+
+def sentencia_insert(tabla: str, columnas: List[str], si_existe: str) -> str:
+    verbo = 'REPLACE' if si_existe == 'reemplazar' else 'INSERT'
+    q = f"{verbo} INTO {tabla} ({', '.join(columnas)}) VALUES ({', '.join(['%s'] * len(columnas))})"
+    if si_existe == 'saltar':
+        q += " ON DUPLICATE KEY UPDATE id = id"
+    return q
+
+def restaurar(conn, path: str, tabla: str = 'ejercicios', lecciones: Optional[List[int]] = None,
+              si_existe: str = 'saltar', lote: int = LOTE, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Carga el backup en lotes de `lote` filas (executemany arma un INSERT multi-fila).
+    Durante la carga se desactivan los checks de FK/unicidad de la sesión.
+    """
+    stats = {'leidas': 0, 'filtradas': 0, 'cargadas': 0}
+    filtro = set(lecciones) if lecciones else None
+    es_jsonl = path.endswith(BACKUPS_JSONL)
+    legacy = not es_jsonl and es_legacy(path)
+    if legacy:
+        print("ℹ️  Backup con formato antiguo: solo se interpretan las comillas escapadas")
+
+    cursor = conn.cursor()
+    tablas = set()
+    try:
+        if not dry_run:
+            cursor.execute("SET SESSION foreign_key_checks = 0, unique_checks = 0")
+
+        with backup.abrir_entrada(path) as f:
+            sentencias = leer_jsonl(f, tabla) if es_jsonl else leer_sql(f, legacy)
+            pendientes = []
+            actual = None
+            for nombre, columnas, filas in sentencias:
+                stats['leidas'] += len(filas)
+                if filtro is not None:
+                    i = columnas.index('leccion_id')
+                    filas = [fila for fila in filas if fila[i] in filtro]
+                stats['filtradas'] += len(filas)
+                if dry_run or not filas:
+                    continue
+
+                if nombre not in tablas:
+                    # Backups y bancos recientes traen ejercicios.firma; la BD destino debe estar migrada
+                    if nombre == 'ejercicios' and firmas.COLUMNA_FIRMA in columnas:
+                        firmas.verificar_columna_firma(cursor)
+                    tablas.add(nombre)
+                clave = (nombre, tuple(columnas))
+                if pendientes and clave != actual:
+                    cursor.executemany(sentencia_insert(actual[0], list(actual[1]), si_existe), pendientes)
+                    stats['cargadas'] += len(pendientes)
+                    pendientes = []
+                actual = clave
+                pendientes.extend(filas)
+                while len(pendientes) >= lote:
+                    cursor.executemany(sentencia_insert(nombre, columnas, si_existe), pendientes[:lote])
+                    conn.commit()
+                    stats['cargadas'] += lote
+                    pendientes = pendientes[lote:]
+                    print(f"   ✓ {stats['cargadas']} filas cargadas")
+
+            if pendientes:
+                cursor.executemany(sentencia_insert(actual[0], list(actual[1]), si_existe), pendientes)
+                stats['cargadas'] += len(pendientes)
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if not dry_run:
+            cursor.execute("SET SESSION foreign_key_checks = 1, unique_checks = 1")
+        cursor.close()
+
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Restaurar un backup de ejercicios")
+    parser.add_argument("archivo", help="backup .sql/.jsonl, opcionalmente .gz o .zst")
+    parser.add_argument("--tabla", type=str, default="ejercicios",
+                        help="Tabla destino para backups JSONL (default: ejercicios)")
+    parser.add_argument("--leccion-id", type=int, nargs='+',
+                        help="Restaurar solo los ejercicios de estas lecciones")
+    parser.add_argument("--si-existe", choices=('saltar', 'reemplazar', 'error'), default='saltar',
+                        help="Qué hacer con ids que ya existen (default: saltar)")
+    parser.add_argument("--lote", type=int, default=LOTE, help=f"Filas por INSERT (default: {LOTE})")
+    parser.add_argument("--dry-run", action="store_true", help="Solo leer y contar filas")
+    args = parser.parse_args(argv)
+
+    conn = backup.conectar_bd()
+    try:
+        print(f"\n♻️  Restaurando {args.archivo}...")
+        stats = restaurar(conn, args.archivo, args.tabla, args.leccion_id,
+                          args.si_existe, max(1, args.lote), args.dry_run)
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+    print(f"\n{'='*70}")
+    print(f"📄 Filas en el backup: {stats['leidas']}")
+    if args.leccion_id:
+        print(f"🔍 Filas de las lecciones pedidas: {stats['filtradas']}")
+    print(f"{'🔎 Se cargarían' if args.dry_run else '✅ Filas enviadas'}: "
+          f"{stats['filtradas'] if args.dry_run else stats['cargadas']}")
+    print(f"{'='*70}\n")
+
+if __name__ == '__main__':
+    main()
@@ -2,13 +2,21 @@
 # -*- coding: utf-8 -*-
 """
 🔄 SINCRONIZADOR MAESTRO - SpeakLexi 2.0
-Sincroniza lecciones de BD con KB y genera ejercicios automáticamente
+Sincroniza lecciones de BD con KB y genera ejercicios automáticamente.
+Primero planifica (solo lecturas, se puede guardar con --plan para revisarlo)
+y luego aplica renombres y altas en una sola transacción corta (--aplicar).
 """
 
+import sys
 import pymysql
 import json
+import argparse
 from pathlib import Path
 from datetime import datetime
+import kb_cache
+import borrado_lotes
+import actualizacion_lotes
+import almacen
 
 # ============================================
 # CONFIGURACIÓN
@@ -30,7 +38,7 @@ KB_PATH = Path('D:/PROJECTS/speakLexi-2.0/backend/data/kb')
 
 def conectar_bd():
     try:
-        conexion = pymysql.connect(**DB_CONFIG)
+        conexion = almacen.conectar(**DB_CONFIG)
         print("✅ Conexión exitosa a la base de datos\n")
         return conexion
     except Exception as e:
@@ -38,29 +46,23 @@ def conectar_bd():
         exit(1)
 
 def cargar_kb():
-    """Cargar todos los archivos KB"""
+    """Cargar todos los archivos KB (desde la caché compilada si no cambiaron)"""
     kb_data = {}
     
-    kb_files = {
-        'Inglés': 'kb_ingles.json',
-        'Francés': 'kb_frances.json',
-        'Alemán': 'kb_aleman.json',
-        'Italiano': 'kb_italiano.json'
-    }
-    
     print("📥 Cargando Knowledge Base...")
-    for idioma, filename in kb_files.items():
-        filepath = KB_PATH / filename
-        if filepath.exists():
-            with open(filepath, 'r', encoding='utf-8') as f:
-                content = json.load(f)
-                kb_data[idioma] = content.get(idioma, {})
-                
-                # Contar lecciones por nivel
-                total = sum(len(temas) for temas in kb_data[idioma].values())
-                print(f"  ✅ {idioma}: {total} lecciones en KB")
+    kb = kb_cache.cargar_kb(KB_PATH)
+    for idioma in kb_cache.KB_FILES:
+        if idioma in kb.datos:
+            kb_data[idioma] = kb.datos[idioma]
+            
+            # Contar lecciones por nivel
+            total = kb.total_lecciones(idioma)
+            print(f"  ✅ {idioma}: {total} lecciones en KB")
         else:
-            print(f"  ⚠️  {idioma}: Archivo no encontrado")
+            if idioma in kb.errores:
+                print(f"  ⚠️  {idioma}: Error cargando ({kb.errores[idioma]})")
+            else:
+                print(f"  ⚠️  {idioma}: Archivo no encontrado")
             kb_data[idioma] = {}
     
     return kb_data
@@ -71,33 +73,112 @@ def obtener_creador_id(cursor):
     resultado = cursor.fetchone()
     return resultado['id'] if resultado else 1
 
-def sincronizar_lecciones(cursor, kb_data, creador_id):
+class IndiceTitulos:
     """
-    Sincronizar lecciones de BD con KB
-    - Actualiza títulos si hay match parcial
-    - Crea lecciones nuevas si no existen
-    - Marca lecciones huérfanas
+    Títulos de BD de un mismo (idioma, nivel) con índice de trigramas.
+    Un match parcial (un título contenido en el otro, sin distinguir mayúsculas)
+    solo es posible si todos los trigramas del más corto aparecen en el más largo,
+    así que solo se comparan los candidatos que el índice deja pasar.
     """
-    print("\n🔄 Sincronizando lecciones con KB...")
+
+    def __init__(self):
+        self.lecciones = []       # [(id, titulo, titulo_normalizado)] en orden de BD
+        self.trigramas = {}       # trigrama -> [posiciones]
+        self.num_trigramas = []   # cantidad de trigramas distintos por posición
+        self.cortos = []          # posiciones con títulos de menos de 3 caracteres
+        self.usadas = set()
+
+    @staticmethod
+    def _trigramas(texto):
+        return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+    def agregar(self, leccion_id, titulo):
+        pos = len(self.lecciones)
+        normalizado = titulo.lower()
+        self.lecciones.append((leccion_id, titulo, normalizado))
+        trigramas = self._trigramas(normalizado)
+        self.num_trigramas.append(len(trigramas))
+        if not trigramas:
+            self.cortos.append(pos)
+        for t in trigramas:
+            self.trigramas.setdefault(t, []).append(pos)
+
+    def marcar_usada(self, pos):
+        self.usadas.add(pos)
+
+    def buscar_parcial(self, titulo_kb):
+        """Primera lección (en orden de BD) cuyo título contiene o está contenido en titulo_kb"""
+        normalizado = titulo_kb.lower()
+        trigramas = self._trigramas(normalizado)
+
+        if not trigramas:
+            # Título KB muy corto: puede estar dentro de cualquier título
+            candidatos = range(len(self.lecciones))
+        else:
+            coincidencias = {}
+            for t in trigramas:
+                for pos in self.trigramas.get(t, ()):
+                    coincidencias[pos] = coincidencias.get(pos, 0) + 1
+            candidatos = sorted(
+                [pos for pos, n in coincidencias.items()
+                 if n == len(trigramas) or n == self.num_trigramas[pos]] + self.cortos
+            )
+
+        for pos in candidatos:
+            if pos in self.usadas:
+                continue
+            normalizado_bd = self.lecciones[pos][2]
+            if normalizado in normalizado_bd or normalizado_bd in normalizado:
+                return pos
+        return None
+
+PLAN_VERSION = 1
+LECCIONES_POR_INSERT = 200
+
+def planificar_sincronizacion(cursor, kb_data):
+    """
+    Calcula todos los cambios contra el KB sin escribir nada:
+    - renombrar: lecciones con match parcial cuyo título pasa a ser el del KB
+    - crear: lecciones del KB que no existen en BD
+    - huerfanas: lecciones en BD que no están en el KB ni se renombran
+    Devuelve el plan como dict serializable a JSON.
+    """
+    print("\n🔄 Planificando sincronización con KB...")
     print("="*80)
     
-    estadisticas = {
-        'actualizadas': 0,
-        'creadas': 0,
-        'huerfanas': 0,
-        'correctas': 0
+    plan = {
+        'version': PLAN_VERSION,
+        'creado': datetime.now().isoformat(timespec='seconds'),
+        'base_datos': DB_CONFIG['database'],
+        'correctas': 0,
+        'renombrar': [],
+        'crear': [],
+        'huerfanas': []
     }
     
-    lecciones_kb = {}  # Para trackear qué lecciones deberían existir
-    lecciones_bd = {}  # Para trackear qué lecciones existen
+    # Qué lecciones deberían existir según el KB
+    lecciones_kb = {
+        (idioma, nivel, titulo_kb)
+        for idioma, niveles in kb_data.items() if niveles
+        for nivel, temas in niveles.items()
+        for titulo_kb in temas.keys()
+    }
     
-    # 1. Obtener todas las lecciones de BD
+    # 1. Obtener todas las lecciones de BD, agrupadas una sola vez por (idioma, nivel)
     cursor.execute("SELECT id, titulo, idioma, nivel FROM lecciones")
-    for leccion in cursor.fetchall():
-        key = f"{leccion['idioma']}-{leccion['nivel']}-{leccion['titulo']}"
-        lecciones_bd[key] = leccion['id']
+    lecciones_bd = cursor.fetchall()
+    existentes = set()
+    indices = {}
+    for leccion in lecciones_bd:
+        key = (leccion['idioma'], leccion['nivel'], leccion['titulo'])
+        existentes.add(key)
+        indice = indices.setdefault((leccion['idioma'], leccion['nivel']), IndiceTitulos())
+        indice.agregar(leccion['id'], leccion['titulo'])
+        # Las que ya coinciden exactamente con el KB no se ofrecen como match parcial
+        if key in lecciones_kb:
+            indice.marcar_usada(len(indice.lecciones) - 1)
     
-    # 2. Recorrer KB y sincronizar
+    # 2. Recorrer KB y decidir
     for idioma, niveles in kb_data.items():
         if not niveles:
             continue
@@ -105,128 +186,211 @@ def sincronizar_lecciones(cursor, kb_data, creador_id):
         print(f"\n📚 {idioma}:")
         
         for nivel, temas in niveles.items():
+            indice = indices.get((idioma, nivel), IndiceTitulos())
+            
             for titulo_kb in temas.keys():
-                key_kb = f"{idioma}-{nivel}-{titulo_kb}"
-                lecciones_kb[key_kb] = True
+                key_kb = (idioma, nivel, titulo_kb)
                 
                 # Buscar si existe en BD
-                if key_kb in lecciones_bd:
+                if key_kb in existentes:
                     # ✅ Existe y coincide exactamente
-                    estadisticas['correctas'] += 1
+                    plan['correctas'] += 1
                     print(f"  ✅ {nivel} - {titulo_kb}")
+                    continue
+                
+                # Buscar match parcial (mismo idioma y nivel, título similar)
+                pos = indice.buscar_parcial(titulo_kb)
+                if pos is not None:
+                    leccion_id, titulo_bd, _ = indice.lecciones[pos]
+                    # ⚠️ Renombrar
+                    indice.marcar_usada(pos)
+                    plan['renombrar'].append({
+                        'id': leccion_id, 'idioma': idioma, 'nivel': nivel,
+                        'de': titulo_bd, 'a': titulo_kb
+                    })
+                    print(f"  ⚠️  {nivel} - {titulo_bd} → {titulo_kb}")
                 else:
-                    # Buscar match parcial (mismo idioma y nivel, título similar)
-                    encontrada = False
-                    for key_bd, leccion_id in lecciones_bd.items():
-                        partes = key_bd.split('-', 2)
-                        if len(partes) >= 3:
-                            idioma_bd, nivel_bd, titulo_bd = partes[0], partes[1], partes[2]
-                            
-                            if idioma_bd == idioma and nivel_bd == nivel:
-                                # Verificar si es match parcial
-                                if titulo_kb.lower() in titulo_bd.lower() or titulo_bd.lower() in titulo_kb.lower():
-                                    # ⚠️ Actualizar título
-                                    cursor.execute(
-                                        "UPDATE lecciones SET titulo = %s WHERE id = %s",
-                                        (titulo_kb, leccion_id)
-                                    )
-                                    estadisticas['actualizadas'] += 1
-                                    print(f"  ⚠️  {nivel} - {titulo_bd} → {titulo_kb}")
-                                    encontrada = True
-                                    break
-                    
-                    if not encontrada:
-                        # ✨ Crear nueva lección
-                        contenido = json.dumps({
-                            "descripcion": f"Lección de {titulo_kb}",
-                            "temas": list(temas[titulo_kb].get('vocabulario', [])[:5]),
-                            "nivel": nivel,
-                            "idioma": idioma
-                        }, ensure_ascii=False)
-                        
-                        cursor.execute("""
-                            INSERT INTO lecciones (
-                                titulo, descripcion, contenido, nivel, idioma,
-                                duracion_minutos, orden, estado, creado_por
-                            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        """, (
-                            titulo_kb,
-                            f"Aprende sobre {titulo_kb}",
-                            contenido,
-                            nivel,
-                            idioma,
-                            40,  # duración por defecto
-                            0,
-                            'activa',
-                            creador_id
-                        ))
-                        estadisticas['creadas'] += 1
-                        print(f"  ✨ {nivel} - {titulo_kb} (NUEVA)")
+                    # ✨ Crear nueva lección
+                    contenido = json.dumps({
+                        "descripcion": f"Lección de {titulo_kb}",
+                        "temas": list(temas[titulo_kb].get('vocabulario', [])[:5]),
+                        "nivel": nivel,
+                        "idioma": idioma
+                    }, ensure_ascii=False)
+                    plan['crear'].append({
+                        'idioma': idioma, 'nivel': nivel, 'titulo': titulo_kb,
+                        'descripcion': f"Aprende sobre {titulo_kb}",
+                        'contenido': contenido,
+                        'duracion_minutos': 40  # duración por defecto
+                    })
+                    print(f"  ✨ {nivel} - {titulo_kb} (NUEVA)")
     
-    # 3. Identificar lecciones huérfanas (en BD pero no en KB)
+    # 3. Identificar lecciones huérfanas (en BD pero no en KB, ni renombradas).
+    # Solo se ofrecen para borrar las de un idioma y nivel que el KB sí tiene
     print(f"\n🔍 Buscando lecciones huérfanas...")
-    for key_bd in lecciones_bd.keys():
-        if key_bd not in lecciones_kb:
-            estadisticas['huerfanas'] += 1
-            partes = key_bd.split('-', 2)
-            if len(partes) >= 3:
-                print(f"  ⚠️  Huérfana: {partes[0]} - {partes[1]} - {partes[2]}")
+    for (idioma, nivel), indice in indices.items():
+        for pos, (leccion_id, titulo_bd, _) in enumerate(indice.lecciones):
+            if pos not in indice.usadas:
+                plan['huerfanas'].append({
+                    'id': leccion_id, 'idioma': idioma, 'nivel': nivel, 'titulo': titulo_bd,
+                    'borrable': idioma in kb_data and nivel in (kb_data[idioma] or {})
+                })
+                print(f"  ⚠️  Huérfana: {idioma} - {nivel} - {titulo_bd}")
     
-    return estadisticas
+    return plan
 
-def borrar_huerfanas(cursor, kb_data):
-    """Borrar lecciones que no están en el KB"""
-    print("\n🗑️  ¿Deseas borrar las lecciones huérfanas? (s/n): ", end='')
-    respuesta = input().strip().lower()
-    
-    if respuesta != 's':
-        print("⏭️  Saltando borrado de huérfanas")
-        return 0
-    
-    # Obtener IDs de lecciones huérfanas
-    cursor.execute("SELECT id, titulo, idioma, nivel FROM lecciones")
-    lecciones_bd = cursor.fetchall()
-    
-    ids_huerfanas = []
-    for leccion in lecciones_bd:
-        idioma = leccion['idioma']
-        nivel = leccion['nivel']
-        titulo = leccion['titulo']
-        
-        # Verificar si existe en KB
-        if idioma in kb_data and nivel in kb_data[idioma]:
-            if titulo not in kb_data[idioma][nivel]:
-                ids_huerfanas.append(leccion['id'])
-    
+def guardar_plan(plan, path):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(plan, f, ensure_ascii=False, indent=1)
+    Path(tmp).replace(path)
+
+def cargar_plan(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        plan = json.load(f)
+    if plan.get('version') != PLAN_VERSION:
+        raise ValueError(f"Plan de otra versión ({plan.get('version')}), vuelve a planificar")
+    return plan
+
+def huerfanas_vigentes(cursor, huerfanas, kb_data):
+    """
+    De las huérfanas borrables del plan, los ids que siguen igual en la BD (mismo
+    idioma, nivel y título) y siguen sin lección en el KB. Devuelve (ids, problemas).
+    """
+    borrables = [h for h in huerfanas if h['borrable']]
+    if not borrables:
+        return [], []
+    ids = [h['id'] for h in borrables]
+    cursor.execute(f"SELECT id, idioma, nivel, titulo FROM lecciones WHERE id IN ({', '.join(['%s'] * len(ids))})", ids)
+    actuales = {f['id']: (f['idioma'], f['nivel'], f['titulo']) for f in cursor.fetchall()}
+    vigentes, problemas = [], []
+    for h in borrables:
+        actual = actuales.get(h['id'])
+        if actual is None:
+            problemas.append(f"huérfana {h['id']} ya no existe")
+        elif actual != (h['idioma'], h['nivel'], h['titulo']):
+            problemas.append(f"huérfana {h['id']} cambió: ahora es {actual[0]} {actual[1]} '{actual[2]}'")
+        elif h['titulo'] in ((kb_data.get(h['idioma']) or {}).get(h['nivel']) or {}):
+            problemas.append(f"huérfana {h['id']} '{h['titulo']}' ahora está en el KB")
+        else:
+            vigentes.append(h['id'])
+    return vigentes, problemas
+
+def verificar_plan(cursor, plan, kb_data=None):
+    """
+    Problemas por los que el plan ya no corresponde a la BD (lista vacía si sigue valiendo).
+    Con kb_data también se revisan las huérfanas que se van a borrar.
+    """
+    problemas = []
+    if plan['renombrar']:
+        ids = [r['id'] for r in plan['renombrar']]
+        cursor.execute(f"SELECT id, titulo FROM lecciones WHERE id IN ({', '.join(['%s'] * len(ids))})", ids)
+        actuales = {f['id']: f['titulo'] for f in cursor.fetchall()}
+        for r in plan['renombrar']:
+            if actuales.get(r['id']) != r['de']:
+                problemas.append(f"lección {r['id']} ya no se llama '{r['de']}'")
+    if plan['crear']:
+        titulos = sorted({c['titulo'] for c in plan['crear']})
+        cursor.execute(f"SELECT idioma, nivel, titulo FROM lecciones WHERE titulo IN ({', '.join(['%s'] * len(titulos))})",
+                       titulos)
+        ya = {(f['idioma'], f['nivel'], f['titulo']) for f in cursor.fetchall()}
+        for c in plan['crear']:
+            if (c['idioma'], c['nivel'], c['titulo']) in ya:
+                problemas.append(f"'{c['titulo']}' ({c['idioma']} {c['nivel']}) ya existe")
+    if kb_data is not None:
+        problemas.extend(huerfanas_vigentes(cursor, plan['huerfanas'], kb_data)[1])
+    return problemas
+
+def aplicar_plan(conn, cursor, plan, creador_id, kb_data=None):
+    """
+    Ejecuta renombres y altas del plan en una sola transacción corta:
+    un UPDATE con CASE por cada lote de renombres y un INSERT multi-fila por lote de altas.
+    """
+    problemas = verificar_plan(cursor, plan, kb_data)
+    if problemas:
+        conn.rollback()
+        for p in problemas[:10]:
+            print(f"  ❌ {p}")
+        raise ValueError(f"El plan está desactualizado ({len(problemas)} diferencias), vuelve a planificar")
+
+    try:
+        renombradas = actualizacion_lotes.actualizar_en_lotes(
+            cursor, 'lecciones', 'titulo', {r['id']: r['a'] for r in plan['renombrar']}
+        )
+        fila = "(%s, %s, %s, %s, %s, %s, %s, %s, %s)"
+        for i in range(0, len(plan['crear']), LECCIONES_POR_INSERT):
+            lote = plan['crear'][i:i + LECCIONES_POR_INSERT]
+            cursor.execute("""
+                INSERT INTO lecciones (
+                    titulo, descripcion, contenido, nivel, idioma,
+                    duracion_minutos, orden, estado, creado_por
+                ) VALUES """ + ", ".join([fila] * len(lote)),
+                [v for c in lote for v in (c['titulo'], c['descripcion'], c['contenido'], c['nivel'],
+                                           c['idioma'], c['duracion_minutos'], 0, 'activa', creador_id)]
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return renombradas, len(plan['crear'])
+
+def borrar_huerfanas(conn, cursor, ids_huerfanas, tamano_lote=borrado_lotes.TAMANO_LOTE, pausa=0.0):
+    """Borrar las lecciones huérfanas del plan y sus ejercicios"""
     if not ids_huerfanas:
         print("✅ No hay lecciones huérfanas")
         return 0
     
-    # Borrar ejercicios primero
-    placeholders = ','.join(['%s'] * len(ids_huerfanas))
-    cursor.execute(f"DELETE FROM ejercicios WHERE leccion_id IN ({placeholders})", ids_huerfanas)
-    ejercicios_borrados = cursor.rowcount
+    # Borrar ejercicios primero (en lotes, con commit por lote)
+    ejercicios_borrados = borrado_lotes.borrar_en_lotes(
+        conn, cursor, 'ejercicios', 'leccion_id', ids_huerfanas,
+        tamano=tamano_lote, pausa=pausa, etiqueta='Ejercicios de huérfanas'
+    )
     
     # Borrar lecciones
-    cursor.execute(f"DELETE FROM lecciones WHERE id IN ({placeholders})", ids_huerfanas)
-    lecciones_borradas = cursor.rowcount
+    lecciones_borradas = borrado_lotes.borrar_en_lotes(
+        conn, cursor, 'lecciones', 'id', ids_huerfanas,
+        tamano=tamano_lote, pausa=pausa, etiqueta='Lecciones huérfanas'
+    )
     
     print(f"✅ {lecciones_borradas} lecciones huérfanas eliminadas")
     print(f"✅ {ejercicios_borrados} ejercicios asociados eliminados")
     
     return lecciones_borradas
 
-def main():
+def mostrar_resumen(plan):
+    print("\n" + "="*80)
+    print("📊 PLAN DE SINCRONIZACIÓN")
+    print("="*80)
+    print(f"✅ Lecciones correctas (ya existían): {plan['correctas']}")
+    print(f"⚠️  Lecciones a renombrar (título corregido): {len(plan['renombrar'])}")
+    print(f"✨ Lecciones a crear (nuevas): {len(plan['crear'])}")
+    print(f"⚠️  Lecciones huérfanas (en BD pero no en KB): {len(plan['huerfanas'])}")
+    print("="*80)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sincronizar lecciones de BD con el KB")
+    parser.add_argument("--lote-borrado", type=int, default=borrado_lotes.TAMANO_LOTE,
+                        help=f"Filas por DELETE al borrar huérfanas (default: {borrado_lotes.TAMANO_LOTE})")
+    parser.add_argument("--pausa", type=float, default=0.0,
+                        help="Segundos de espera entre lotes de borrado")
+    modo = parser.add_mutually_exclusive_group()
+    modo.add_argument("--plan", type=str, metavar="ARCHIVO",
+                      help="Solo planificar: guardar los cambios en ARCHIVO (JSON) sin escribir en la BD")
+    modo.add_argument("--aplicar", type=str, metavar="ARCHIVO",
+                      help="Aplicar un plan guardado con --plan")
+    parser.add_argument("--borrar-huerfanas", action="store_true",
+                        help="Con --aplicar, borrar también las huérfanas del plan")
+    args = parser.parse_args(argv)
+    
     print("="*80)
     print("🔄 SINCRONIZADOR MAESTRO - SpeakLexi 2.0")
     print("="*80)
     print()
     print("Este script:")
     print("  1. Lee el Knowledge Base (KB)")
-    print("  2. Sincroniza lecciones en BD con el KB")
-    print("  3. Actualiza títulos si hay diferencias")
-    print("  4. Crea lecciones nuevas si faltan")
-    print("  5. Opcionalmente borra lecciones huérfanas")
+    print("  2. Calcula el plan: títulos a corregir, lecciones a crear y huérfanas")
+    print("  3. Aplica renombres y altas en una sola transacción")
+    print("  4. Opcionalmente borra lecciones huérfanas")
     print()
     
     # Conectar
@@ -234,43 +398,54 @@ def main():
     cursor = conn.cursor()
     
     try:
-        # Obtener creador
-        creador_id = obtener_creador_id(cursor)
-        
-        # Cargar KB
-        kb_data = cargar_kb()
-        
-        # Sincronizar
-        stats = sincronizar_lecciones(cursor, kb_data, creador_id)
+        if args.aplicar:
+            plan = cargar_plan(args.aplicar)
+            print(f"📄 Plan {args.aplicar} (creado {plan['creado']})")
+            # Las huérfanas se vuelven a comparar con el KB actual antes de borrar nada
+            kb_data = cargar_kb() if args.borrar_huerfanas else None
+        else:
+            kb_data = cargar_kb()
+            plan = planificar_sincronizacion(cursor, kb_data)
+            # Solo lecturas hasta aquí: se cierra la transacción antes de esperar al operador
+            conn.rollback()
+        mostrar_resumen(plan)
         
-        # Mostrar resumen
-        print("\n" + "="*80)
-        print("📊 RESUMEN DE SINCRONIZACIÓN")
-        print("="*80)
-        print(f"✅ Lecciones correctas (ya existían): {stats['correctas']}")
-        print(f"⚠️  Lecciones actualizadas (título corregido): {stats['actualizadas']}")
-        print(f"✨ Lecciones creadas (nuevas): {stats['creadas']}")
-        print(f"⚠️  Lecciones huérfanas (en BD pero no en KB): {stats['huerfanas']}")
-        print("="*80)
+        if args.plan:
+            guardar_plan(plan, args.plan)
+            print(f"\n💾 Plan guardado en {args.plan}")
+            print(f"   Revísalo y aplícalo con: python sincronizar.py --aplicar {args.plan}")
+            return
         
         # Confirmar cambios
-        if stats['actualizadas'] > 0 or stats['creadas'] > 0:
+        if plan['renombrar'] or plan['crear']:
             print("\n¿Confirmar estos cambios? (s/n): ", end='')
             respuesta = input().strip().lower()
             
             if respuesta == 's':
-                conn.commit()
-                print("✅ Cambios guardados")
-                
-                # Borrar huérfanas
-                if stats['huerfanas'] > 0:
-                    borradas = borrar_huerfanas(cursor, kb_data)
-                    if borradas > 0:
-                        conn.commit()
-                        print("✅ Huérfanas eliminadas")
+                creador_id = obtener_creador_id(cursor)
+                renombradas, creadas = aplicar_plan(conn, cursor, plan, creador_id, kb_data)
+                print(f"✅ Cambios guardados ({renombradas} renombradas, {creadas} creadas)")
             else:
-                conn.rollback()
                 print("❌ Cambios descartados")
+                return
+        
+        # Borrar huérfanas
+        if any(h['borrable'] for h in plan['huerfanas']):
+            if args.aplicar:
+                borrar = args.borrar_huerfanas
+            else:
+                print("\n🗑️  ¿Deseas borrar las lecciones huérfanas? (s/n): ", end='')
+                borrar = input().strip().lower() == 's'
+            if borrar:
+                # Se revisan de nuevo justo antes de borrar: solo se borran las que no cambiaron
+                ids_huerfanas, problemas = huerfanas_vigentes(cursor, plan['huerfanas'], kb_data)
+                for p in problemas:
+                    print(f"  ⏭️  {p} (no se borra)")
+                borradas = borrar_huerfanas(conn, cursor, ids_huerfanas, args.lote_borrado, args.pausa)
+                if borradas > 0:
+                    print("✅ Huérfanas eliminadas")
+            else:
+                print("⏭️  Saltando borrado de huérfanas")
         
         print("\n🎉 ¡Sincronización completada!")
         print("\n💡 Siguiente paso: Ejecuta generar_ejercicios.py para crear ejercicios")
@@ -280,6 +455,7 @@ def main():
         conn.rollback()
         import traceback
         traceback.print_exc()
+        return 1
     
     finally:
         cursor.close()
@@ -287,4 +463,4 @@ def main():
         print("\n👋 Conexión cerrada")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧰 SPEAKLEXI-DATA - SpeakLexi 2.0
+Un solo comando para los scripts de mantenimiento de contenido. Todos los
+subcomandos corren en el mismo proceso, con una sola conexión (almacen.compartir)
+y el KB cargado una vez (kb_cache lo guarda en memoria).
+
+    python speaklexi-data.py generar --changed-only --seed 1
+    python speaklexi-data.py pipeline --si
+    python speaklexi-data.py pipeline "sincronizar" "generar --changed-only" "limpiar --por-firma" --si
+
+Antes de la primera corrida sobre una base nueva: python firmas.py --migrar
+"""
+
+import os
+import sys
+import time
+import shlex
+import traceback
+import argparse
+import builtins
+import getpass
+import importlib.util
+import pymysql
+import pymysql.cursors
+import almacen
+import kb_cache
+import validar_kb
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Tuple
+
+try:
+    SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+except NameError:
+    SCRIPT_DIR = os.getcwd()
+
+KB_DIR = os.path.join(SCRIPT_DIR, 'kb')
+
+# subcomando -> (script, descripción)
+COMANDOS = {
+    'sincronizar': ('sincronizar.py', "Sincronizar lecciones de BD con el KB"),
+    'reordenar': ('reordenar.py', "Reordenar lecciones por idioma y nivel"),
+    'generar': ('generar-lecciones.py', "Generar ejercicios desde el KB"),
+    'limpiar': ('limpiar-duplicados.py', "Eliminar ejercicios duplicados"),
+    'backup': ('backup.py', "Backup de una tabla"),
+    'restaurar': ('restaurar_backup.py', "Restaurar un backup"),
+    'kb': ('kb_cache.py', "Compilar la caché del KB"),
+    'validar': ('validar_kb.py', "Validar la estructura del KB"),
+    'firmas': ('firmas.py', "Migrar (una vez) o rellenar la columna ejercicios.firma"),
+}
+
+PIPELINE_NOCTURNO = ['sincronizar', 'reordenar', 'generar --changed-only', 'limpiar --por-firma']
+
+def cargar_script(nombre: str):
+    """Importa un script del directorio (los nombres con guion no se pueden importar con import)"""
+    archivo = COMANDOS[nombre][0]
+    modulo_nombre = os.path.splitext(archivo)[0].replace('-', '_')
+    if modulo_nombre in sys.modules:
+        return sys.modules[modulo_nombre]
+    spec = importlib.util.spec_from_file_location(modulo_nombre, os.path.join(SCRIPT_DIR, archivo))
+    modulo = importlib.util.module_from_spec(spec)
+    sys.modules[modulo_nombre] = modulo  # los workers de generar-lecciones lo necesitan para el pickle
+    spec.loader.exec_module(modulo)
+    return modulo
+
+def conectar_compartida():
+    if almacen.usa_sqlite():
+        return almacen.conectar(cursorclass=pymysql.cursors.DictCursor)
+    try:
+        conn = pymysql.connect(
+            host=os.getenv("DB_HOST", "localhost"),
+            user=os.getenv("DB_USER", "root"),
+            password=os.getenv("DB_PASS") or getpass.getpass("DB password: "),
+            database=os.getenv("DB_NAME", "SpeakLexi2"),
+            charset="utf8mb4",
+            cursorclass=pymysql.cursors.DictCursor,
+            autocommit=False
+        )
+        print("✅ Conexión compartida abierta\n")
+        return conn
+    except Exception as e:
+        print(f"❌ Error al conectar: {e}")
+        sys.exit(1)
+
+@contextmanager
+def confirmar_todo(activo: bool):
+    """Responde 's' a las confirmaciones interactivas de los scripts (corridas desatendidas)"""
+    if not activo:
+        yield
+        return
+    original = builtins.input
+    def responder(prompt=''):
+        print(f"{prompt}s")
+        return 's'
+    builtins.input = responder
+    try:
+        yield
+    finally:
+        builtins.input = original
+
+def correr_paso(nombre: str, argv: List[str], conn, kb_dir: str) -> Tuple[bool, float]:
+    """Corre un subcomando; devuelve (ok, segundos). Lo no confirmado por el script se descarta"""
+    modulo = cargar_script(nombre)
+    if hasattr(modulo, 'KB_PATH'):
+        modulo.KB_PATH = Path(kb_dir)
+    if hasattr(modulo, 'KB_DIR'):
+        modulo.KB_DIR = kb_dir
+
+    inicio = time.perf_counter()
+    try:
+        # Los scripts devuelven None o 0 si terminaron bien y 1 (o sys.exit(1)) si fallaron
+        codigo = modulo.main(argv)
+        ok = not codigo
+    except SystemExit as e:
+        ok = e.code in (None, 0)
+    except Exception as e:
+        print(f"\n❌ Error en {nombre}: {e}")
+        traceback.print_exc()
+        ok = False
+    finally:
+        if conn is not None:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+    return ok, time.perf_counter() - inicio
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="speaklexi-data", description="Mantenimiento de contenido de SpeakLexi")
+    parser.add_argument("--kb-dir", type=str, default=KB_DIR, help="Directorio del KB (default: backend/data/kb)")
+    parser.add_argument("--si", action="store_true", help="Confirmar automáticamente las preguntas s/n")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    for nombre, (_, descripcion) in COMANDOS.items():
+        sub.add_parser(nombre, help=descripcion, add_help=False)
+    p = sub.add_parser("pipeline", help="Correr varios pasos con la misma conexión y KB")
+    p.add_argument("pasos", nargs='*', default=PIPELINE_NOCTURNO,
+                   help=f"Pasos con sus flags, p. ej. \"generar --changed-only\" (default: {PIPELINE_NOCTURNO})")
+    p.add_argument("--kb-dir", type=str, default=argparse.SUPPRESS)
+    p.add_argument("--si", action="store_true", default=argparse.SUPPRESS)
+    # Todo lo que va después del subcomando se pasa tal cual al script
+    # (argparse.REMAINDER no acepta que el primer argumento empiece con --)
+    argv = sys.argv[1:] if argv is None else list(argv)
+    i = next((i for i, a in enumerate(argv) if a in COMANDOS or a == 'pipeline'), None)
+    if i is None or argv[i] == 'pipeline':
+        args = parser.parse_args(argv)
+        pasos = [shlex.split(p) for p in args.pasos]
+    else:
+        args = parser.parse_args(argv[:i + 1])
+        pasos = [[args.comando] + argv[i + 1:]]
+    for paso in pasos:
+        if not paso or paso[0] not in COMANDOS:
+            parser.error(f"Paso desconocido: {' '.join(paso)} (opciones: {', '.join(COMANDOS)})")
+
+    # El KB se carga una vez; los scripts lo toman de la memoria de kb_cache
+    kb = kb_cache.cargar_kb(args.kb_dir)
+    print(f"📦 KB: {len(kb.por_titulo)} lecciones ({'caché' if kb.desde_cache else 'JSON'})\n")
+
+    # Validar antes de abrir la conexión: un KB mal formado no llega a generar.
+    # El resultado se guardó al compilar el paquete, no se vuelven a leer los JSON
+    if any(p[0] == 'generar' and '--sin-validar' not in p for p in pasos):
+        if not validar_kb.kb_valido(args.kb_dir):
+            print("\n❌ KB inválido, no se corre ningún paso")
+            return 1
+        print()
+
+    necesita_bd = any(p[0] not in ('kb', 'validar') for p in pasos)
+    conn = conectar_compartida() if necesita_bd else None
+    almacen.compartir(conn)
+
+    resumen = []
+    try:
+        with confirmar_todo(args.si):
+            for paso in pasos:
+                print(f"\n{'#'*80}\n▶️  {' '.join(paso)}\n{'#'*80}")
+                ok, segundos = correr_paso(paso[0], paso[1:], conn, args.kb_dir)
+                resumen.append((' '.join(paso), ok, segundos))
+                if not ok:
+                    print(f"\n❌ Falló '{' '.join(paso)}', se detiene el pipeline")
+                    break
+    finally:
+        almacen.compartir(None)
+        if conn is not None:
+            conn.close()
+
+    if len(pasos) > 1 or not resumen[-1][1]:
+        print(f"\n{'='*70}\n📊 RESUMEN\n{'='*70}")
+        for paso, ok, segundos in resumen:
+            print(f"{'✅' if ok else '❌'} {paso:<45} {segundos:8.2f}s")
+        print(f"{'='*70}\n")
+    return 0 if all(ok for _, ok, _ in resumen) and len(resumen) == len(pasos) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,6 +9,9 @@ import sys
 import json
 import pymysql
 import getpass
+import kb_cache
+import almacen
+from collections.abc import Mapping
 
 # DB Config
 DB_HOST = os.getenv("DB_HOST", "localhost")
@@ -26,24 +29,16 @@ KB_DIR = os.path.join(SCRIPT_DIR, 'kb')
 KB = {}
 
 def cargar_kb():
-    """Carga todos los archivos KB"""
+    """Carga todos los archivos KB (desde la caché compilada si no cambiaron)"""
     global KB
-    archivos_kb = {
-        'Inglés': os.path.join(KB_DIR, 'kb_ingles.json'),
-        'Francés': os.path.join(KB_DIR, 'kb_frances.json'),
-        'Alemán': os.path.join(KB_DIR, 'kb_aleman.json'),
-        'Italiano': os.path.join(KB_DIR, 'kb_italiano.json')
-    }
+    kb = kb_cache.cargar_kb(KB_DIR)
     
-    for idioma, path in archivos_kb.items():
-        if os.path.exists(path):
-            try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    KB[idioma] = data.get(idioma, data)
-                print(f"✅ Cargado: {idioma}")
-            except Exception as e:
-                print(f"❌ Error en {idioma}: {e}")
+    for idioma in kb_cache.KB_FILES:
+        if idioma in kb.datos:
+            KB[idioma] = kb.datos[idioma]
+            print(f"✅ Cargado: {idioma}")
+        elif idioma in kb.errores:
+            print(f"❌ Error en {idioma}: {kb.errores[idioma]}")
 
 def analizar_kb():
     """Analiza estructura del KB"""
@@ -62,7 +57,7 @@ def analizar_kb():
         lecciones_con_ejemplos = 0
         
         for nivel, lecciones in niveles.items():
-            if not isinstance(lecciones, dict):
+            if not isinstance(lecciones, Mapping):
                 continue
             
             print(f"\n  📚 Nivel {nivel}: {len(lecciones)} lecciones")
@@ -98,8 +93,8 @@ def comparar_con_bd():
     print("="*70)
     
     try:
-        pwd = getpass.getpass("Password BD: ") if not os.getenv("DB_PASS") else os.getenv("DB_PASS")
-        conn = pymysql.connect(
+        pwd = getpass.getpass("Password BD: ") if not (os.getenv("DB_PASS") or almacen.usa_sqlite()) else os.getenv("DB_PASS")
+        conn = almacen.conectar(
             host=DB_HOST, user=DB_USER, password=pwd,
             database=DB_NAME, charset='utf8mb4',
             cursorclass=pymysql.cursors.DictCursor
@@ -12,14 +12,20 @@ import os
 from pathlib import Path
 from typing import Dict, List, Tuple
 from difflib import SequenceMatcher
+from collections import Counter
+from bisect import bisect_left, bisect_right
 from dotenv import load_dotenv
 import getpass
+import kb_cache
+import almacen
+import actualizacion_lotes
 
 # Cargar variables de entorno
 load_dotenv()
 
 # ===== CONFIGURACIÓN =====
 KB_PATH = Path('D:/PROJECTS/speakLexi-2.0/backend/data/kb')
+UMBRAL_SIMILITUD = 0.6
 
 # ===== FUNCIONES =====
 
@@ -34,7 +40,7 @@ def get_db_connection():
     database = input("Base de datos (default: speaklexi): ").strip() or "speaklexi"
     
     try:
-        conn = pymysql.connect(
+        conn = almacen.conectar(
             host=host,
             user=user,
             password=password,
@@ -53,26 +59,19 @@ def similarity(a: str, b: str) -> float:
     return SequenceMatcher(None, a.lower(), b.lower()).ratio()
 
 def load_kb() -> Dict:
-    """Carga todos los archivos KB"""
+    """Carga todos los archivos KB (desde la caché compilada si no cambiaron)"""
     kb_data = {}
     
-    kb_files = {
-        'Inglés': 'kb_ingles.json',
-        'Francés': 'kb_frances.json',
-        'Alemán': 'kb_aleman.json',
-        'Italiano': 'kb_italiano.json'
-    }
-    
-    for idioma, filename in kb_files.items():
-        filepath = KB_PATH / filename
-        if filepath.exists():
-            with open(filepath, 'r', encoding='utf-8') as f:
-                content = json.load(f)
-                # El KB tiene estructura: {idioma: {niveles}}
-                kb_data[idioma] = content.get(idioma, {})
-                print(f"✅ Cargado KB: {idioma}")
+    kb = kb_cache.cargar_kb(KB_PATH)
+    for idioma in kb_cache.KB_FILES:
+        if idioma in kb.datos:
+            # El KB tiene estructura: {idioma: {niveles}}
+            kb_data[idioma] = kb.datos[idioma]
+            print(f"✅ Cargado KB: {idioma}")
+        elif idioma in kb.errores:
+            print(f"⚠️  Error en {idioma}: {kb.errores[idioma]}")
         else:
-            print(f"⚠️  No encontrado: {filepath}")
+            print(f"⚠️  No encontrado: {KB_PATH / kb_cache.KB_FILES[idioma]}")
     
     return kb_data
 
@@ -93,18 +92,81 @@ def get_lecciones_bd(conn) -> List[Dict]:
         
     return lecciones
 
-def find_best_match(titulo_bd: str, kb_lecciones: List[str]) -> Tuple[str, float]:
+class MatcherTitulos:
+    """
+    Títulos KB de un (idioma, nivel) normalizados una sola vez.
+    Antes de calcular el ratio exacto de SequenceMatcher descarta candidatos con
+    dos cotas superiores del ratio: la de longitudes y la de caracteres en común
+    (equivalente a quick_ratio). Luego evalúa los candidatos de mayor a menor cota
+    y se detiene cuando ninguno restante puede superar al mejor, así el resultado
+    es idéntico al de comparar contra todos los títulos.
+    """
+
+    def __init__(self, kb_titulos: List[str]):
+        self.titulos = list(kb_titulos)
+        self.exactos = set(self.titulos)
+        normalizados = [t.lower() for t in self.titulos]
+        self.conteos = [Counter(n) for n in normalizados]
+        self.por_longitud = sorted((len(n), i) for i, n in enumerate(normalizados))
+        self.matchers = []
+        for n in normalizados:
+            sm = SequenceMatcher(None)
+            sm.set_seq2(n)  # b2j se calcula una vez por título KB
+            self.matchers.append(sm)
+
+    def _rango_longitudes(self, la: int, umbral: float):
+        """Índices cuya longitud permite 2*min(la, lb)/(la + lb) > umbral"""
+        if umbral <= 0:
+            return [i for _, i in self.por_longitud]
+        if la == 0:
+            # Dos títulos vacíos tienen ratio 1.0; contra uno no vacío, 0
+            return [i for lb, i in self.por_longitud if lb == 0]
+        minimo = la * umbral / (2 - umbral)
+        maximo = la * (2 - umbral) / umbral
+        desde = bisect_right(self.por_longitud, (int(minimo), len(self.titulos)))
+        hasta = bisect_left(self.por_longitud, (int(maximo) + 1, -1))
+        return [i for lb, i in self.por_longitud[desde:hasta] if minimo < lb < maximo]
+
+    def mejor_match(self, titulo_bd: str, umbral: float = 0.0) -> Tuple[str, float]:
+        a = titulo_bd.lower()
+        la = len(a)
+        conteo_a = Counter(a)
+
+        candidatos = []
+        for i in self._rango_longitudes(la, umbral):
+            total = la + sum(self.conteos[i].values())
+            if not total:
+                cota = 1.0
+            else:
+                comunes = sum(min(n, self.conteos[i][c]) for c, n in conteo_a.items())
+                cota = 2.0 * comunes / total
+            if cota > umbral:
+                candidatos.append((-cota, i))
+        candidatos.sort()
+
+        best_idx = None
+        best_score = 0
+        for menos_cota, i in candidatos:
+            cota = -menos_cota
+            if cota < best_score:
+                break  # los demás candidatos tienen cota aún menor
+            if cota == best_score and best_idx is not None and i > best_idx:
+                continue  # a lo sumo empataría, y gana el primero
+            sm = self.matchers[i]
+            sm.set_seq1(a)
+            score = sm.ratio()
+            if score > best_score or (score == best_score and best_idx is not None and i < best_idx):
+                best_score = score
+                best_idx = i
+
+        if best_idx is None:
+            return None, 0
+        return self.titulos[best_idx], best_score
+
+def find_best_match(titulo_bd: str, kb_lecciones, umbral: float = 0.0) -> Tuple[str, float]:
     """Encuentra la mejor coincidencia en el KB para un título de BD"""
-    best_match = None
-    best_score = 0
-    
-    for kb_titulo in kb_lecciones:
-        score = similarity(titulo_bd, kb_titulo)
-        if score > best_score:
-            best_score = score
-            best_match = kb_titulo
-    
-    return best_match, best_score
+    matcher = kb_lecciones if isinstance(kb_lecciones, MatcherTitulos) else MatcherTitulos(kb_lecciones)
+    return matcher.mejor_match(titulo_bd, umbral)
 
 def generar_updates(conn) -> List[Dict]:
     """Genera lista de UPDATEs necesarios"""
@@ -117,6 +179,7 @@ def generar_updates(conn) -> List[Dict]:
         return []
     
     updates = []
+    matchers = {}  # (idioma, nivel) -> MatcherTitulos
     matches_exactos = 0
     matches_parciales = 0
     sin_match = 0
@@ -138,18 +201,19 @@ def generar_updates(conn) -> List[Dict]:
             sin_match += 1
             continue
         
-        kb_nivel = kb_idioma[nivel]
-        kb_titulos = list(kb_nivel.keys())
+        if (idioma, nivel) not in matchers:
+            matchers[(idioma, nivel)] = MatcherTitulos(kb_idioma[nivel].keys())
+        matcher = matchers[(idioma, nivel)]
         
         # Buscar match exacto
-        if titulo_bd in kb_titulos:
+        if titulo_bd in matcher.exactos:
             matches_exactos += 1
             continue
         
         # Buscar mejor match por similitud
-        best_match, score = find_best_match(titulo_bd, kb_titulos)
+        best_match, score = find_best_match(titulo_bd, matcher, umbral=UMBRAL_SIMILITUD)
         
-        if score > 0.6:  # Umbral de similitud
+        if score > UMBRAL_SIMILITUD:  # Umbral de similitud
             if score < 1.0:  # No es exacto
                 matches_parciales += 1
                 updates.append({
@@ -202,11 +266,13 @@ def generar_sql(updates: List[Dict], filename: str = 'sync_titulos.sql'):
     ]
     
     for update in updates:
-        titulo_escapado = update['titulo_nuevo'].replace("'", "\\'")
         sql_lines.append(f"-- [{update['idioma']}-{update['nivel']}] {update['titulo_actual']} → {update['titulo_nuevo']}")
-        sql_lines.append(
-            f"UPDATE lecciones SET titulo = '{titulo_escapado}' WHERE id = {update['id']};"
-        )
+    sql_lines.append("")
+    
+    # Un UPDATE con CASE por cada lote en vez de uno por lección
+    cambios = {u['id']: u['titulo_nuevo'] for u in updates}
+    for sentencia in actualizacion_lotes.sentencias_literales('lecciones', 'titulo', cambios):
+        sql_lines.append(sentencia)
         sql_lines.append("")
     
     sql_lines.extend([
@@ -232,9 +298,9 @@ def ejecutar_updates(conn, updates: List[Dict]):
     
     try:
         with conn.cursor() as cursor:
-            for update in updates:
-                query = "UPDATE lecciones SET titulo = %s WHERE id = %s"
-                cursor.execute(query, (update['titulo_nuevo'], update['id']))
+            actualizacion_lotes.actualizar_en_lotes(
+                cursor, 'lecciones', 'titulo', {u['id']: u['titulo_nuevo'] for u in updates}
+            )
         
         conn.commit()
         print(f"✅ {len(updates)} lecciones actualizadas correctamente")
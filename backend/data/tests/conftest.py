@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""Pruebas de los scripts de datos: corren sin MySQL, sobre SQLite (almacen.py)"""
+
+import os
+import sys
+import importlib.util
+
+import pytest
+
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if DATA_DIR not in sys.path:
+    sys.path.insert(0, DATA_DIR)
+
+def cargar_script(nombre: str):
+    """Importa backend/data/<nombre>.py (los nombres con guion no se pueden importar con import)"""
+    modulo = nombre.replace('-', '_')
+    if modulo in sys.modules:
+        return sys.modules[modulo]
+    spec = importlib.util.spec_from_file_location(modulo, os.path.join(DATA_DIR, f"{nombre}.py"))
+    mod = importlib.util.module_from_spec(spec)
+    sys.modules[modulo] = mod
+    spec.loader.exec_module(mod)
+    return mod
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+    """Ruta de un SQLite vacío con el esquema de almacen; los scripts lo usan vía SPEAKLEXI_SQLITE"""
+    import almacen
+    ruta = str(tmp_path / 'speaklexi.db')
+    monkeypatch.setenv(almacen.ENV_SQLITE, ruta)
+    almacen.conectar_sqlite(ruta).close()
+    return ruta
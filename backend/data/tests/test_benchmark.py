@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import json
+import subprocess
+
+import pytest
+
+import benchmark
+
+@pytest.mark.parametrize('etapa', list(benchmark.ETAPAS))
+def test_funciones_de_cada_etapa_existen(etapa):
+    modulo = benchmark.cargar_modulo(etapa)
+    assert benchmark.funciones_faltantes(modulo, benchmark.ETAPAS[etapa]['funciones']) == []
+
+def test_funciones_faltantes_detecta_renombres():
+    modulo = benchmark.cargar_modulo('generar-lecciones')
+    assert benchmark.funciones_faltantes(modulo, ['EscritorEjercicios.vaciar', 'no_existe']) == \
+        ['EscritorEjercicios.vaciar', 'no_existe']
+
+def test_smoke_10k_sqlite(tmp_path):
+    """Todas las etapas a escala 10k contra BENCH_SQLITE, sin errores y con cada etapa medida"""
+    resultados_path = tmp_path / 'bench.json'
+    env = dict(os.environ, BENCH_SQLITE=str(tmp_path / 'bench.db'))
+    env.pop('SPEAKLEXI_SQLITE', None)
+    proceso = subprocess.run(
+        [sys.executable, benchmark.__file__, '--escalas', '10k',
+         '--json', str(resultados_path), '--logs', str(tmp_path / 'logs')],
+        env=env, capture_output=True, text=True, timeout=600
+    )
+    assert proceso.returncode == 0, proceso.stdout + proceso.stderr
+
+    resultados = json.loads(resultados_path.read_text(encoding='utf-8'))
+    assert {r['etapa'] for r in resultados} == set(benchmark.ETAPAS)
+    for r in resultados:
+        assert r.get('error') is None, f"{r['etapa']}: {r.get('error')}"
+        assert set(r['etapas']) == set(benchmark.ETAPAS[r['etapa']]['funciones']), r['etapa']
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+
+import almacen
+import firmas
+
+def _vf(afirmaciones, orden=1):
+    return {'tipo': 'verdadero_falso', 'contenido': {'afirmaciones': afirmaciones}, 'orden': orden}
+
+def test_firma_no_depende_del_formato_del_json():
+    contenido = {'preguntas': [{'pregunta': '¿Hola?', 'opciones': ['a', 'b']}]}
+    firma = firmas.firma_ejercicio('seleccion_multiple', contenido)
+    assert len(firma) == 32
+    assert firmas.firma_ejercicio('seleccion_multiple', json.dumps(contenido, indent=2)) == firma
+    # Solo cuenta la pregunta: otras opciones no la cambian
+    otras = {'preguntas': [{'pregunta': '¿Hola?', 'opciones': ['c']}]}
+    assert firmas.firma_ejercicio('seleccion_multiple', otras) == firma
+    assert firmas.firma_ejercicio('escritura', contenido) != firma
+
+def test_firma_ordena_afirmaciones_y_pares():
+    assert firmas.firma_ejercicio('verdadero_falso', {'afirmaciones': ['b', 'a']}) == \
+        firmas.firma_ejercicio('verdadero_falso', {'afirmaciones': ['a', 'b']})
+    pares = [{'izquierda': 'x', 'derecha': '1'}, {'izquierda': 'y', 'derecha': '2'}]
+    assert firmas.firma_ejercicio('emparejamiento', {'pares': pares}) == \
+        firmas.firma_ejercicio('emparejamiento', {'pares': pares[::-1]})
+
+def test_firma_con_contenido_inesperado():
+    assert firmas.clave_ejercicio('escritura', 'no es json') == 'escritura:no es json'
+    assert firmas.clave_ejercicio('seleccion_multiple', {'preguntas': [{}]}) == \
+        'seleccion_multiple:{"preguntas":[{}]}'
+
+def test_quitar_repetidos_conserva_el_primero_y_renumera():
+    ejercicios = [_vf(['a'], 3), _vf(['b'], 4), _vf(['a'], 5), _vf(['c'], 6)]
+    unicos = firmas.quitar_repetidos(ejercicios)
+    assert [e['contenido']['afirmaciones'] for e in unicos] == [['a'], ['b'], ['c']]
+    assert [e['orden'] for e in unicos] == [3, 4, 5]
+    assert all(e['firma'] == firmas.firma_ejercicio(e['tipo'], e['contenido']) for e in unicos)
+
+def test_quitar_repetidos_sin_repetidos_no_toca_el_orden():
+    ejercicios = [_vf(['a'], 1), _vf(['b'], 7)]
+    assert [e['orden'] for e in firmas.quitar_repetidos(ejercicios)] == [1, 7]
+
+def test_firmas_vigentes_corrige_las_obsoletas():
+    filas = [{'id': 1, 'tipo': 'escritura', 'contenido': '{"instrucciones": "x"}',
+              'firma': firmas.firma_ejercicio('escritura', {'instrucciones': 'x'})},
+             {'id': 2, 'tipo': 'escritura', 'contenido': '{"instrucciones": "y"}', 'firma': 'vieja'}]
+    obsoletas = firmas.firmas_vigentes(filas)
+    assert [f['id'] for f in obsoletas] == [2]
+    assert obsoletas[0]['firma'] == firmas.firma_ejercicio('escritura', {'instrucciones': 'y'})
+
+def test_huella_set_igual_para_filas_de_bd_y_ejercicios_generados():
+    generados = [
+        {'titulo': 't', 'descripcion': None, 'tipo': 'escritura', 'contenido': {'b': 1, 'a': 'ñ'},
+         'respuesta_correcta': {}, 'puntos_maximos': 10, 'orden': 2},
+        {'titulo': 'u', 'descripcion': 'd', 'tipo': 'escritura', 'contenido': {'k': 1},
+         'respuesta_correcta': {'r': 1}, 'puntos_maximos': 5, 'orden': 1},
+    ]
+    filas = [dict(e, leccion_id=9, contenido=json.dumps(e['contenido'], indent=2),
+                  respuesta_correcta=json.dumps(e['respuesta_correcta'])) for e in generados]
+    assert firmas.agrupar_huellas(filas) == {9: firmas.huella_set(generados)}
+    generados[0]['puntos_maximos'] = 11
+    assert firmas.agrupar_huellas(filas)[9] != firmas.huella_set(generados)
+
+def test_migracion_explicita_y_trigger_en_sqlite(sqlite_db):
+    conn = almacen.conectar_sqlite(sqlite_db)
+    cursor = conn.cursor()
+    with pytest.raises(firmas.SinColumnaFirma, match='firmas.py --migrar'):
+        firmas.verificar_columna_firma(cursor)
+    assert firmas.migrar(cursor) is True
+    assert firmas.migrar(cursor) is False
+    firmas.verificar_columna_firma(cursor)
+
+    cursor.execute("INSERT INTO lecciones (titulo) VALUES ('L')")
+    cursor.executemany("INSERT INTO ejercicios (leccion_id, tipo, contenido) VALUES (1, %s, %s)",
+                       [('escritura', '{"instrucciones": "a"}'), ('escritura', '{"instrucciones": "b"}')])
+    conn.commit()
+    assert firmas.rellenar_firmas(conn, cursor, lote=1) == 2
+
+    # Otro cliente cambia el contenido: el trigger vacía la firma y se vuelve a calcular
+    cursor.execute("UPDATE ejercicios SET contenido = '{\"instrucciones\": \"c\"}' WHERE id = 1")
+    cursor.execute("UPDATE ejercicios SET orden = 4 WHERE id = 2")
+    cursor.execute("SELECT id, firma FROM ejercicios ORDER BY id")
+    assert [f['firma'] is None for f in cursor.fetchall()] == [True, False]
+    assert firmas.rellenar_firmas(conn, cursor) == 1
+    conn.close()
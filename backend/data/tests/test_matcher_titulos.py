@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+import random
+from difflib import SequenceMatcher
+
+import pytest
+
+import kb_cache
+import test_2
+
+def find_best_match_original(titulo_bd, kb_titulos):
+    """El recorrido con difflib de antes de MatcherTitulos"""
+    best_match, best_score = None, 0
+    for kb_titulo in kb_titulos:
+        score = SequenceMatcher(None, titulo_bd.lower(), kb_titulo.lower()).ratio()
+        if score > best_score:
+            best_score = score
+            best_match = kb_titulo
+    return best_match, best_score
+
+def _variantes(titulo, rng):
+    yield titulo
+    yield titulo.upper()
+    yield titulo[:max(1, len(titulo) // 2)]
+    yield titulo + ' (v2)'
+    i = rng.randrange(len(titulo))
+    yield titulo[:i] + titulo[i + 1:]
+    yield ''.join(rng.sample(titulo, len(titulo)))
+
+def _casos():
+    rng = random.Random(8)
+    kb = kb_cache.cargar_kb()
+    por_nivel = {}
+    for idioma, nivel, titulo in kb.por_titulo:
+        por_nivel.setdefault((idioma, nivel), []).append(titulo)
+    todos = [t for titulos in por_nivel.values() for t in titulos]
+    for titulos in por_nivel.values():
+        consultas = [v for t in titulos for v in _variantes(t, rng)]
+        consultas += rng.sample(todos, 5) + ['', 'a', 'Lección sintética 12']
+        yield titulos, consultas
+
+CASOS = list(_casos())
+
+def test_umbral_0_igual_al_recorrido_completo():
+    for titulos, consultas in CASOS:
+        matcher = test_2.MatcherTitulos(titulos)
+        for consulta in consultas:
+            assert matcher.mejor_match(consulta) == find_best_match_original(consulta, titulos), consulta
+
+def test_umbral_del_script_decide_lo_mismo_que_difflib():
+    umbral = test_2.UMBRAL_SIMILITUD
+    assert umbral == 0.6
+    for titulos, consultas in CASOS:
+        matcher = test_2.MatcherTitulos(titulos)
+        for consulta in consultas:
+            esperado, score_esperado = find_best_match_original(consulta, titulos)
+            titulo, score = test_2.find_best_match(consulta, matcher, umbral)
+            if score_esperado > umbral:
+                assert (titulo, score) == (esperado, score_esperado), consulta
+            else:
+                assert score <= umbral, consulta
+
+@pytest.mark.parametrize('titulos', [[], ['', 'ab'], ['abc', 'abd', 'abc']])
+def test_casos_borde(titulos):
+    matcher = test_2.MatcherTitulos(titulos)
+    for consulta in ['', 'ab', 'abc', 'zzz']:
+        assert matcher.mejor_match(consulta) == find_best_match_original(consulta, titulos)
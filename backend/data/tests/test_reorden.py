@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+import random
+
+import almacen
+import reorden
+
+def _sembrar(cursor, rng):
+    filas = [(f"L{i}", rng.choice(['Inglés', 'Francés']), rng.choice(['A1', 'A2']), rng.choice([None, 0, 3, 3, 9]))
+             for i in range(60)]
+    cursor.executemany("INSERT INTO lecciones (titulo, idioma, nivel, orden) VALUES (%s, %s, %s, %s)", filas)
+
+def _esperado(filas):
+    """orden 1..N por (idioma, nivel), siguiendo el orden previo (NULL primero, como en SQL) y el id"""
+    grupos = {}
+    for f in sorted(filas, key=lambda f: (f['orden'] is not None, f['orden'] or 0, f['id'])):
+        grupos.setdefault((f['idioma'], f['nivel']), []).append(f['id'])
+    return {id_: i for ids in grupos.values() for i, id_ in enumerate(ids, 1)}
+
+def _ordenes(cursor):
+    cursor.execute("SELECT id, idioma, nivel, orden FROM lecciones ORDER BY id")
+    return cursor.fetchall()
+
+def test_reordenar_en_sqlite(sqlite_db):
+    conn = almacen.conectar_sqlite(sqlite_db)
+    cursor = conn.cursor()
+    _sembrar(cursor, random.Random(11))
+    antes = _ordenes(cursor)
+    esperado = _esperado(antes)
+
+    cambiadas = reorden.reordenar(cursor, 'lecciones', ['idioma', 'nivel'], ['orden'])
+    despues = _ordenes(cursor)
+    assert {f['id']: f['orden'] for f in despues} == esperado
+    assert cambiadas == sum(1 for f in antes if f['orden'] != esperado[f['id']])
+
+    # Ya ordenadas: no se toca ninguna fila
+    assert reorden.reordenar(cursor, 'lecciones', ['idioma', 'nivel'], ['orden']) == 0
+    conn.close()
+
+def test_reordenar_solo_las_filas_del_filtro(sqlite_db):
+    conn = almacen.conectar_sqlite(sqlite_db)
+    cursor = conn.cursor()
+    _sembrar(cursor, random.Random(12))
+    antes = {f['id']: f for f in _ordenes(cursor)}
+
+    reorden.reordenar(cursor, 'lecciones', ['idioma', 'nivel'], ['orden'], "idioma = %s", ('Francés',))
+    despues = _ordenes(cursor)
+    frances = _esperado([f for f in antes.values() if f['idioma'] == 'Francés'])
+    for f in despues:
+        if f['idioma'] == 'Francés':
+            assert f['orden'] == frances[f['id']]
+        else:
+            assert f['orden'] == antes[f['id']]['orden']
+    conn.close()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import io
+import os
+import sqlite3
+
+import pytest
+import pymysql.converters
+
+import almacen
+import restaurar_backup as rb
+
+BACKUP_LEGACY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             'backup_ejercicios_20251114_224207.sql')
+COLUMNAS = ['id', 'titulo', 'contenido', 'puntos', 'nota']
+
+def _insert(filas):
+    valores = ', '.join('(' + ', '.join(pymysql.converters.escape_item(v, 'utf8mb4') for v in fila) + ')'
+                        for fila in filas)
+    return f"INSERT INTO ejercicios ({', '.join(COLUMNAS)}) VALUES {valores};"
+
+def test_parsear_insert_formato_actual_ida_y_vuelta():
+    filas = [
+        (1, "O'Brien", '{"texto": "línea 1\\nlínea 2"}', 5, None),
+        (2, 'barra \\ y comillas "dobles"', 'tab\tretorno\r\nnulo\0fin', -3, 1.5),
+    ]
+    tabla, columnas, leidas = rb.parsear_insert(_insert(filas))
+    assert tabla == 'ejercicios'
+    assert columnas == COLUMNAS
+    assert leidas == filas
+
+def test_parsear_insert_legacy_solo_escapa_comillas_y_acepta_none():
+    sentencia = ("INSERT INTO ejercicios (id, contenido, ruta, nota) VALUES "
+                 "(7, '{\"p\": \"What does \\'Buchstabe\\' mean?\"}', 'C:\\nuevo', None);")
+    _, _, filas = rb.parsear_insert(sentencia, legacy=True)
+    assert filas == [(7, '{"p": "What does \'Buchstabe\' mean?"}', 'C:\\nuevo', None)]
+
+def test_parsear_insert_formato_actual_no_acepta_none():
+    sentencia = "INSERT INTO ejercicios (id, nota) VALUES (1, None);"
+    with pytest.raises(rb.TokenInvalido) as e:
+        rb.parsear_insert(sentencia)
+    assert e.value.texto == 'None'
+
+def test_parsear_insert_cadena_sin_cerrar_pide_mas_texto():
+    with pytest.raises(rb.SentenciaIncompleta):
+        rb.parsear_insert("INSERT INTO ejercicios (id, titulo) VALUES (1, 'sigue")
+
+def test_leer_sql_une_lineas_y_reporta_la_linea_del_token_invalido():
+    texto = ("-- encabezado\n\n"
+             "INSERT INTO t (a, b) VALUES (1, 'x\n;y');\n"
+             "INSERT INTO t (a, b) VALUES\n(2, Nada);\n")
+    lector = rb.leer_sql(io.StringIO(texto), legacy=False)
+    assert next(lector) == ('t', ['a', 'b'], [(1, 'x\n;y')])
+    with pytest.raises(ValueError, match=r"Línea 6: Token no reconocido: 'Nada'"):
+        next(lector)
+
+def test_backup_legacy_se_lee_completo():
+    assert rb.es_legacy(BACKUP_LEGACY)
+    with open(BACKUP_LEGACY, encoding='utf-8') as f:
+        sentencias = list(rb.leer_sql(f, legacy=True))
+    filas = [fila for _, _, lote in sentencias for fila in lote]
+    assert len(filas) == 2871
+    assert {len(fila) for fila in filas} == {12}
+    assert any("'Buchstabe'" in fila[5] for fila in filas)
+
+def test_restaurar_backup_legacy_en_sqlite_sin_lecciones(sqlite_db):
+    conn = almacen.conectar_sqlite(sqlite_db)
+    try:
+        stats = rb.restaurar(conn, BACKUP_LEGACY)
+    finally:
+        conn.close()
+    assert stats['cargadas'] == 2871
+    with sqlite3.connect(sqlite_db) as db:
+        assert db.execute("SELECT COUNT(*) FROM ejercicios").fetchone()[0] == 2871
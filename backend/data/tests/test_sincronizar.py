@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+import random
+import string
+
+import sincronizar
+
+def buscar_parcial_original(lecciones, usadas, titulo_kb):
+    """Recorrido lineal: primera lección no usada contenida en titulo_kb o que lo contiene"""
+    kb = titulo_kb.lower()
+    for pos, (_, titulo) in enumerate(lecciones):
+        bd = titulo.lower()
+        if pos not in usadas and (kb in bd or bd in kb):
+            return pos
+    return None
+
+def _titulo(rng):
+    return ''.join(rng.choice('abcAB -') for _ in range(rng.randint(0, 8)))
+
+def test_buscar_parcial_igual_al_recorrido_lineal():
+    rng = random.Random(7)
+    for _ in range(200):
+        lecciones = [(i, _titulo(rng)) for i in range(rng.randint(0, 15))]
+        indice = sincronizar.IndiceTitulos()
+        for leccion_id, titulo in lecciones:
+            indice.agregar(leccion_id, titulo)
+        usadas = set(rng.sample(range(len(lecciones)), len(lecciones) // 4))
+        for pos in usadas:
+            indice.marcar_usada(pos)
+        for _ in range(10):
+            consulta = _titulo(rng)
+            assert indice.buscar_parcial(consulta) == buscar_parcial_original(lecciones, usadas, consulta), \
+                (lecciones, usadas, consulta)
+
+def test_buscar_parcial_casos_del_catalogo():
+    indice = sincronizar.IndiceTitulos()
+    for i, titulo in enumerate(['Saludos y presentaciones', 'Los números', 'Familia - parte 1', 'Yo']):
+        indice.agregar(100 + i, titulo)
+    assert indice.buscar_parcial('saludos') == 0          # contenido en el de BD
+    assert indice.buscar_parcial('Los números del 1 al 100') == 1  # el de BD contenido en el KB
+    assert indice.buscar_parcial('Familia - Parte 1') == 2         # guiones y mayúsculas
+    assert indice.buscar_parcial('Yo soy') == 3                    # título de BD corto
+    assert indice.buscar_parcial('Colores') is None
+    indice.marcar_usada(0)
+    assert indice.buscar_parcial('saludos') is None
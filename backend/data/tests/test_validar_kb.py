@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import json
+import shutil
+
+import kb_cache
+import validar_kb
+
+UBICACION = {'archivo': 'kb_ingles.json', 'idioma': 'Inglés', 'nivel': 'A1', 'titulo': 'Saludos'}
+
+def _mensajes(nodo):
+    return [(e['ruta'], e['mensaje']) for e in validar_kb.validar_leccion(nodo, UBICACION)]
+
+def test_leccion_valida():
+    nodo = {
+        'vocabulario': ['hello', 'bye'],
+        'ejemplos': {
+            'seleccion_multiple': [{'pregunta': '¿?', 'opciones': ['a', 'b'], 'correcta': 1}],
+            'verdadero_falso': [{'afirmacion': 'x', 'respuesta': False}],
+            'completar_espacios': [{'texto': '___', 'respuestas': ['a']}],
+            'emparejamiento': [{'izquierda': 'a', 'derecha': 'b'}],
+            'escritura': [{'prompt': 'Escribe'}],
+        }
+    }
+    assert _mensajes(nodo) == []
+
+def test_errores_por_tipo_de_ejemplo():
+    nodo = {
+        'verbos': 'ser',
+        'ejemplos': {
+            'seleccion_multiple': [{'pregunta': '¿?', 'opciones': ['a'], 'correcta': 3},
+                                   {'pregunta': '¿?', 'opciones': ['a', 'b'], 'correcta': True}],
+            'verdadero_falso': [{'afirmacion': 'x', 'respuesta': 'sí'}],
+            'completar_espacios': [{'texto': '___', 'respuesta': ['a']}, {'texto': '___', 'respuestas': []}],
+            'escritura': [{'instrucciones': ''}],
+            'dictado': [],
+        }
+    }
+    assert _mensajes(nodo) == [
+        ('verbos', "'verbos' debe ser una lista de textos"),
+        ('ejemplos.seleccion_multiple[0]', "'opciones' necesita al menos 2, tiene 1"),
+        ('ejemplos.seleccion_multiple[0]', "'correcta'=3 fuera de rango (0..0)"),
+        ('ejemplos.seleccion_multiple[1]', "'correcta' debe ser entero, es bool"),
+        ('ejemplos.verdadero_falso[0]', "'respuesta' debe ser booleano, es str"),
+        ('ejemplos.completar_espacios[0]', "falta 'respuestas'"),
+        ('ejemplos.completar_espacios[1]', "'respuestas' está vacía"),
+        ('ejemplos.escritura[0]', "falta 'instrucciones o prompt' (texto)"),
+        ('ejemplos.dictado', f"tipo de ejemplo desconocido (válidos: {', '.join(validar_kb.REGLAS)})"),
+    ]
+    assert all(e['titulo'] == 'Saludos' for e in validar_kb.validar_leccion(nodo, UBICACION))
+
+def test_leccion_que_no_es_objeto():
+    assert _mensajes(['x']) == [('', "la lección debe ser un objeto, es list")]
+    assert _mensajes({'ejemplos': []}) == [('ejemplos', "'ejemplos' debe ser un objeto, es list")]
+
+def test_kb_del_repositorio_es_valido():
+    revisadas, errores = validar_kb.validar_kb(usar_cache=False)
+    assert revisadas > 0
+    assert errores == [], [validar_kb.formatear_error(e) for e in errores]
+
+def test_resultado_guardado_en_el_paquete(tmp_path, monkeypatch):
+    shutil.copytree(kb_cache.KB_DIR, tmp_path / 'kb', ignore=shutil.ignore_patterns('.cache'))
+    kb_dir = str(tmp_path / 'kb')
+    path = tmp_path / 'kb' / kb_cache.KB_FILES['Francés']
+    data = json.loads(path.read_text(encoding='utf-8'))
+    primera = next(iter(next(iter(data['Francés'].values())).values()))
+    primera['ejemplos']['verdadero_falso'] = [{'afirmacion': 'x'}]
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+
+    llamadas = []
+    original = validar_kb.validar_archivos
+    def espia(archivos, workers=None):
+        llamadas.append([idioma for idioma, _ in archivos])
+        return original(archivos, workers)
+    monkeypatch.setattr(validar_kb, 'validar_archivos', espia)
+
+    _, errores = validar_kb.validar_kb(kb_dir)
+    assert [(e['idioma'], e['mensaje']) for e in errores] == [('Francés', "falta 'respuesta'")]
+    assert len(llamadas) == 1 and len(llamadas[0]) == len(kb_cache.KB_FILES)
+
+    # Otro proceso: el paquete ya trae el resultado, no se valida nada
+    kb_cache._en_memoria.clear()
+    assert validar_kb.validar_kb(kb_dir)[1] == errores
+    assert len(llamadas) == 1
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+🧪 VALIDADOR DEL KNOWLEDGE BASE - SpeakLexi 2.0
+Revisa cada lección de kb/*.json y cada ejemplo de `ejemplos` antes de tocar
+la BD: claves obligatorias, tipos, índice de `correcta` dentro de `opciones` y
+respuestas booleanas en verdadero/falso. Las reglas se compilan una vez a
+funciones por tipo de ejemplo. La validación corre dentro de kb_cache al
+compilar el paquete (en paralelo, solo los archivos que cambiaron) y el
+resultado queda guardado por sha de cada archivo.
+
+    python validar_kb.py
+    python validar_kb.py --json reporte_kb.json
+    python validar_kb.py --sin-cache   # revalidar todo
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import kb_cache
+
+try:
+    SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+except NameError:
+    SCRIPT_DIR = os.getcwd()
+
+KB_DIR = os.path.join(SCRIPT_DIR, 'kb')
+
+# Tipos de la lección que los generadores leen como listas de texto
+LISTAS_LECCION = ('vocabulario', 'verbos', 'frases_clave')
+
+# tipo de ejemplo -> {clave: tipo esperado}; None en la clave = una de varias
+ESQUEMAS = {
+    'seleccion_multiple': {'pregunta': str, 'opciones': list, 'correcta': int},
+    'verdadero_falso': {'afirmacion': str, 'respuesta': bool},
+    'completar_espacios': {'texto': str, 'respuestas': list},
+    'emparejamiento': {'izquierda': str, 'derecha': str},
+    'escritura': {('instrucciones', 'prompt'): str},
+}
+
+Error = Dict[str, Any]  # {archivo, idioma, nivel, titulo, ruta, mensaje}
+Regla = Callable[[Dict[str, Any]], List[str]]
+
+def _nombre_tipo(tipo) -> str:
+    return {str: 'texto', list: 'lista', int: 'entero', bool: 'booleano'}.get(tipo, tipo.__name__)
+
+def _es_tipo(valor: Any, tipo) -> bool:
+    # bool es subclase de int: un True no vale como índice
+    if tipo is int:
+        return isinstance(valor, int) and not isinstance(valor, bool)
+    return isinstance(valor, tipo)
+
+def _regla_clave(clave, tipo) -> Regla:
+    if isinstance(clave, tuple):
+        def regla(ejemplo):
+            if any(_es_tipo(ejemplo.get(c), tipo) and ejemplo.get(c) for c in clave):
+                return []
+            return [f"falta '{' o '.join(clave)}' ({_nombre_tipo(tipo)})"]
+        return regla
+
+    def regla(ejemplo):
+        if clave not in ejemplo:
+            return [f"falta '{clave}'"]
+        if not _es_tipo(ejemplo[clave], tipo):
+            return [f"'{clave}' debe ser {_nombre_tipo(tipo)}, es {type(ejemplo[clave]).__name__}"]
+        return []
+    return regla
+
+def _regla_opciones(ejemplo) -> List[str]:
+    opciones, correcta = ejemplo.get('opciones'), ejemplo.get('correcta')
+    if not isinstance(opciones, list) or not _es_tipo(correcta, int):
+        return []  # ya lo reporta la regla de la clave
+    errores = []
+    if len(opciones) < 2:
+        errores.append(f"'opciones' necesita al menos 2, tiene {len(opciones)}")
+    if not 0 <= correcta < len(opciones):
+        errores.append(f"'correcta'={correcta} fuera de rango (0..{len(opciones) - 1})")
+    if not all(isinstance(o, str) for o in opciones):
+        errores.append("'opciones' debe ser una lista de textos")
+    return errores
+
+def _regla_respuestas(ejemplo) -> List[str]:
+    respuestas = ejemplo.get('respuestas')
+    if not isinstance(respuestas, list):
+        return []
+    if not respuestas:
+        return ["'respuestas' está vacía"]
+    if not all(isinstance(r, str) for r in respuestas):
+        return ["'respuestas' debe ser una lista de textos"]
+    return []
+
+def compilar(esquemas: Dict[str, Dict[Any, Any]]) -> Dict[str, Tuple[Regla, ...]]:
+    """Reglas de cada tipo de ejemplo como una tupla de funciones, armada una sola vez"""
+    extras = {'seleccion_multiple': (_regla_opciones,), 'completar_espacios': (_regla_respuestas,)}
+    return {
+        tipo: tuple(_regla_clave(clave, t) for clave, t in campos.items()) + extras.get(tipo, ())
+        for tipo, campos in esquemas.items()
+    }
+
+REGLAS = compilar(ESQUEMAS)
+
+def validar_leccion(nodo: Any, ubicacion: Dict[str, str]) -> List[Error]:
+    errores: List[Error] = []
+
+    def error(ruta: str, mensaje: str) -> None:
+        errores.append({**ubicacion, 'ruta': ruta, 'mensaje': mensaje})
+
+    if not isinstance(nodo, dict):
+        error('', f"la lección debe ser un objeto, es {type(nodo).__name__}")
+        return errores
+
+    for clave in LISTAS_LECCION:
+        valor = nodo.get(clave, [])
+        if not isinstance(valor, list) or not all(isinstance(v, str) for v in valor):
+            error(clave, f"'{clave}' debe ser una lista de textos")
+
+    ejemplos = nodo.get('ejemplos', {})
+    if not isinstance(ejemplos, dict):
+        error('ejemplos', f"'ejemplos' debe ser un objeto, es {type(ejemplos).__name__}")
+        return errores
+
+    for tipo, lista in ejemplos.items():
+        reglas = REGLAS.get(tipo)
+        if reglas is None:
+            error(f"ejemplos.{tipo}", f"tipo de ejemplo desconocido (válidos: {', '.join(REGLAS)})")
+            continue
+        if not isinstance(lista, list):
+            error(f"ejemplos.{tipo}", f"debe ser una lista, es {type(lista).__name__}")
+            continue
+        for i, ejemplo in enumerate(lista):
+            ruta = f"ejemplos.{tipo}[{i}]"
+            if not isinstance(ejemplo, dict):
+                error(ruta, f"el ejemplo debe ser un objeto, es {type(ejemplo).__name__}")
+                continue
+            for regla in reglas:
+                for mensaje in regla(ejemplo):
+                    error(ruta, mensaje)
+    return errores
+
+def validar_archivo(idioma: str, path: str) -> Tuple[int, List[Error]]:
+    """(lecciones revisadas, errores) de un archivo KB; corre en un proceso aparte"""
+    archivo = os.path.basename(path)
+    base = {'archivo': archivo, 'idioma': idioma, 'nivel': '', 'titulo': ''}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except Exception as e:
+        return 0, [{**base, 'ruta': '', 'mensaje': f"JSON inválido: {e}"}]
+
+    niveles = data.get(idioma, data) if isinstance(data, dict) else data
+    if not isinstance(niveles, dict):
+        return 0, [{**base, 'ruta': '', 'mensaje': "debe ser un objeto de niveles"}]
+
+    revisadas = 0
+    errores: List[Error] = []
+    for nivel, lecciones in niveles.items():
+        if not isinstance(lecciones, dict):
+            errores.append({**base, 'nivel': nivel, 'ruta': '', 'mensaje': "el nivel debe ser un objeto de lecciones"})
+            continue
+        for titulo, nodo in lecciones.items():
+            revisadas += 1
+            errores.extend(validar_leccion(nodo, {**base, 'nivel': nivel, 'titulo': titulo}))
+    return revisadas, errores
+
+def validar_archivos(archivos: List[Tuple[str, str]], workers: Optional[int] = None) -> List[Tuple[int, List[Error]]]:
+    """Valida [(idioma, path), ...] en paralelo; kb_cache lo llama al compilar el paquete"""
+    workers = workers or min(len(archivos), os.cpu_count() or 1)
+    if workers > 1 and len(archivos) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(validar_archivo, *zip(*archivos)))
+    return [validar_archivo(idioma, path) for idioma, path in archivos]
+
+def validar_kb(kb_dir: Any = KB_DIR, workers: Optional[int] = None,
+               usar_cache: bool = True) -> Tuple[int, List[Error]]:
+    """
+    Devuelve (lecciones revisadas, errores) de los archivos de kb_cache.KB_FILES.
+    El resultado se calcula al compilar el paquete del KB, por sha de cada
+    archivo: con la caché al día no se vuelve a leer ni validar nada.
+    """
+    kb = kb_cache.cargar_kb(kb_dir, usar_cache=usar_cache, workers=workers)
+    revisadas = 0
+    errores: List[Error] = []
+    for idioma, filename in kb_cache.KB_FILES.items():
+        if idioma in kb.errores:
+            errores.append({'archivo': filename, 'idioma': idioma, 'nivel': '', 'titulo': '',
+                            'ruta': '', 'mensaje': f"JSON inválido: {kb.errores[idioma]}"})
+        elif idioma in kb.validacion:
+            _, n, lista = kb.validacion[idioma]
+            revisadas += n
+            errores.extend(lista)
+    return revisadas, errores
+
+def formatear_error(e: Error) -> str:
+    donde = ' / '.join(p for p in (e['idioma'], e['nivel'], e['titulo']) if p)
+    ruta = f" → {e['ruta']}" if e['ruta'] else ''
+    return f"{donde}{ruta}: {e['mensaje']}"
+
+def kb_valido(kb_dir: Any = KB_DIR, max_mostrar: int = 20) -> bool:
+    """Valida e imprime el resultado; lo usan los scripts antes de conectar a la BD"""
+    inicio = time.perf_counter()
+    revisadas, errores = validar_kb(kb_dir)
+    segundos = time.perf_counter() - inicio
+    if not errores:
+        print(f"✅ KB válido: {revisadas} lecciones revisadas ({segundos:.2f}s)")
+        return True
+    print(f"❌ KB inválido: {len(errores)} errores en {revisadas} lecciones ({segundos:.2f}s)")
+    for e in errores[:max_mostrar]:
+        print(f"   • {formatear_error(e)}")
+    if len(errores) > max_mostrar:
+        print(f"   ... y {len(errores) - max_mostrar} más (python validar_kb.py --json reporte.json)")
+    return False
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validar la estructura del Knowledge Base")
+    parser.add_argument("--kb-dir", type=str, default=KB_DIR)
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Procesos en paralelo (default: uno por archivo, hasta los CPUs)")
+    parser.add_argument("--sin-cache", action="store_true",
+                        help="Validar todos los archivos aunque la caché del KB esté al día")
+    parser.add_argument("--json", type=str, metavar="ARCHIVO",
+                        help="Guardar los errores como JSON")
+    args = parser.parse_args(argv)
+
+    print("="*70)
+    print("🧪 VALIDADOR DEL KB - SpeakLexi 2.0")
+    print("="*70)
+
+    inicio = time.perf_counter()
+    revisadas, errores = validar_kb(args.kb_dir, args.workers or None, usar_cache=not args.sin_cache)
+    segundos = time.perf_counter() - inicio
+
+    por_archivo: Dict[str, List[Error]] = {}
+    for e in errores:
+        por_archivo.setdefault(e['archivo'], []).append(e)
+    for archivo, lista in por_archivo.items():
+        print(f"\n📄 {archivo}: {len(lista)} errores")
+        for e in lista:
+            print(f"   • {formatear_error(e)}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'lecciones': revisadas, 'errores': errores}, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Reporte guardado en {args.json}")
+
+    print(f"\n{'✅' if not errores else '❌'} {revisadas} lecciones revisadas, "
+          f"{len(errores)} errores ({segundos:.2f}s)")
+    return 1 if errores else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
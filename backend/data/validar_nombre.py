@@ -9,6 +9,9 @@ import pymysql
 import json
 from pathlib import Path
 from collections import defaultdict
+import kb_cache
+import almacen
+import actualizacion_lotes
 
 # ============================================
 # CONFIGURACIÓN
@@ -42,7 +45,7 @@ TRADUCCIONES = {
 
 def conectar_bd():
     try:
-        conexion = pymysql.connect(**DB_CONFIG)
+        conexion = almacen.conectar(**DB_CONFIG)
         print("✅ Conexión exitosa a la base de datos\n")
         return conexion
     except Exception as e:
@@ -50,24 +53,17 @@ def conectar_bd():
         exit(1)
 
 def cargar_kb():
-    """Cargar todos los archivos KB"""
+    """Cargar todos los archivos KB (desde la caché compilada si no cambiaron)"""
     kb_data = {}
     
-    kb_files = {
-        'Inglés': 'kb_ingles.json',
-        'Francés': 'kb_frances.json',
-        'Alemán': 'kb_aleman.json',
-        'Italiano': 'kb_italiano.json'
-    }
-    
     print("📥 Cargando Knowledge Base...")
-    for idioma, filename in kb_files.items():
-        filepath = KB_PATH / filename
-        if filepath.exists():
-            with open(filepath, 'r', encoding='utf-8') as f:
-                content = json.load(f)
-                kb_data[idioma] = content.get(idioma, {})
-                print(f"  ✅ {idioma}: {len(kb_data[idioma])} niveles")
+    kb = kb_cache.cargar_kb(KB_PATH)
+    for idioma in kb_cache.KB_FILES:
+        if idioma in kb.datos:
+            kb_data[idioma] = kb.datos[idioma]
+            print(f"  ✅ {idioma}: {len(kb_data[idioma])} niveles")
+        elif idioma in kb.errores:
+            print(f"  ⚠️  {idioma}: Error ({kb.errores[idioma]})")
         else:
             print(f"  ⚠️  {idioma}: No encontrado")
     
@@ -222,9 +218,14 @@ def generar_script_renombrar(resultados):
         f.write("START TRANSACTION;\n\n")
         
         for leccion in resultados['necesitan_renombrar']:
-            titulo_escapado = leccion['titulo_correcto'].replace("'", "\\'")
-            f.write(f"-- ID: {leccion['id']} - {leccion['idioma']} {leccion['nivel']}\n")
-            f.write(f"UPDATE lecciones SET titulo = '{titulo_escapado}' WHERE id = {leccion['id']};\n\n")
+            f.write(f"-- ID: {leccion['id']} - {leccion['idioma']} {leccion['nivel']}: "
+                    f"{leccion['titulo_actual']} → {leccion['titulo_correcto']}\n")
+        f.write("\n")
+        
+        # Un UPDATE con CASE por cada lote de renombres en vez de uno por lección
+        cambios = {l['id']: l['titulo_correcto'] for l in resultados['necesitan_renombrar']}
+        for sentencia in actualizacion_lotes.sentencias_literales('lecciones', 'titulo', cambios):
+            f.write(sentencia + "\n\n")
         
         f.write("COMMIT;\n")
         f.write("\n-- Verificar cambios\n")
@@ -5,7 +5,7 @@ SpeakLexi Exercise Generator V3 — Final Perfect (Localized Hybrid)
 - Localización híbrida: plantillas nativas por idioma
 - Tolerancia total a campos faltantes
 - Sin mezcla de idiomas
-- Flags: --dry-run, --overwrite, --limit, --idioma, --nivel, --verbose
+- Flags: --dry-run, --overwrite, --limit, --idioma, --nivel, --verbose, --seed
 """
 
 from __future__ import annotations
@@ -13,12 +13,20 @@ import os
 import sys
 import json
 import random
+import hashlib
 import argparse
 import getpass
 import pymysql
 from datetime import datetime
 from typing import List, Dict, Any, Optional, Tuple
 
+# Exercise signatures are shared with the backend/data scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'backend', 'data'))
+import firmas
+import almacen
+import kb_cache
+import distractores
+
 # DB config
 DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_USER = os.getenv("DB_USER", "root")
@@ -34,8 +42,8 @@ def get_db_password():
 
 def conectar_bd():
     try:
-        pwd = get_db_password()
-        conn = pymysql.connect(
+        pwd = get_db_password() if not almacen.usa_sqlite() else None
+        conn = almacen.conectar(
             host=DB_HOST, user=DB_USER, password=pwd,
             database=DB_NAME, charset=DB_CHARSET,
             cursorclass=pymysql.cursors.DictCursor,
@@ -47,6 +55,9 @@ def conectar_bd():
         print(f"❌ Error conectando a DB: {e}")
         sys.exit(1)
 
+# Distractor pools per (idioma, nivel), built once from the KB in main()
+DISTRACTOR_POOLS: Dict[Tuple[str, str], distractores.PoolDistractores] = {}
+
 # Fallback vocab
 VOCAB_FALLBACK = {
     'Inglés': {'A1': ['hello','name','family'], 'A2': ['restaurant','ticket'], 'B1': ['experience','opinion'], 'B2': ['negotiation','policy'], 'C1': ['methodology','critique'], 'C2': ['nuance','paradigm']},
@@ -229,7 +240,7 @@ def prefix(idioma: str, key: str) -> str:
     return PROMPT_PREFIX.get(idioma, PROMPT_PREFIX['Inglés']).get(key, "")
 
 class SpeakLexiGeneratorLocalized:
-    def __init__(self, leccion_row: Dict[str, Any]):
+    def __init__(self, leccion_row: Dict[str, Any], seed: Optional[int] = None):
         self.row = leccion_row
         self.id = leccion_row.get('id')
         self.titulo = leccion_row.get('titulo') or 'Untitled'
@@ -240,6 +251,13 @@ class SpeakLexiGeneratorLocalized:
         self.objetivos = [o for o in (self.contenido.get('teoria', {}).get('objetivos') or []) if isinstance(o, str)]
         self.vocabulario_clave = [v for v in (self.contenido.get('teoria', {}).get('vocabulario_clave') or []) if isinstance(v, str)]
         self.vocab = choose_vocab_from_leccion(self.contenido, self.idioma, self.nivel)
+        # With --seed every lesson gets its own Random derived from (seed, id, lesson content hash)
+        if seed is None:
+            self.rng = random.Random()
+        else:
+            source = json.dumps([self.titulo, self.nivel, self.idioma, self.contenido], sort_keys=True, ensure_ascii=False)
+            content_hash = hashlib.blake2b(source.encode('utf-8'), digest_size=16).hexdigest()
+            self.rng = random.Random(f"{seed}:{self.id}:{content_hash}")
         self.puntos = {'A1':5,'A2':7,'B1':10,'B2':12,'C1':15,'C2':20}
         if self.nivel not in self.puntos:
             self.nivel = 'A1'
@@ -252,19 +270,23 @@ class SpeakLexiGeneratorLocalized:
             correct_index = 0
         correct_val = options[correct_index]
         shuffled = options[:]
-        random.shuffle(shuffled)
+        self.rng.shuffle(shuffled)
         return shuffled, shuffled.index(correct_val)
 
     def gen_multiple_choice(self, orden: int) -> Dict[str,Any]:
         seed = (self.vocabulario_clave or self.vocab or self.temas)[:6]
         if seed:
-            focal = random.choice(seed)
+            focal = self.rng.choice(seed)
             advanced = self.nivel not in ['A1','A2']
             mc_template = get_mc_template(self.idioma, advanced=advanced)
             if self.nivel in ['A1','A2']:
                 correct = str(focal)
-                distractors = [str(x) for x in list(dict.fromkeys(self.vocab + seed + self.temas)) if str(x) != correct]
-                random.shuffle(distractors)
+                pool = DISTRACTOR_POOLS.get((self.idioma, self.nivel))
+                distractors = pool.muestrear(self.rng, 3, referencia=correct) if pool is not None else []
+                if len(distractors) < 3:
+                    # Language/level missing from the KB: fall back to the lesson's own words
+                    distractors = [str(x) for x in list(dict.fromkeys(self.vocab + seed + self.temas)) if str(x) != correct]
+                    self.rng.shuffle(distractors)
                 options = [correct] + distractors[:3]
                 opts, correct_idx = self._shuffle_options_with_correct_index(options, 0)
                 question = mc_template.format(word=focal) if '{word}' in mc_template else f"{prefix(self.idioma,'mc')} {mc_template}"
@@ -295,15 +317,15 @@ class SpeakLexiGeneratorLocalized:
         seed = (self.temas or self.vocab or ["language"])
         afirmaciones = []
         respuestas = []
-        t1 = templates.get('practice').format(topic=random.choice(seed), nivel=self.nivel)
+        t1 = templates.get('practice').format(topic=self.rng.choice(seed), nivel=self.nivel)
         afirmaciones.append(t1)
         respuestas.append(True)
-        t2 = templates.get('level').format(topic=random.choice(seed), nivel=self.nivel)
+        t2 = templates.get('level').format(topic=self.rng.choice(seed), nivel=self.nivel)
         afirmaciones.append(t2)
         respuestas.append(False)
-        t3 = templates.get('formal').format(topic=random.choice(seed), nivel=self.nivel)
+        t3 = templates.get('formal').format(topic=self.rng.choice(seed), nivel=self.nivel)
         afirmaciones.append(t3)
-        respuestas.append(random.choice([True, False]))
+        respuestas.append(self.rng.choice([True, False]))
         contenido = {"afirmaciones":afirmaciones}
         respuesta = {"respuestas":respuestas}
         return {
@@ -320,7 +342,7 @@ class SpeakLexiGeneratorLocalized:
         blanks = []
         texto = ""
         if self.vocabulario_clave:
-            words = random.sample(self.vocabulario_clave, min(2,len(self.vocabulario_clave)))
+            words = self.rng.sample(self.vocabulario_clave, min(2,len(self.vocabulario_clave)))
             if len(words) == 1:
                 tmpl = get_fill_template(self.idioma,'single')
                 # ✅ FIX 1: Manejo de template None
@@ -335,7 +357,7 @@ class SpeakLexiGeneratorLocalized:
                 texto = tmpl.format(word=words[0])
                 blanks = words[:2]
         elif self.temas:
-            t = random.choice(self.temas)
+            t = self.rng.choice(self.temas)
             tmpl = get_fill_template(self.idioma,'double')
             if not tmpl:
                 tmpl = "Complete: {word} is important for ___ and ___"
@@ -390,7 +412,7 @@ class SpeakLexiGeneratorLocalized:
         wc_map = {'A1':20,'A2':40,'B1':75,'B2':120,'C1':180,'C2':250}
         wc = wc_map.get(self.nivel,50)
         tmpl = get_write_template(self.idioma,self.nivel)
-        topic = random.choice(self.temas) if self.temas else (self.vocab[0] if self.vocab else "topic")
+        topic = self.rng.choice(self.temas) if self.temas else (self.vocab[0] if self.vocab else "topic")
         prompt = tmpl.format(wc=wc, topic=topic)
         contenido = {"instrucciones": prompt, "palabras_minimas": wc}
         # ✅ FIX 3: Criterios localizados
@@ -422,21 +444,32 @@ class SpeakLexiGeneratorLocalized:
             o += 1
         return ejercicios
 
-def count_existing_exercises(cursor, leccion_id:int) -> int:
-    cursor.execute("SELECT COUNT(*) AS cnt FROM ejercicios WHERE leccion_id = %s", (leccion_id,))
-    r = cursor.fetchone()
-    return int(r['cnt']) if r else 0
-
-def delete_existing_exercises(cursor, leccion_id:int) -> None:
-    cursor.execute("DELETE FROM ejercicios WHERE leccion_id = %s", (leccion_id,))
+# Overwrite deletes run once per chunk, aligned with the commit every 20 lessons
+LESSONS_PER_CHUNK = 20
+
+def count_exercises_by_lesson(cursor, lesson_filter:str, params:Tuple) -> Dict[int,int]:
+    cursor.execute(f"""
+        SELECT leccion_id, COUNT(*) AS cnt
+        FROM ejercicios
+        WHERE leccion_id IN (SELECT id FROM lecciones WHERE {lesson_filter})
+        GROUP BY leccion_id
+    """, params)
+    return {r['leccion_id']: int(r['cnt']) for r in cursor.fetchall()}
+
+def delete_exercises_for_lessons(cursor, leccion_ids:List[int]) -> int:
+    if not leccion_ids:
+        return 0
+    placeholders = ','.join(['%s'] * len(leccion_ids))
+    cursor.execute(f"DELETE FROM ejercicios WHERE leccion_id IN ({placeholders})", leccion_ids)
+    return cursor.rowcount
 
 def insertar_ejercicio(cursor, leccion_id:int, ejercicio:Dict[str,Any], creador_id:int) -> int:
     q = """
     INSERT INTO ejercicios (
       leccion_id, titulo, descripcion, tipo,
       contenido, respuesta_correcta, puntos_maximos,
-      orden, estado, creado_por, creado_en
-    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 'activo', %s, NOW())
+      orden, estado, creado_por, creado_en, firma
+    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 'activo', %s, NOW(), %s)
     """
     vals = (
         leccion_id,
@@ -447,7 +480,8 @@ def insertar_ejercicio(cursor, leccion_id:int, ejercicio:Dict[str,Any], creador_
         json.dumps(ejercicio.get('respuesta_correcta', {}), ensure_ascii=False),
         ejercicio.get('puntos_maximos', 0),
         ejercicio.get('orden', 0),
-        creador_id
+        creador_id,
+        ejercicio.get('firma') or firmas.firma_ejercicio(ejercicio.get('tipo'), ejercicio.get('contenido', {}))
     )
     cursor.execute(q, vals)
     return cursor.lastrowid
@@ -460,6 +494,8 @@ def main(argv=None):
     parser.add_argument("--nivel", type=str)
     parser.add_argument("--limit", type=int, default=0)
     parser.add_argument("--verbose", action="store_true")
+    parser.add_argument("--seed", type=int,
+                        help="Deterministic output; with --overwrite unchanged lessons are not rewritten")
     args = parser.parse_args(argv)
 
     conn = None
@@ -468,70 +504,100 @@ def main(argv=None):
         conn = conectar_bd()
         cursor = conn.cursor()
 
-        q = "SELECT id, titulo, descripcion, contenido, nivel, idioma, creado_por FROM lecciones WHERE estado = 'activa'"
+        lesson_filter = "estado = 'activa'"
         params = []
         if args.idioma:
-            q += " AND idioma = %s"; params.append(args.idioma)
+            lesson_filter += " AND idioma = %s"; params.append(args.idioma)
         if args.nivel:
-            q += " AND nivel = %s"; params.append(args.nivel.upper())
+            lesson_filter += " AND nivel = %s"; params.append(args.nivel.upper())
+        q = f"SELECT id, titulo, descripcion, contenido, nivel, idioma, creado_por FROM lecciones WHERE {lesson_filter}"
         q += " ORDER BY nivel, idioma, orden"
+        q_params = list(params)
         if args.limit and args.limit > 0:
-            q += " LIMIT %s"; params.append(args.limit)
+            q += " LIMIT %s"; q_params.append(args.limit)
 
-        cursor.execute(q, tuple(params))
+        cursor.execute(q, tuple(q_params))
         lessons = cursor.fetchall()
         if not lessons:
             print("⚠️ No lessons found with filters.")
             return
 
         print(f"📚 {len(lessons)} lessons found. dry-run={args.dry_run}, overwrite={args.overwrite}")
+        # Only the language/level pairs being generated are read from the KB pack
+        needed = {(l.get('idioma') or 'Inglés', (l.get('nivel') or 'A1').upper()) for l in lessons}
+        DISTRACTOR_POOLS.update(distractores.pools_desde_kb(kb_cache.cargar_kb(), needed))
+        if args.verbose:
+            print(f"🎯 Distractor pools: {len(DISTRACTOR_POOLS)} language-level pairs")
         total_inserted = 0
         summary = {}
 
-        for idx, lesson in enumerate(lessons, start=1):
-            gen = SpeakLexiGeneratorLocalized(lesson)
-            key = f"{gen.nivel}-{gen.idioma}"
-            summary.setdefault(key, 0)
-
-            existing = count_existing_exercises(cursor, lesson.get('id'))
-            if existing and not args.overwrite and not args.dry_run:
-                if args.verbose:
-                    print(f"⏭ Skipping lesson {lesson.get('id')} ({gen.titulo}) — {existing} exercises exist.")
-                continue
-            if existing and args.overwrite and not args.dry_run:
-                if args.verbose:
-                    print(f"🧹 Deleting {existing} exercises for lesson {lesson.get('id')}")
-                delete_existing_exercises(cursor, lesson.get('id'))
-
-            ejercicios = gen.generar_set(start_order=1)
-
-            if args.dry_run:
-                print(f"\n--- Lesson {idx}/{len(lessons)} [{lesson.get('id')}] {gen.titulo} ({gen.nivel}-{gen.idioma}) ---")
-                for e in ejercicios[:3]:
-                    print(json.dumps({
-                        "titulo": e['titulo'],
-                        "tipo": e['tipo'],
-                        "contenido": e['contenido'],
-                        "respuesta_correcta": e['respuesta_correcta'],
-                        "puntos": e['puntos_maximos']
-                    }, ensure_ascii=False, indent=2))
-                print(f"... (would create {len(ejercicios)} exercises)\n")
-                total_inserted += len(ejercicios)
-                summary[key] += len(ejercicios)
-                continue
-
-            creador = lesson.get('creado_por') or 1
-            for e in ejercicios:
-                insertar_ejercicio(cursor, lesson.get('id'), e, creador)
-                total_inserted += 1
-                summary[key] += 1
-
-            if idx % 20 == 0:
+        if not args.dry_run:
+            firmas.verificar_columna_firma(cursor)
+
+        # Prefetch existing exercise counts for every filtered lesson in one query
+        existing_counts = count_exercises_by_lesson(cursor, lesson_filter, tuple(params))
+
+        unchanged = 0
+        for chunk_start in range(0, len(lessons), LESSONS_PER_CHUNK):
+            chunk = []
+            for idx, lesson in enumerate(lessons[chunk_start:chunk_start + LESSONS_PER_CHUNK], start=chunk_start + 1):
+                gen = SpeakLexiGeneratorLocalized(lesson, seed=args.seed)
+                key = f"{gen.nivel}-{gen.idioma}"
+                summary.setdefault(key, 0)
+
+                existing = existing_counts.get(lesson.get('id'), 0)
+                if existing and not args.overwrite and not args.dry_run:
+                    if args.verbose:
+                        print(f"⏭ Skipping lesson {lesson.get('id')} ({gen.titulo}) — {existing} exercises exist.")
+                    continue
+
+                # Duplicates within a set are refused here instead of cleaned up later
+                chunk.append((idx, lesson, gen, key, firmas.quitar_repetidos(gen.generar_set(start_order=1))))
+
+            if args.overwrite and not args.dry_run:
+                chunk_ids = [lesson['id'] for _, lesson, _, _, _ in chunk if existing_counts.get(lesson['id'])]
+                # With --seed, lessons that regenerate exactly the same set are left untouched
+                if args.seed is not None:
+                    previous = firmas.huellas_existentes(cursor, chunk_ids)
+                    same = {lesson['id'] for _, lesson, _, _, ejercicios in chunk
+                            if previous.get(lesson['id']) == firmas.huella_set(ejercicios)}
+                    chunk = [item for item in chunk if item[1]['id'] not in same]
+                    chunk_ids = [i for i in chunk_ids if i not in same]
+                    unchanged += len(same)
+                    if args.verbose and same:
+                        print(f"⏭ {len(same)} lessons unchanged, not rewritten")
+                deleted = delete_exercises_for_lessons(cursor, chunk_ids)
+                if args.verbose and chunk_ids:
+                    print(f"🧹 Deleted {deleted} exercises for {len(chunk_ids)} lessons")
+
+            for idx, lesson, gen, key, ejercicios in chunk:
+                if args.dry_run:
+                    print(f"\n--- Lesson {idx}/{len(lessons)} [{lesson.get('id')}] {gen.titulo} ({gen.nivel}-{gen.idioma}) ---")
+                    for e in ejercicios[:3]:
+                        print(json.dumps({
+                            "titulo": e['titulo'],
+                            "tipo": e['tipo'],
+                            "contenido": e['contenido'],
+                            "respuesta_correcta": e['respuesta_correcta'],
+                            "puntos": e['puntos_maximos']
+                        }, ensure_ascii=False, indent=2))
+                    print(f"... (would create {len(ejercicios)} exercises)\n")
+                    total_inserted += len(ejercicios)
+                    summary[key] += len(ejercicios)
+                    continue
+
+                creador = lesson.get('creado_por') or 1
+                for e in ejercicios:
+                    insertar_ejercicio(cursor, lesson.get('id'), e, creador)
+                    total_inserted += 1
+                    summary[key] += 1
+
+            processed = min(chunk_start + LESSONS_PER_CHUNK, len(lessons))
+            if not args.dry_run:
                 conn.commit()
                 if args.verbose:
-                    print(f"✅ Committed after {idx} lessons.")
-            if idx % 10 == 0:
-                print(f"   ✓ Processed {idx}/{len(lessons)} lessons ({total_inserted} exercises)")
+                    print(f"✅ Committed after {processed} lessons.")
+            print(f"   ✓ Processed {processed}/{len(lessons)} lessons ({total_inserted} exercises)")
 
         if not args.dry_run:
             conn.commit()
@@ -540,6 +606,8 @@ def main(argv=None):
             print("\n🔎 Dry-run complete (no DB changes).")
 
         print(f"Total exercises (this run): {total_inserted}")
+        if args.seed is not None and args.overwrite:
+            print(f"Unchanged lessons (not rewritten): {unchanged}")
         print("Summary by level-language:")
         for k,v in sorted(summary.items()):
             print(f"  • {k}: {v}")
@@ -10,6 +10,12 @@ from datetime import datetime
 import json
 import sys
 import os
+import argparse
+
+# Conexión compartida con los scripts de backend/data (MySQL o SQLite local)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'backend', 'data'))
+import almacen
+import actualizacion_lotes
 
 # ============================================
 # CONFIGURACIÓN DE BASE DE DATOS - CON PyMySQL
@@ -816,7 +822,7 @@ TRADUCCIONES = {
 def conectar_bd():
     """Conectar a la base de datos MySQL usando PyMySQL"""
     try:
-        conexion = pymysql.connect(**DB_CONFIG)
+        conexion = almacen.conectar(**DB_CONFIG)
         print("✅ Conexión exitosa a la base de datos")
         return conexion
     except Exception as e:
@@ -874,19 +880,97 @@ def generar_contenido_leccion(template, nivel, idioma):
     }
     return json.dumps(contenido, ensure_ascii=False)
 
-def insertar_leccion(cursor, leccion_data):
-    """Insertar una lección en la base de datos"""
-    query = """
-        INSERT INTO lecciones (
-            titulo, descripcion, contenido, nivel, idioma,
-            duracion_minutos, orden, estado, creado_por
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+# ============================================
+# UPSERT DEL CATÁLOGO BASE
+# ============================================
+
+IDIOMAS = ['Inglés', 'Francés', 'Alemán', 'Italiano']
+NIVELES = ['A1', 'A2', 'B1', 'B2', 'C1', 'C2']
+COLUMNAS = ['titulo', 'descripcion', 'contenido', 'nivel', 'idioma',
+            'duracion_minutos', 'orden', 'estado', 'creado_por']
+# Al resembrar solo se actualiza lo que viene de las plantillas; orden (reordenar.py),
+# estado y creado_por se fijan únicamente al insertar
+COLUMNAS_ACTUALIZABLES = ['descripcion', 'contenido', 'duracion_minutos']
+LECCIONES_POR_INSERT = 100
+
+def lecciones_base(creador_id):
+    """Las lecciones del catálogo base como dicts, en el orden de las plantillas"""
+    lecciones = []
+    for idioma in IDIOMAS:
+        for nivel in NIVELES:
+            for orden, template in enumerate(LECCIONES_TEMPLATES[nivel], start=1):
+                lecciones.append({
+                    'titulo': traducir_titulo(template['titulo'], idioma),
+                    'descripcion': template['descripcion'],
+                    'contenido': generar_contenido_leccion(template, nivel, idioma),
+                    'nivel': nivel,
+                    'idioma': idioma,
+                    'duracion_minutos': template['duracion'],
+                    'orden': orden,
+                    'estado': 'activa',
+                    'creado_por': creador_id
+                })
+    return lecciones
+
+def _contenido_igual(guardado, nuevo):
+    """Compara el JSON por valor: el formato con el que quedó guardado no cuenta"""
+    try:
+        return json.loads(guardado) == json.loads(nuevo)
+    except (TypeError, ValueError):
+        return guardado == nuevo
+
+def clasificar_lecciones(cursor, lecciones):
     """
-    cursor.execute(query, leccion_data)
-    return cursor.lastrowid
+    Separa las lecciones en (nuevas, cambiadas, sin_cambios) buscando cada
+    (idioma, nivel, titulo) en la BD. Las cambiadas llevan 'ids' con las filas
+    existentes de esa clave (la tabla no exige que sea única).
+    """
+    cursor.execute(f"""
+        SELECT id, idioma, nivel, titulo, {', '.join(COLUMNAS_ACTUALIZABLES)}
+        FROM lecciones
+    """)
+    existentes = {}
+    for f in cursor.fetchall():
+        existentes.setdefault((f['idioma'], f['nivel'], f['titulo']), []).append(f)
 
-def main():
+    nuevas, cambiadas, sin_cambios = [], [], []
+    for leccion in lecciones:
+        actuales = existentes.get((leccion['idioma'], leccion['nivel'], leccion['titulo']))
+        if not actuales:
+            nuevas.append(leccion)
+        elif any(actual['descripcion'] != leccion['descripcion']
+                 or int(actual['duracion_minutos'] or 0) != leccion['duracion_minutos']
+                 or not _contenido_igual(actual['contenido'], leccion['contenido'])
+                 for actual in actuales):
+            cambiadas.append({**leccion, 'ids': [a['id'] for a in actuales]})
+        else:
+            sin_cambios.append(leccion)
+    return nuevas, cambiadas, sin_cambios
+
+def upsert_lecciones(cursor, nuevas, cambiadas=()):
+    """
+    INSERT multi-fila de las nuevas y, para las cambiadas, un UPDATE con CASE
+    por columna y lote sobre los ids encontrados. No necesita índice único.
+    """
+    fila = '(' + ', '.join(['%s'] * len(COLUMNAS)) + ')'
+    for i in range(0, len(nuevas), LECCIONES_POR_INSERT):
+        lote = nuevas[i:i + LECCIONES_POR_INSERT]
+        cursor.execute(
+            f"INSERT INTO lecciones ({', '.join(COLUMNAS)}) VALUES " + ', '.join([fila] * len(lote)),
+            [l[c] for l in lote for c in COLUMNAS]
+        )
+    for columna in COLUMNAS_ACTUALIZABLES:
+        cambios = {i: l[columna] for l in cambiadas for i in l['ids']}
+        actualizacion_lotes.actualizar_en_lotes(cursor, 'lecciones', columna, cambios, LECCIONES_POR_INSERT)
+
+def main(argv=None):
     """Función principal"""
+    parser = argparse.ArgumentParser(description="Siembra (o resiembra) las lecciones base de SpeakLexi")
+    parser.add_argument("--solo-nuevas", action="store_true",
+                        help="Insertar las que faltan sin tocar las existentes (p. ej. ya enriquecidas con el KB)")
+    parser.add_argument("--dry-run", action="store_true", help="Solo mostrar qué cambiaría")
+    args = parser.parse_args(argv)
+
     print("=" * 60)
     print("🎓 GENERADOR DE LECCIONES BASE - SPEAKLEXI 2.0")
     print("=" * 60)
@@ -896,92 +980,58 @@ def main():
     conexion = conectar_bd()
     cursor = conexion.cursor()
     
-    # Obtener ID del creador
-    creador_id = obtener_creador_id(cursor)
-    if conexion.open:
-        conexion.commit()  # Commit si se creó usuario temporal
-    print(f"👤 Usuario creador: ID {creador_id}")
-    print()
-    
-    # Estadísticas
-    idiomas = ['Inglés', 'Francés', 'Alemán', 'Italiano']
-    niveles = ['A1', 'A2', 'B1', 'B2', 'C1', 'C2']
-    
-    total_lecciones = sum(len(LECCIONES_TEMPLATES[nivel]) for nivel in niveles)
-    total_general = total_lecciones * len(idiomas)
-    
-    print(f"📊 Se crearán {total_general} lecciones:")
-    print(f"   • {len(idiomas)} idiomas: {', '.join(idiomas)}")
-    print(f"   • {len(niveles)} niveles: {', '.join(niveles)}")
-    print(f"   • {total_lecciones} lecciones por idioma")
-    print()
-    
-    # Confirmar
-    respuesta = input("¿Deseas continuar? (s/n): ")
-    if respuesta.lower() != 's':
-        print("❌ Operación cancelada")
-        conexion.close()
-        sys.exit(0)
-    
-    print()
-    print("🚀 Iniciando generación de lecciones...")
-    print()
-    
-    contador = 0
-    lecciones_por_idioma = {idioma: 0 for idioma in idiomas}
-    
     try:
-        for idioma in idiomas:
-            print(f"🌍 Generando lecciones para {idioma}...")
-            
-            for nivel in niveles:
-                templates = LECCIONES_TEMPLATES[nivel]
-                print(f"   📚 Nivel {nivel}: {len(templates)} lecciones")
-                
-                for orden, template in enumerate(templates, start=1):
-                    # Traducir título
-                    titulo_traducido = traducir_titulo(template['titulo'], idioma)
-                    
-                    # Generar contenido
-                    contenido_json = generar_contenido_leccion(template, nivel, idioma)
-                    
-                    # Preparar datos
-                    leccion_data = (
-                        titulo_traducido,
-                        template['descripcion'],
-                        contenido_json,
-                        nivel,
-                        idioma,
-                        template['duracion'],
-                        orden,
-                        'activa',
-                        creador_id
-                    )
-                    
-                    # Insertar
-                    leccion_id = insertar_leccion(cursor, leccion_data)
-                    contador += 1
-                    lecciones_por_idioma[idioma] += 1
-                    
-                    # Mostrar progreso cada 10 lecciones
-                    if contador % 10 == 0:
-                        print(f"      ✓ {contador}/{total_general} lecciones creadas...")
-            
-            print(f"   ✅ {idioma}: {lecciones_por_idioma[idioma]} lecciones completadas")
-            print()
-        
-        # Commit
+        # Obtener ID del creador
+        creador_id = obtener_creador_id(cursor)
+        print(f"👤 Usuario creador: ID {creador_id}")
+        print()
+
+        lecciones = lecciones_base(creador_id)
+        nuevas, cambiadas, sin_cambios = clasificar_lecciones(cursor, lecciones)
+        if args.solo_nuevas:
+            sin_cambios += cambiadas
+            cambiadas = []
+
+        print(f"📊 Catálogo base: {len(lecciones)} lecciones "
+              f"({len(IDIOMAS)} idiomas × {len(NIVELES)} niveles)")
+        print(f"   ➕ Nuevas: {len(nuevas)}")
+        print(f"   ✏️  Con cambios: {len(cambiadas)}")
+        print(f"   ✅ Sin cambios: {len(sin_cambios)}")
+        print()
+
+        if not nuevas and not cambiadas:
+            conexion.commit()  # por si se creó el usuario temporal
+            print("🎉 El catálogo ya está al día, no hay nada que escribir")
+            return
+        if args.dry_run:
+            conexion.rollback()
+            print("🔎 Dry-run: no se escribió nada")
+            return
+
+        # Confirmar
+        respuesta = input("¿Deseas continuar? (s/n): ")
+        if respuesta.lower() != 's':
+            print("❌ Operación cancelada")
+            conexion.rollback()
+            sys.exit(0)
+
+        print()
+        # Solo viajan las filas nuevas o cambiadas
+        upsert_lecciones(cursor, nuevas, cambiadas)
         conexion.commit()
-        
+
         print()
         print("=" * 60)
-        print("🎉 ¡GENERACIÓN COMPLETADA!")
+        print("🎉 ¡SIEMBRA COMPLETADA!")
         print("=" * 60)
-        print(f"✅ Total de lecciones creadas: {contador}")
+        print(f"➕ Insertadas: {len(nuevas)}")
+        print(f"✏️  Actualizadas: {len(cambiadas)}")
+        print(f"✅ Sin cambios: {len(sin_cambios)}")
         print()
         print("📊 Resumen por idioma:")
-        for idioma, cantidad in lecciones_por_idioma.items():
-            print(f"   • {idioma}: {cantidad} lecciones")
+        for idioma in IDIOMAS:
+            cantidad = sum(1 for l in nuevas + cambiadas if l['idioma'] == idioma)
+            print(f"   • {idioma}: {cantidad} lecciones escritas")
         print()
         print("🔍 Verifica las lecciones en tu base de datos:")
         print("   SELECT nivel, idioma, COUNT(*) as total")